@@ -0,0 +1,98 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional
+
+from response_cache import CACHE_DIR
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_INDEX_PATH = os.path.join(CACHE_DIR, "audit_index.sqlite3")
+SECTIONS = ("skeleton", "debate", "solutions")
+
+
+def content_hash(content: str) -> str:
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+class AuditIndex:
+    """
+    Trwały indeks wyników audytu Julesa.
+
+    Klucz: (ścieżka pliku, hash treści, wersja audytu - model/prompty/kontekst). Ponowny audyt
+    niezmienionego pliku zwraca zapisane sekcje bez wywołania Gemini.
+    """
+    def __init__(self, path=DEFAULT_INDEX_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS audits ("
+            "path TEXT NOT NULL, content_hash TEXT NOT NULL, version TEXT NOT NULL, "
+            "result TEXT NOT NULL, updated REAL NOT NULL, "
+            "PRIMARY KEY (path, content_hash, version))"
+        )
+        self._db.commit()
+
+    @staticmethod
+    def _key_path(file_path: str) -> str:
+        return os.path.abspath(file_path)
+
+    def get(self, file_path: str, digest: str, version: str) -> Optional[Dict[str, str]]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT result FROM audits WHERE path = ? AND content_hash = ? AND version = ?",
+                (self._key_path(file_path), digest, version)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return json.loads(row[0])
+
+    def put(self, file_path: str, digest: str, version: str, result: Dict[str, str]):
+        payload = json.dumps({k: result[k] for k in SECTIONS}, ensure_ascii=False)
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO audits (path, content_hash, version, result, updated) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (self._key_path(file_path), digest, version, payload, time.time())
+            )
+            self._db.commit()
+
+    def compact(self) -> Dict[str, int]:
+        """
+        Usuwa wpisy nieaktualne: pliki, które już nie istnieją, oraz starsze treści (hash)
+        tego samego pliku - dla każdej pary (plik, wersja audytu) zostaje najnowszy wynik,
+        więc wyniki innych wersji promptów/modelu pozostają w indeksie. Na końcu VACUUM.
+        """
+        with self._lock:
+            rows = self._db.execute("SELECT DISTINCT path FROM audits").fetchall()
+            missing = [path for (path,) in rows if not os.path.exists(path)]
+            self._db.executemany("DELETE FROM audits WHERE path = ?", [(p,) for p in missing])
+            superseded = self._db.execute(
+                "DELETE FROM audits WHERE rowid NOT IN (SELECT rowid FROM ("
+                "SELECT rowid, ROW_NUMBER() OVER ("
+                "PARTITION BY path, version ORDER BY updated DESC, rowid DESC) AS rank FROM audits"
+                ") WHERE rank = 1)"
+            ).rowcount
+            self._db.commit()
+            self._db.execute("VACUUM")
+            remaining = self._db.execute("SELECT COUNT(*) FROM audits").fetchone()[0]
+        logger.info(
+            f"Audit index compacted: -{len(missing)} missing files, -{superseded} old versions"
+        )
+        return {"missing_files": len(missing), "superseded": superseded, "remaining": remaining}
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            entries = self._db.execute("SELECT COUNT(*) FROM audits").fetchone()[0]
+            return {"entries": entries, "hits": self.hits, "misses": self.misses}
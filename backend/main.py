@@ -1,86 +1,310 @@
-import os
-import time
+import argparse
+import asyncio
 import json
-import threading
-from flask import Flask, jsonify, request
-from flask_cors import CORS
-import psutil
-from datetime import datetime
-from gemini_client import GeminiGuard
 import logging
+import os
+import signal
+import sys
+from datetime import datetime
+
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Route
+
+# Modules shared with the CLI tools (gemini_client, response_cache, rate_limiter, ...)
+# live in the repository root
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from status_broker import StatusBroker
+from status_state import StatusState
+from system_sampler import sampler_from_env
+
+from gemini_client import get_async_loop, get_guard, get_stats, set_max_concurrency
+from rate_limiter import PRIORITY_INTERACTIVE
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-app = Flask(__name__)
-CORS(app)
-
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 REPORT_PATH = os.path.join(BASE_DIR, "status_report.json")
+# Status lives in memory; the file is only an optional, throttled copy (0 = never written)
+PERSIST_INTERVAL = float(os.getenv("REGIS_STATUS_PERSIST_SECONDS", "5"))
+# How long an SSE client waits for a change before a keep-alive comment is sent
+STREAM_KEEPALIVE = 15.0
 
+# Sections: "system" (monitor below), "jules" and "debate" (sent by the agents via status_client.py)
+status_state = StatusState(REPORT_PATH, PERSIST_INTERVAL)
+status_broker = StatusBroker(status_state)
 
-def system_monitor_loop():
-    print(f"\u1d48B  [MONITOR] Started. Writing to: {REPORT_PATH}")
-    while True:
-        try:
-            battery = psutil.sensors_battery()
-            plugged = battery.power_plugged if battery else False
-            percent = battery.percent if battery else 100
-
-            stats = {
-                "timestamp": datetime.now().isoformat(),
-                "cpu": psutil.cpu_percent(interval=None),
-                "ram": psutil.virtual_memory().percent,
-                "battery": percent,
-                "plugged": plugged,
-                "net_io": psutil.net_io_counters().bytes_recv // 1024,
-                "status": "ONLINE",
-                "progress": {
-                    "phase": "IDLE",
-                    "task": "System Monitoring"
-                }
-            }
-
-            with open(REPORT_PATH + ".tmp", "w") as f:
-                json.dump(stats, f)
-            os.replace(REPORT_PATH + ".tmp", REPORT_PATH)
-
-            time.sleep(1)
-        except Exception as e:
-            print(f"\u26a0 Monitor Error: {e}")
-            time.sleep(2)
+# The ASGI server and every handler run on the process-wide Gemini loop: a waiting chat or SSE
+# client is a suspended coroutine, not a blocked worker thread, and Gemini calls need no hop
+chat_loop = get_async_loop()
+CHAT_TIMEOUT = float(os.getenv("REGIS_CHAT_TIMEOUT", "120"))
+
+def publish_system_status(sample):
+    """Sampler callback: the latest sample becomes the "system" status section."""
+    status_state.update_section("system", {
+        "timestamp": datetime.now().isoformat(),
+        "cpu": round(sample.get("cpu", 0.0), 1),
+        "cpu_per_core": [round(sample.get(f, 0.0), 1) for f in sampler.core_fields],
+        "ram": sample.get("ram", 0.0),
+        "battery": sample.get("battery", 100),
+        "plugged": bool(sample.get("plugged", 0.0)),
+        "net_io": sampler.net_total_kb,
+        "net_rx_bps": round(sample.get("net_rx_bps", 0.0)),
+        "net_tx_bps": round(sample.get("net_tx_bps", 0.0)),
+        "status": "ONLINE",
+        "progress": {
+            "phase": "IDLE",
+            "task": "System Monitoring"
+        }
+    }, replace=True)
+
+
+# System monitor: per-metric intervals, bounded ring-buffer history (/api/metrics/history)
+sampler = sampler_from_env(on_sample=publish_system_status)
+
+
+def start_background_services():
+    """Status broker, shared server loop and the system sampler (as a managed thread)."""
+    status_state.load()
+    status_broker.start()
+    chat_loop.start()
+    sampler.start()
+    print(f"\u1d48B  [MONITOR] Started. Persisting to: {REPORT_PATH} every {PERSIST_INTERVAL}s")
+
+
+def stop_background_services():
+    """Reverse order of start; the last status is persisted before exit."""
+    sampler.stop()
+    status_broker.stop()
+    chat_loop.stop()
+    if PERSIST_INTERVAL > 0:
+        status_state.persist()
+    print("🛑 [BACKEND] Background services stopped.")
+
+
+async def get_status(request):
+    version, body = status_state.snapshot()
+    if not version:
+        return JSONResponse({"status": "OFFLINE", "message": "No data yet"})
+    etag = status_state.etag(version)
+    if etag in request.headers.get("If-None-Match", ""):
+        return Response(status_code=304, headers={"ETag": etag})
+    return Response(
+        body, media_type="application/json", headers={"ETag": etag, "Cache-Control": "no-cache"}
+    )
+
+
+def _event_stream(events):
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+async def status_stream(request):
+    """SSE: the full status after every change (`id:` = version, Last-Event-ID supported)."""
+    try:
+        since = int(request.headers.get("Last-Event-ID") or request.query_params.get("since", 0))
+    except ValueError:
+        since = 0
+
+    async def generate():
+        # An id from before a backend restart may be ahead of the current version
+        version = since if since <= status_state.version else 0
+        while True:
+            current, body = await status_state.wait_async(version, timeout=STREAM_KEEPALIVE)
+            if current == version:
+                yield ": keep-alive\n\n"
+                continue
+            version = current
+            yield f"id: {version}\ndata: {body.decode('utf-8')}\n\n"
 
+    return _event_stream(generate())
 
-@app.route("/api/status")
-def get_status():
-    if os.path.exists(REPORT_PATH):
-        with open(REPORT_PATH, "r") as f:
-            return jsonify(json.load(f))
-    return jsonify({"status": "OFFLINE", "message": "No data yet"})
+
+async def metrics_history(request):
+    """Sample history as columns; `since` = `seq` from the previous response (only new rows)."""
+    try:
+        since = max(0, int(request.query_params.get("since", 0)))
+    except ValueError:
+        return JSONResponse({"error": "since must be an integer"}, status_code=400)
+    return JSONResponse(sampler.history(since))
+
+
+async def gemini_stats(request):
+    return JSONResponse(get_stats())
+
+
+async def _read_message(request):
+    if request.method == "POST":
+        try:
+            data = await request.json()
+        except ValueError:
+            data = None
+        return (data or {}).get("message", "")
+    return request.query_params.get("message", "")
 
 
-@app.route("/api/chat", methods=["POST"])
-def chat():
-    data = request.json
-    user_message = data.get("message", "")
+async def chat(request):
+    user_message = await _read_message(request)
     logger.info(f"Received chat message: {user_message}")
 
     try:
-        guard = GeminiGuard()
-        response_text = guard.generate_content(user_message)
+        guard = get_guard()
+        response_text = await asyncio.wait_for(
+            guard.generate_content_async(
+                user_message, priority=PRIORITY_INTERACTIVE, caller="chat"
+            ),
+            timeout=CHAT_TIMEOUT,
+        )
         logger.info("Generated response from Gemini")
-        return jsonify({"response": response_text})
+        return JSONResponse({"response": response_text})
     except Exception as e:
         logger.error(f"Error in chat endpoint: {e}")
-        return jsonify(
+        return JSONResponse(
             {"response": f"Jules v2.0: Acknowledged. Processing input: '{user_message}'. (Offline Mode or Error: {str(e)})"}
         )
 
 
+def _sse(payload, event=None):
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+
+async def chat_stream(request):
+    """SSE: answer fragments as they arrive (`data: {"delta": ...}`), then `event: done`."""
+    user_message = await _read_message(request)
+    logger.info(f"Received streaming chat message: {user_message}")
+
+    async def generate():
+        try:
+            guard = get_guard()
+            async for chunk in guard.stream_content_async(
+                user_message, priority=PRIORITY_INTERACTIVE, caller="chat"
+            ):
+                yield _sse({"delta": chunk})
+            yield _sse({}, event="done")
+        except Exception as e:
+            logger.error(f"Error in chat stream endpoint: {e}")
+            yield _sse({"error": str(e)}, event="error")
+
+    return _event_stream(generate())
+
+
+app = Starlette(
+    routes=[
+        Route("/api/status", get_status),
+        Route("/api/status/stream", status_stream),
+        Route("/api/metrics/history", metrics_history),
+        Route("/api/gemini/stats", gemini_stats),
+        Route("/api/chat", chat, methods=["POST"]),
+        Route("/api/chat/stream", chat_stream, methods=["GET", "POST"]),
+    ],
+    middleware=[
+        Middleware(CORSMiddleware, allow_origins=["*"], allow_methods=["*"], allow_headers=["*"])
+    ],
+)
+
+
+def serve(host, port, connection_limit, production=False, backlog=2048, keep_alive=5.0,
+          shutdown_timeout=5.0, gemini_concurrency=None):
+    """
+    Serves the ASGI app with uvicorn on the shared BackgroundLoop.
+
+    Every handler is a coroutine on that loop, so a chat waiting for Gemini or an SSE client
+    waiting for a status change holds no thread. Limits:
+    - `connection_limit` caps open connections (503 above it),
+    - `backlog` is the listen queue for connections not yet accepted,
+    - `keep_alive` closes idle keep-alive connections after that many seconds,
+    - `gemini_concurrency` caps Gemini calls in flight (GEMINI_MAX_CONCURRENCY); chats above
+      it wait on the loop without holding a thread.
+    There is a single worker process: the status state, the status broker and the Gemini
+    loop live in this process. Production mode drops the access log and the Server header.
+    SIGTERM/SIGINT stop accepting new requests, let the running ones finish (up to
+    `shutdown_timeout` seconds) and then stop the background services.
+    """
+    try:
+        import uvicorn
+    except ImportError:
+        sys.exit("❌ uvicorn is not installed: pip install -r backend/requirements.txt")
+
+    if gemini_concurrency:
+        set_max_concurrency(gemini_concurrency)
+    config = uvicorn.Config(
+        app, host=host, port=port, limit_concurrency=connection_limit, backlog=backlog,
+        timeout_keep_alive=keep_alive, timeout_graceful_shutdown=shutdown_timeout,
+        access_log=not production, server_header=not production, log_level="info",
+    )
+    server = uvicorn.Server(config)
+
+    def _terminate(signum, frame):
+        server.should_exit = True
+
+    signal.signal(signal.SIGTERM, _terminate)
+    signal.signal(signal.SIGINT, _terminate)
+    start_background_services()
+    mode = "production" if production else "development"
+    print(
+        f"🚀 [BACKEND] Regis Core ({mode}) on {host}:{port} - {connection_limit} connections, "
+        f"{gemini_concurrency or 'default'} concurrent Gemini calls"
+    )
+    try:
+        chat_loop.run(server.serve())
+    finally:
+        stop_background_services()
+
+
 if __name__ == "__main__":
-    monitor_thread = threading.Thread(target=system_monitor_loop, daemon=True)
-    monitor_thread.start()
+    parser = argparse.ArgumentParser(description="Regis Core backend")
+    parser.add_argument(
+        "--production",
+        action="store_true",
+        default=os.getenv("REGIS_SERVER") == "production",
+        help="Production mode (no access log, no Server header)",
+    )
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "5000")))
+    parser.add_argument(
+        "--connection-limit",
+        type=int,
+        default=int(os.getenv("REGIS_CONNECTION_LIMIT", "1000")),
+        help="Maximum open connections (SSE and waiting chat clients included; "
+        "none holds a thread)",
+    )
+    parser.add_argument(
+        "--backlog",
+        type=int,
+        default=int(os.getenv("REGIS_BACKLOG", "2048")),
+        help="Listen queue for connections not yet accepted",
+    )
+    parser.add_argument(
+        "--keep-alive",
+        type=float,
+        default=float(os.getenv("REGIS_KEEP_ALIVE_SECONDS", "5")),
+        help="Seconds before an idle keep-alive connection is closed",
+    )
+    parser.add_argument(
+        "--shutdown-timeout",
+        type=float,
+        default=float(os.getenv("REGIS_SHUTDOWN_SECONDS", "5")),
+        help="Seconds running requests get to finish after SIGTERM/SIGINT",
+    )
+    parser.add_argument(
+        "--gemini-concurrency",
+        type=int,
+        default=None,
+        help="Maximum Gemini calls in flight (default: GEMINI_MAX_CONCURRENCY or 64)",
+    )
+    args = parser.parse_args()
 
-    print("\u1f680 [BACKEND] Regis Core online on port 5000...")
-    app.run(port=5000, host="0.0.0.0", debug=False)
+    serve(
+        args.host, args.port, args.connection_limit, production=args.production,
+        backlog=args.backlog, keep_alive=args.keep_alive, shutdown_timeout=args.shutdown_timeout,
+        gemini_concurrency=args.gemini_concurrency,
+    )
@@ -0,0 +1,67 @@
+import json
+import logging
+import os
+import socketserver
+import threading
+
+from status_state import StatusState
+
+logger = logging.getLogger(__name__)
+
+BROKER_HOST = "127.0.0.1"
+BROKER_PORT = int(os.getenv("REGIS_STATUS_PORT", "8766"))
+
+
+class _ThreadingServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class StatusBroker:
+    """
+    Jedyny właściciel status_report.json.
+
+    Agenci (jules, debate, ...) wysyłają zmiany swojej sekcji jako linie JSON
+    `{"section": ..., "delta": {...}, "replace": false}` po lokalnym TCP. Broker scala je
+    w StatusState, a plik zapisuje StatusState - jednym atomowym, dławionym zapisem
+    zamiast N konkurujących nadpisań całego pliku.
+    """
+    def __init__(self, state: StatusState, host: str = BROKER_HOST, port: int = BROKER_PORT):
+        self.state = state
+        self.host = host
+        self.port = port
+        self.received = 0
+        self._server = None
+
+    def apply(self, message):
+        section = message.get("section")
+        delta = message.get("delta")
+        if not isinstance(section, str) or not isinstance(delta, dict):
+            raise ValueError("Expected {'section': str, 'delta': dict}")
+        self.state.update_section(section, delta, replace=bool(message.get("replace")))
+        self.received += 1
+
+    def start(self):
+        broker = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                for line in self.rfile:
+                    try:
+                        broker.apply(json.loads(line))
+                    except ValueError as e:
+                        logger.warning(f"Status broker: rejected message: {e}")
+
+        self._server = _ThreadingServer((self.host, self.port), Handler)
+        self.port = self._server.server_address[1]
+        threading.Thread(
+            target=self._server.serve_forever, name="status-broker", daemon=True
+        ).start()
+        logger.info(f"Status broker listening on {self.host}:{self.port}")
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
@@ -0,0 +1,124 @@
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from typing import Any, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class StatusState:
+    """
+    Bieżący status systemu trzymany w pamięci procesu backendu.
+
+    Każda zmiana podbija `version` i od razu serializuje stan (jeden `json.dumps` na zmianę,
+    a nie na każde zapytanie HTTP). ETag = identyfikator uruchomienia + wersja, więc klienci
+    mogą pytać warunkowo (If-None-Match -> 304). Kanał push czeka na zmianę przez `wait()`
+    (wątki) albo `wait_async()` (korutyny - klient SSE nie zajmuje wątku).
+    Zapis na dysk jest opcjonalny i dławiony: najwyżej raz na `persist_interval` sekund
+    i tylko gdy stan się zmienił.
+    """
+    def __init__(self, persist_path: Optional[str] = None, persist_interval: float = 0.0):
+        self._cond = threading.Condition()
+        self._async_waiters = set()  # (pętla, asyncio.Event) korutyn czekających w wait_async
+        self._data: Dict[str, Any] = {}
+        self._body = b"{}"
+        self._boot = uuid.uuid4().hex[:8]
+        self.version = 0
+        self.persist_path = persist_path
+        self.persist_interval = persist_interval
+        self._persisted_version = 0
+        self._persist_thread = None
+        if persist_path and persist_interval > 0:
+            self._persist_thread = threading.Thread(
+                target=self._persist_loop, name="status-persist", daemon=True
+            )
+            self._persist_thread.start()
+
+    def load(self, skip=("system",)):
+        """Wczytuje sekcje zapisane wcześniej na dysku (np. przez agentów bez brokera)."""
+        try:
+            with open(self.persist_path, "r", encoding="utf-8") as f:
+                document = json.load(f)
+        except (OSError, ValueError, TypeError):
+            return
+        if isinstance(document, dict):
+            self.update(
+                {k: v for k, v in document.items() if isinstance(v, dict) and k not in skip}
+            )
+
+    def update_section(self, section: str, delta: Dict[str, Any], replace: bool = False) -> int:
+        """Scala `delta` z sekcją `section`; z `replace` podmienia całą sekcję."""
+        with self._cond:
+            current = self._data.get(section)
+            merged = (
+                dict(delta) if replace or not isinstance(current, dict) else {**current, **delta}
+            )
+            return self.update({section: merged})
+
+    def update(self, delta: Dict[str, Any]) -> int:
+        """Scala `delta` z bieżącym stanem (klucze najwyższego poziomu). Zwraca wersję."""
+        with self._cond:
+            if all(self._data.get(k) == v for k, v in delta.items()):
+                return self.version
+            self._data.update(delta)
+            self._body = json.dumps(self._data, ensure_ascii=False).encode("utf-8")
+            self.version += 1
+            self._cond.notify_all()
+            for loop, event in self._async_waiters:
+                try:
+                    loop.call_soon_threadsafe(event.set)
+                except RuntimeError:
+                    pass  # pętla już zamknięta
+            return self.version
+
+    def etag(self, version: int) -> str:
+        return f'"{self._boot}-{version}"'
+
+    def snapshot(self) -> Tuple[int, bytes]:
+        with self._cond:
+            return self.version, self._body
+
+    def wait(self, since_version: int, timeout: float) -> Tuple[int, bytes]:
+        """Czeka, aż wersja przekroczy `since_version` (lub minie `timeout`); zwraca stan."""
+        with self._cond:
+            self._cond.wait_for(lambda: self.version > since_version, timeout=timeout)
+            return self.version, self._body
+
+    async def wait_async(self, since_version: int, timeout: float) -> Tuple[int, bytes]:
+        """Jak `wait()`, ale czeka na pętli zdarzeń wywołującego zamiast blokować wątek."""
+        waiter = (asyncio.get_running_loop(), asyncio.Event())
+        with self._cond:
+            if self.version > since_version:
+                return self.version, self._body
+            self._async_waiters.add(waiter)
+        try:
+            await asyncio.wait_for(waiter[1].wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            with self._cond:
+                self._async_waiters.discard(waiter)
+        return self.snapshot()
+
+    def _persist_loop(self):
+        while True:
+            time.sleep(self.persist_interval)
+            self.persist()
+
+    def persist(self):
+        """Atomowy zapis migawki na dysk (plik tymczasowy + os.replace), jeśli coś się zmieniło."""
+        version, body = self.snapshot()
+        if not self.persist_path or version == self._persisted_version:
+            return
+        tmp_path = f"{self.persist_path}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(body)
+            os.replace(tmp_path, self.persist_path)
+            self._persisted_version = version
+        except OSError as e:
+            logger.error(f"Failed to persist status: {e}")
@@ -0,0 +1,156 @@
+import logging
+import math
+import os
+import threading
+import time
+from array import array
+from typing import Callable, Dict, List, Optional
+
+import psutil
+
+logger = logging.getLogger(__name__)
+
+# Domyślne okresy próbkowania (s) - bateria zmienia się wolno, więc pytamy o nią rzadko
+DEFAULT_INTERVALS = {"cpu": 1.0, "ram": 2.0, "net": 1.0, "battery": 60.0}
+
+
+def parse_intervals(spec: str) -> Dict[str, float]:
+    """`"cpu=1,battery=120"` -> {"cpu": 1.0, "battery": 120.0} (nadpisuje wartości domyślne)."""
+    intervals = dict(DEFAULT_INTERVALS)
+    for part in filter(None, (p.strip() for p in (spec or "").split(","))):
+        name, _, value = part.partition("=")
+        if name.strip() in intervals:
+            intervals[name.strip()] = float(value)
+    return intervals
+
+
+class RingBuffer:
+    """
+    Bufor cykliczny próbek o stałym rozmiarze: jedna `array('d')` na kolumnę.
+
+    Pamięć jest przydzielana raz (`capacity` x liczba kolumn x 8 B) i nie rośnie.
+    Wiersze są numerowane rosnąco (`seq`), więc czytelnik pobiera tylko nowe (`since`).
+    """
+    def __init__(self, fields: List[str], capacity: int):
+        self.fields = list(fields)
+        self.capacity = capacity
+        self._columns = {name: array("d", bytes(8 * capacity)) for name in ["ts"] + self.fields}
+        self.seq = 0  # numer ostatniego zapisanego wiersza
+
+    def append(self, ts: float, values: Dict[str, float]):
+        slot = self.seq % self.capacity
+        self._columns["ts"][slot] = ts
+        for name in self.fields:
+            self._columns[name][slot] = values.get(name, math.nan)
+        self.seq += 1
+
+    def since(self, seq: int) -> Dict[str, List[Optional[float]]]:
+        """Kolumny wierszy o numerach > `seq` (najwyżej `capacity` ostatnich)."""
+        first = max(seq, self.seq - self.capacity, 0)
+        slots = [i % self.capacity for i in range(first, self.seq)]
+        columns = {}
+        for name, column in self._columns.items():
+            columns[name] = [None if math.isnan(column[s]) else round(column[s], 3) for s in slots]
+        return columns
+
+
+class SystemSampler:
+    """
+    Próbkuje metryki systemu co sekundę (każdą według własnego okresu) do RingBuffer.
+
+    Zamiast liczników skumulowanych trzyma tempa: sieć w B/s (różnica liczników / czas),
+    CPU łącznie i per rdzeń. Metryka, której okres jeszcze nie minął, powtarza ostatnią
+    wartość. `on_sample(latest)` jest wołane po każdym wierszu (np. aktualizacja statusu).
+    """
+    def __init__(self, capacity: int = 3600, intervals: Dict[str, float] = None,
+                 on_sample: Callable[[Dict[str, float]], None] = None):
+        self.intervals = intervals or dict(DEFAULT_INTERVALS)
+        self.tick = min(self.intervals.values())
+        self.cores = psutil.cpu_count() or 1
+        self.core_fields = [f"cpu_core_{i}" for i in range(self.cores)]
+        self.buffer = RingBuffer(
+            ["cpu"] + self.core_fields + ["ram", "net_rx_bps", "net_tx_bps", "battery", "plugged"],
+            capacity,
+        )
+        self.on_sample = on_sample
+        self.latest: Dict[str, float] = {}
+        self.net_total_kb = 0
+        self._due = {name: 0.0 for name in self.intervals}
+        self._net_last = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        psutil.cpu_percent(percpu=True)  # pierwszy odczyt psutil zawsze zwraca 0 - inicjalizacja
+
+    def sample(self, now: float = None) -> Dict[str, float]:
+        now = time.monotonic() if now is None else now
+        values = dict(self.latest)
+
+        if now >= self._due["cpu"]:
+            per_core = psutil.cpu_percent(percpu=True)
+            values.update(zip(self.core_fields, per_core))
+            values["cpu"] = sum(per_core) / len(per_core) if per_core else 0.0
+            self._due["cpu"] = now + self.intervals["cpu"]
+        if now >= self._due["ram"]:
+            values["ram"] = psutil.virtual_memory().percent
+            self._due["ram"] = now + self.intervals["ram"]
+        if now >= self._due["net"]:
+            counters = psutil.net_io_counters()
+            if self._net_last is not None:
+                elapsed = max(now - self._net_last[0], 1e-6)
+                values["net_rx_bps"] = (counters.bytes_recv - self._net_last[1]) / elapsed
+                values["net_tx_bps"] = (counters.bytes_sent - self._net_last[2]) / elapsed
+            self._net_last = (now, counters.bytes_recv, counters.bytes_sent)
+            self.net_total_kb = counters.bytes_recv // 1024
+            self._due["net"] = now + self.intervals["net"]
+        if now >= self._due["battery"]:
+            battery = psutil.sensors_battery()
+            values["battery"] = battery.percent if battery else 100
+            values["plugged"] = float(battery.power_plugged) if battery else 0.0
+            self._due["battery"] = now + self.intervals["battery"]
+
+        with self._lock:
+            self.latest = values
+            self.buffer.append(time.time(), values)
+        return values
+
+    def history(self, since: int = 0) -> Dict:
+        """Przyrost historii: tylko wiersze nowsze niż `since` (numer z poprzedniej odpowiedzi)."""
+        with self._lock:
+            return {
+                "seq": self.buffer.seq,
+                "interval": self.tick,
+                "capacity": self.buffer.capacity,
+                "samples": self.buffer.since(since),
+            }
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                values = self.sample()
+                if self.on_sample:
+                    self.on_sample(values)
+            except Exception as e:
+                logger.error(f"System sampler error: {e}")
+            self._stop.wait(self.tick)
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="system-sampler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, timeout: float = 5.0):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+
+def sampler_from_env(on_sample=None) -> SystemSampler:
+    """REGIS_METRICS_HISTORY = wiersze bufora, REGIS_SAMPLE_INTERVALS = np. "cpu=1,battery=120"."""
+    return SystemSampler(
+        capacity=int(os.getenv("REGIS_METRICS_HISTORY", "3600")),
+        intervals=parse_intervals(os.getenv("REGIS_SAMPLE_INTERVALS", "")),
+        on_sample=on_sample,
+    )
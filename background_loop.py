@@ -0,0 +1,85 @@
+import asyncio
+import logging
+import threading
+from typing import Any, Awaitable
+
+logger = logging.getLogger(__name__)
+
+
+class BackgroundLoop:
+    """
+    Jedna pętla asyncio w osobnym wątku, żyjąca tyle co proces.
+
+    gemini_client trzyma na takiej pętli wszystkie wywołania async Gemini (klient grpc.aio SDK
+    jest związany z pętlą, na której powstał), a backend uruchamia na niej serwer ASGI
+    (`run(server.serve())`), więc handlery czekają współbieżnie bez zajmowania wątków. Kod
+    synchroniczny może zlecać tu korutyny przez `run()` i czekać na wynik.
+    """
+    def __init__(self, name: str = "regis-async"):
+        self.name = name
+        self._loop = None
+        self._thread = None
+        self._ready = threading.Event()
+
+    def start(self):
+        if self._thread is not None:
+            return self
+        self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+        self._thread.start()
+        self._ready.wait()
+        return self
+
+    def _run(self):
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        self._ready.set()
+        try:
+            self._loop.run_forever()
+        finally:
+            self._loop.run_until_complete(self._loop.shutdown_asyncgens())
+            self._loop.close()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        """Pętla zdarzeń (uruchamiana przy pierwszym użyciu)."""
+        if not self.running:
+            self.start()
+        return self._loop
+
+    def run(self, coro: Awaitable[Any], timeout: float = None) -> Any:
+        """Wykonuje korutynę na wspólnej pętli i blokuje wywołującego do wyniku (lub `timeout`)."""
+        if not self.running:
+            self.start()
+        if threading.current_thread() is self._thread:
+            coro.close()
+            raise RuntimeError(f"{self.name}: run() z wątku pętli zablokowałby ją - użyj await")
+        future = asyncio.run_coroutine_threadsafe(coro, self._loop)
+        try:
+            return future.result(timeout=timeout)
+        except BaseException:
+            future.cancel()
+            raise
+
+    def stop(self, timeout: float = 10.0):
+        """Anuluje zadania w toku, zatrzymuje pętlę i czeka na wątek."""
+        if not self.running:
+            return
+
+        async def _cancel_pending():
+            tasks = [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+        try:
+            asyncio.run_coroutine_threadsafe(_cancel_pending(), self._loop).result(timeout=timeout)
+        except Exception as e:
+            logger.warning(f"Background loop: pending tasks not cancelled cleanly: {e}")
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout)
+        self._thread = None
+        self._ready.clear()
@@ -0,0 +1,159 @@
+import ast
+import asyncio
+import logging
+import os
+import zlib
+from collections import namedtuple
+from typing import Awaitable, Callable, List
+
+logger = logging.getLogger(__name__)
+
+# Fragment pliku: linie liczone od 1, `end_line` włącznie
+Chunk = namedtuple("Chunk", ["index", "start_line", "end_line", "text"])
+
+DEFAULT_CHUNK_CHARS = 8000
+# Nominalny rozmiar bloku (węzła / akapitu) - z niego i z `max_chars` wynika średnia liczba
+# bloków na fragment. Stała, a nie średnia z pliku: granice nie mogą zależeć od reszty treści.
+NOMINAL_BLOCK_CHARS = 500
+
+
+def _python_boundaries(text: str):
+    """Numery linii (od 1), od których zaczynają się węzły najwyższego poziomu modułu."""
+    try:
+        tree = ast.parse(text)
+    except (SyntaxError, ValueError):
+        return None
+    starts = []
+    for node in tree.body:
+        decorators = getattr(node, "decorator_list", [])
+        starts.append(min([node.lineno] + [d.lineno for d in decorators]))
+    return starts
+
+
+def _blank_line_boundaries(lines: List[str]):
+    """Dla plików innych niż Python: akapity oddzielone pustymi liniami."""
+    starts = [1]
+    for i in range(1, len(lines)):
+        if not lines[i - 1].strip() and lines[i].strip():
+            starts.append(i + 1)
+    return starts
+
+
+def _is_anchor(first_line: str, modulus: int) -> bool:
+    """Czy blok zaczynający się tą linią otwiera nowy fragment (zależy tylko od tej linii)."""
+    return zlib.crc32(first_line.strip().encode("utf-8")) % modulus == 0
+
+
+def split_source(
+    text: str, filename: str = None, max_chars: int = DEFAULT_CHUNK_CHARS
+) -> List[Chunk]:
+    """
+    Dzieli plik na fragmenty wzdłuż granic składniowych, z granicami zależnymi od treści.
+
+    Blokami są węzły najwyższego poziomu (`ast`) dla Pythona, a puste linie dla pozostałych
+    plików. Nowy fragment zaczyna się przed blokiem, którego pierwsza linia (sygnatura)
+    wypada na "kotwicę" skrótu crc32 - jak w chunkingu zależnym od treści. Poza tym cięcie
+    następuje tylko wtedy, gdy fragment przekroczyłby `max_chars`. Zmiana wewnątrz bloku nie
+    przesuwa więc granic reszty pliku: zmienia się tylko fragment z tym blokiem, a pozostałe
+    mają identyczny tekst (i klucze cache odpowiedzi). Fragmenty nie mają zakładki z sąsiadów.
+    """
+    lines = text.splitlines(keepends=True)
+    if not lines:
+        return []
+
+    starts = None
+    if filename and filename.endswith(".py"):
+        starts = _python_boundaries(text)
+    if not starts:
+        starts = _blank_line_boundaries(lines)
+    if starts[0] != 1:
+        starts = [1] + starts
+
+    # Bloki [start, end) w indeksach linii (od 0)
+    bounds = [s - 1 for s in starts] + [len(lines)]
+    blocks = [
+        (bounds[i], bounds[i + 1]) for i in range(len(bounds) - 1) if bounds[i] < bounds[i + 1]
+    ]
+    modulus = max(1, max_chars // (2 * NOMINAL_BLOCK_CHARS))
+
+    spans = []
+    current_start, current_size = None, 0
+    for start, end in blocks:
+        size = sum(len(line) for line in lines[start:end])
+        if size > max_chars:
+            if current_start is not None:
+                spans.append((current_start, start))
+                current_start, current_size = None, 0
+            spans.extend(_split_lines(lines, start, end, max_chars))
+            continue
+        if current_start is not None and (
+            _is_anchor(lines[start], modulus) or current_size + size > max_chars
+        ):
+            spans.append((current_start, start))
+            current_start, current_size = None, 0
+        if current_start is None:
+            current_start = start
+        current_size += size
+    if current_start is not None:
+        spans.append((current_start, len(lines)))
+
+    return [
+        Chunk(index, start + 1, end, "".join(lines[start:end]))
+        for index, (start, end) in enumerate(spans)
+    ]
+
+
+def _split_lines(lines, start, end, max_chars):
+    spans, span_start, size = [], start, 0
+    for i in range(start, end):
+        if size and size + len(lines[i]) > max_chars:
+            spans.append((span_start, i))
+            span_start, size = i, 0
+        size += len(lines[i])
+    spans.append((span_start, end))
+    return spans
+
+
+async def map_chunks(chunks: List[Chunk], map_fn: Callable[[Chunk], Awaitable[str]],
+                     max_workers: int = None) -> List[str]:
+    """Faza map: `map_fn` dla każdego fragmentu, współbieżnie, max `max_workers` naraz."""
+    max_workers = max_workers or int(os.getenv("JULES_CHUNK_WORKERS", "4"))
+    semaphore = asyncio.Semaphore(max_workers)
+
+    async def run(chunk):
+        async with semaphore:
+            return await map_fn(chunk)
+
+    return await asyncio.gather(*(run(chunk) for chunk in chunks))
+
+
+def merge_findings(chunks: List[Chunk], findings: List[str], filename: str = None) -> str:
+    """Faza reduce: scala wyniki fragmentów w jeden dokument (z zakresami linii)."""
+    label = f"{filename} " if filename else ""
+    return "\n\n".join(
+        f"### {label}(linie {chunk.start_line}-{chunk.end_line})\n{finding.strip()}"
+        for chunk, finding in zip(chunks, findings)
+    )
+
+
+async def map_reduce(text: str, filename: str, map_fn: Callable[[Chunk], Awaitable[str]],
+                     max_chars: int = DEFAULT_CHUNK_CHARS, max_workers: int = None,
+                     on_chunk_done: Callable[[Chunk, int, int], None] = None) -> str:
+    """split_source -> map_chunks -> merge_findings.
+
+    `on_chunk_done(chunk, done, total)` raportuje postęp.
+    """
+    chunks = split_source(text, filename, max_chars=max_chars)
+    logger.info(f"Map-reduce: {filename} -> {len(chunks)} fragmentów")
+    done = 0
+
+    async def tracked(chunk):
+        nonlocal done
+        result = await map_fn(chunk)
+        done += 1
+        if on_chunk_done:
+            on_chunk_done(chunk, done, len(chunks))
+        return result
+
+    findings = await map_chunks(chunks, tracked, max_workers=max_workers)
+    return merge_findings(chunks, findings, filename)
@@ -0,0 +1,99 @@
+import logging
+import re
+from itertools import combinations
+from typing import Dict, List, Optional, Tuple
+
+from rate_limiter import PRIORITY_BATCH
+
+logger = logging.getLogger(__name__)
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+
+def shingles(text: str, k: int = 3) -> set:
+    """Zbiór k-gramów słów (małe litery); krótkie teksty dają jeden shingle z całości."""
+    words = [w.lower() for w in _WORD.findall(text or "")]
+    if len(words) < k:
+        return {tuple(words)} if words else set()
+    return {tuple(words[i:i + k]) for i in range(len(words) - k + 1)}
+
+
+def similarity(a: str, b: str, k: int = 3) -> float:
+    """Podobieństwo Jaccarda shingli - 0 (nic wspólnego) .. 1 (ten sam tekst)."""
+    sa, sb = shingles(a, k), shingles(b, k)
+    if not sa or not sb:
+        return 0.0
+    return len(sa & sb) / len(sa | sb)
+
+
+def _mean(values: List[float]) -> float:
+    return sum(values) / len(values) if values else 0.0
+
+
+class ConvergenceDetector:
+    """
+    Wykrywa, że debata przestała wnosić coś nowego.
+
+    Lokalnie (bez wywołań modelu) liczy dwie miary na zakończonej rundzie:
+    `repetition` - podobieństwo wypowiedzi każdego agenta do jego wypowiedzi z poprzedniej
+    rundy, oraz `agreement` - średnie podobieństwo wypowiedzi różnych agentów w tej rundzie.
+    Przekroczenie `threshold` kończy debatę. Opcjonalny sędzia (klient modelu) jest pytany
+    tylko w strefie niepewności (`judge_threshold` <= wynik < `threshold`), więc dodatkowy
+    koszt pojawia się jedynie wtedy, gdy miary lokalne nie rozstrzygają.
+    """
+    def __init__(self, threshold: float = 0.5, min_rounds: int = 2, judge=None,
+                 judge_threshold: float = 0.2, k: int = 3):
+        self.threshold = threshold
+        self.min_rounds = min_rounds
+        self.judge = judge
+        self.judge_threshold = judge_threshold
+        self.k = k
+        self.judge_calls = 0
+
+    def scores(self, rounds: List[List[Dict]]) -> Dict[str, float]:
+        last = [m["content"] for m in rounds[-1]]
+        agreement = _mean([similarity(a, b, self.k) for a, b in combinations(last, 2)])
+        repetition = 0.0
+        if len(rounds) > 1:
+            previous = {m["role"]: m["content"] for m in rounds[-2]}
+            repetition = _mean(
+                [
+                    similarity(m["content"], previous[m["role"]], self.k)
+                    for m in rounds[-1]
+                    if m["role"] in previous
+                ]
+            )
+        return {"agreement": round(agreement, 3), "repetition": round(repetition, 3)}
+
+    async def check(
+        self, topic: str, rounds: List[List[Dict]]
+    ) -> Tuple[Optional[str], Dict[str, float]]:
+        """(powód zakończenia albo None, miary) po rundzie `len(rounds)`."""
+        scores = self.scores(rounds)
+        if len(rounds) < self.min_rounds:
+            return None, scores
+        if scores["repetition"] >= self.threshold:
+            return "repetition", scores
+        if scores["agreement"] >= self.threshold:
+            return "converged", scores
+        if self.judge is not None and max(scores.values()) >= self.judge_threshold:
+            if await self._ask_judge(topic, rounds):
+                return "judge", scores
+        return None, scores
+
+    async def _ask_judge(self, topic: str, rounds: List[List[Dict]]) -> bool:
+        transcript = "\n".join(f"{m['role']}: {m['content']}" for r in rounds[-2:] for m in r)
+        prompt = (
+            f"Temat debaty: {topic}.\nOstatnie wypowiedzi:\n{transcript}\n\n"
+            "Czy uczestnicy doszli do porozumienia albo powtarzają te same argumenty, "
+            "tak że kolejna runda nic nie wniesie? Odpowiedz jednym słowem: TAK albo NIE."
+        )
+        self.judge_calls += 1
+        try:
+            verdict = await self.judge.generate_content_async(
+                prompt, temperature=0.0, priority=PRIORITY_BATCH
+            )
+        except Exception as e:
+            logger.warning(f"Sędzia debaty niedostępny: {e}")
+            return False
+        return verdict.strip().upper().startswith(("TAK", "YES"))
@@ -0,0 +1,89 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List
+
+from response_cache import CACHE_DIR
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STORE_PATH = os.getenv(
+    "REGIS_CONVERSATION_DB", os.path.join(CACHE_DIR, "conversations.sqlite3")
+)
+
+
+class ConversationStore:
+    """
+    Trwała historia rozmów Regis (SQLite, tryb WAL), przechowywana per sesja.
+
+    Indeksy (session, id) i (created) pozwalają wczytać tylko końcówkę sesji - `load_window`
+    czyta od najnowszych wiadomości i kończy, gdy wyczerpie budżet tokenów, więc koszt nie
+    zależy od długości całej sesji. Liczba tokenów jest zapisywana razem z wiadomością.
+    """
+    def __init__(self, path=DEFAULT_STORE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS messages ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, session TEXT NOT NULL, role TEXT NOT NULL, "
+            "content TEXT NOT NULL, tokens INTEGER NOT NULL, created REAL NOT NULL)"
+        )
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS idx_messages_session ON messages (session, id)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_messages_created ON messages (created)")
+        self._db.commit()
+
+    def append(self, session: str, role: str, content: str, tokens: int) -> int:
+        with self._lock:
+            cursor = self._db.execute(
+                "INSERT INTO messages (session, role, content, tokens, created) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (session, role, content, tokens, time.time()),
+            )
+            self._db.commit()
+            return cursor.lastrowid
+
+    def load_window(self, session: str, max_tokens: int, max_messages: int) -> List[Dict]:
+        """Najnowsze wiadomości sesji mieszczące się w budżecie - w kolejności chronologicznej."""
+        window, total = [], 0
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT role, content, tokens FROM messages "
+                "WHERE session = ? ORDER BY id DESC LIMIT ?",
+                (session, max_messages),
+            )
+            for role, content, tokens in rows:
+                if window and total + tokens > max_tokens:
+                    break
+                window.append({"role": role, "content": content, "tokens": tokens})
+                total += tokens
+        window.reverse()
+        return window
+
+    def sessions(self) -> List[Dict]:
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT session, COUNT(*), MAX(created) FROM messages "
+                "GROUP BY session ORDER BY MAX(created) DESC"
+            ).fetchall()
+        return [{"session": s, "messages": n, "updated": updated} for s, n, updated in rows]
+
+    def prune(self, older_than_s: float) -> int:
+        """Usuwa wiadomości starsze niż `older_than_s` sekund."""
+        with self._lock:
+            deleted = self._db.execute(
+                "DELETE FROM messages WHERE created < ?", (time.time() - older_than_s,)
+            ).rowcount
+            self._db.commit()
+        return deleted
+
+    def close(self):
+        with self._lock:
+            self._db.close()
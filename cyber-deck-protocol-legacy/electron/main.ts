@@ -10,6 +10,7 @@ const dist = path.join(__dirname, "../dist");
 const preload = path.join(__dirname, "../dist-electron/preload.js");
 const protocolPath = path.join(process.cwd(), "GEMINI.md");
 const statusPath = path.join(process.cwd(), "status_report.json");
+const eventsPath = path.join(process.cwd(), "agent_events.jsonl");
 
 let win: BrowserWindow | null = null;
 
@@ -85,6 +86,34 @@ ipcMain.handle("agent:status", async () => {
   return JSON.stringify({ status: "Offline", error: "No status report found" });
 });
 
+// Tail of the append-only event log: only bytes after `offset`, only events after `since`
+ipcMain.handle("agent:events", async (_, { since = 0, offset = 0, ino = 0 } = {}) => {
+  if (!fs.existsSync(eventsPath)) return { events: [], offset: 0, ino: 0 };
+  const stat = await fs.promises.stat(eventsPath);
+  const size = stat.size;
+  // Rotation moves the active file aside and starts a new one, so a different inode means
+  // the offset belongs to the old segment - read the new one from the start. The size check
+  // alone misses a new segment that has already grown past the old offset.
+  const start = stat.ino !== ino || size < offset ? 0 : offset;
+  const handle = await fs.promises.open(eventsPath, "r");
+  try {
+    const buffer = Buffer.alloc(size - start);
+    await handle.read(buffer, 0, buffer.length, start);
+    // Skip a partially written last line; it is picked up on the next call
+    const end = buffer.lastIndexOf(0x0a) + 1;
+    const events = buffer
+      .subarray(0, end)
+      .toString("utf-8")
+      .split("\n")
+      .filter(Boolean)
+      .map((line) => JSON.parse(line))
+      .filter((event) => event.seq > since);
+    return { events, offset: start + end, ino: stat.ino };
+  } finally {
+    await handle.close();
+  }
+});
+
 ipcMain.handle("jules:run", async (_, { context, file }) => {
   // Determine path to jules_cli.py
   // Assuming repo root is 2 levels up from dist-electron or similar.
@@ -3,5 +3,6 @@ contextBridge.exposeInMainWorld("api", {
   readProtocol: () => ipcRenderer.invoke("protocol:read"),
   saveProtocol: (c: string) => ipcRenderer.invoke("protocol:save", c),
   readAgentStatus: () => ipcRenderer.invoke("agent:status"),
+  readAgentEvents: (cursor: { since?: number; offset?: number; ino?: number }) => ipcRenderer.invoke("agent:events", cursor),
   runJules: (payload: any) => ipcRenderer.invoke("jules:run", payload)
 });
@@ -23,7 +23,9 @@ function App() {
     if (window.api?.readAgentStatus) {
       try {
         const json = await window.api.readAgentStatus();
-        setAgentStatus(JSON.parse(json));
+        const parsed = JSON.parse(json);
+        // status_report.json is split into sections (system, jules, debate)
+        setAgentStatus(parsed.jules ?? parsed);
       } catch (err) {
         console.error('Error reading status:', err);
       }
@@ -9,4 +9,5 @@ contextBridge.exposeInMainWorld('api', {
   readProtocol: (): Promise<string> => ipcRenderer.invoke('protocol:read'),
   saveProtocol: (content: string): Promise<boolean> => ipcRenderer.invoke('protocol:save', content),
   readAgentStatus: (): Promise<string> => ipcRenderer.invoke('agent:status'),
+  readAgentEvents: (cursor: { since?: number; offset?: number; ino?: number }) => ipcRenderer.invoke('agent:events', cursor),
 });
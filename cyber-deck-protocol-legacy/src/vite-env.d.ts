@@ -5,6 +5,7 @@ interface Window {
     readProtocol: () => Promise<string>;
     saveProtocol: (content: string) => Promise<boolean>;
     readAgentStatus: () => Promise<string>;
+    readAgentEvents: (cursor: {since?: number, offset?: number, ino?: number}) => Promise<{events: any[], offset: number, ino: number}>;
     runJules: (payload: {context?: string, file?: string}) => Promise<{success: boolean}>;
   };
 }
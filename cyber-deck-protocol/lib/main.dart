@@ -199,7 +199,9 @@ class StatsPanel extends StatelessWidget {
   Widget build(BuildContext context) {
     return Consumer<SystemState>(
       builder: (context, state, child) {
-        final stats = state.stats;
+        // /api/status is split into sections (system, jules, debate); older backends send flat keys
+        final section = state.stats['system'];
+        final Map<String, dynamic> stats = section is Map<String, dynamic> ? section : state.stats;
         return Padding(
           padding: const EdgeInsets.all(16.0),
           child: Column(
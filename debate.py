@@ -1,80 +1,426 @@
 import asyncio
 import logging
 import os
-from gemini_client import GeminiGuard
-from memory_manager import optimize_context
+import time
+from typing import Dict, List
+from event_log import get_event_log
+from gemini_client import GeminiGuard, get_guard
+from rate_limiter import PRIORITY_BATCH, estimate_tokens
+from status_client import publish_status
+from memory_manager import ContextCompactor
+from convergence import ConvergenceDetector
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Kolejność tur:
+#   sequential   - każda wypowiedź odpowiada na poprzednią (klasyczna wymiana A -> B -> A ...)
+#   simultaneous - otwarcia w rundzie 1 równolegle, dalej jak sequential
+#   panel        - w każdej rundzie wszyscy mówią równolegle, odnosząc się do poprzedniej rundy
+TOPOLOGIES = ("sequential", "simultaneous", "panel")
+
+DEFAULT_AGENTS = [
+    {"name": "Agent A", "icon": "🔵", "stance": "Jestem ZA", "style": "Użyj mocnych argumentów."},
+    {
+        "name": "Agent B",
+        "icon": "🔴",
+        "stance": "Jestem PRZECIW",
+        "style": "Bądź cyniczny i zabawny.",
+    },
+    {
+        "name": "Agent C",
+        "icon": "🟢",
+        "stance": "Szukam kompromisu",
+        "style": "Wskaż, w czym obie strony mają rację.",
+    },
+    {
+        "name": "Agent D",
+        "icon": "🟡",
+        "stance": "Sprawdzam fakty",
+        "style": "Wytknij słabe dowody i nadużycia.",
+    },
+    {
+        "name": "Agent E",
+        "icon": "🟣",
+        "stance": "Myślę o kosztach",
+        "style": "Licz koszty, ryzyka i priorytety.",
+    },
+]
+
+
+def make_agents(count: int = 2) -> List[Dict[str, str]]:
+    """Pierwsze `count` ról z DEFAULT_AGENTS (kolejne role są numerowane)."""
+    agents = [dict(a) for a in DEFAULT_AGENTS[:count]]
+    for i in range(len(agents), count):
+        agents.append({"name": f"Agent {i + 1}", "icon": "⚪", "stance": "Mam własne zdanie",
+                       "style": "Dodaj argument, którego jeszcze nie było."})
+    return agents
+
+
+def plan_turns(topology: str, agents: int, rounds: int) -> List[List[int]]:
+    """
+    Graf zależności tur. Tura `i` = (runda i // agents, agent i % agents);
+    wynik[i] to numery tur, na które tura `i` musi poczekać.
+    """
+    if topology not in TOPOLOGIES:
+        raise ValueError(
+            f"Nieznana topologia debaty: {topology} (dostępne: {', '.join(TOPOLOGIES)})"
+        )
+    deps = []
+    for i in range(agents * rounds):
+        rnd, _ = divmod(i, agents)
+        parallel_round = topology == "panel" or (topology == "simultaneous" and rnd == 0)
+        previous_round = list(range((rnd - 1) * agents, rnd * agents)) if rnd else []
+        if parallel_round:
+            deps.append(previous_round)
+        elif topology == "simultaneous" and rnd == 1 and i % agents == 0:
+            deps.append(previous_round)  # pierwsza tura po rundzie równoległej czeka na całą rundę
+        else:
+            deps.append([i - 1] if i else [])
+    return deps
+
+
+def _ancestors(deps: List[List[int]], turn: int) -> List[int]:
+    """Tury widoczne dla `turn` (jej zależności przechodnio), rosnąco."""
+    seen, stack = set(), list(deps[turn])
+    while stack:
+        j = stack.pop()
+        if j not in seen:
+            seen.add(j)
+            stack.extend(deps[j])
+    return sorted(seen)
+
+
+class TranscriptRenderer:
+    """
+    Zwięzły zapis dyskusji: jedna linia "Rola: treść" na wypowiedź (bez składni słowników).
+
+    Ostatni wyrenderowany widok jest cache'owany - kolejne widoki zwykle go tylko rozszerzają,
+    więc renderowane są wyłącznie nowe wypowiedzi. Jeden renderer na debatę.
+    """
+    def __init__(self):
+        self._keys = []
+        self._text = ""
+        # Liczba wyrenderowanych linii (cache działa, gdy rośnie o nowe wypowiedzi)
+        self.rendered = 0
+
+    @staticmethod
+    def line(message):
+        return f"{message['role']}: {' '.join(str(message['content']).split())}"
+
+    def render(self, messages):
+        keys = [(m["role"], m["content"]) for m in messages]
+        cached = len(self._keys)
+        if cached and cached <= len(keys) and keys[:cached] == self._keys:
+            text, new = self._text, messages[cached:]
+        else:
+            text, new = "", messages
+        if new:
+            lines = [self.line(m) for m in new]
+            self.rendered += len(lines)
+            text = "\n".join([text] + lines) if text else "\n".join(lines)
+        self._keys, self._text = keys, text
+        return text
+
+
 class SimpleDebate:
     """
     Klasa orkiestratora debaty.
+
+    Każda tura to osobne zadanie asyncio, które startuje, gdy tylko gotowe są tury, od których
+    zależy (plan_turns) - równoległe wypowiedzi idą do modelu naraz, a prompt następnej tury
+    powstaje od razu po ostatniej potrzebnej odpowiedzi. Wiele tematów (`run_many`) dzieli
+    jednego klienta: tempo wyznaczają jego semafor (GEMINI_MAX_CONCURRENCY) i limiter RPM/TPM,
+    a nie stałe pauzy.
+
+    Z `chat=True` każdy agent ma własną sesję czatu (GeminiGuard.start_chat) i wysyła tylko
+    wypowiedzi, których jeszcze nie widział; bez niej prompt zawiera zapis dyskusji w budżecie
+    `context_tokens` (starsze wypowiedzi streszczane).
+    W obu trybach koszt tury nie rośnie z rundami.
+
+    Z `detector` (ConvergenceDetector) liczba rund jest adaptacyjna: po każdej rundzie debata
+    może skończyć się wcześniej (zbieżność/powtórzenia), a bez zbieżności trwa dalej, aż do
+    `max_rounds`. Powód zakończenia trafia do statusu (`stop_reason`).
+
+    Z `transcript` (IOGuard w trybie stanowym) pełny zapis debat jest aktualizowany w pamięci
+    po każdej wypowiedzi, a na dysk trafia jednym zapisem na granicy rundy (lub z timera IOGuard).
     """
-    def __init__(self):
+    def __init__(
+        self,
+        agents: int = 2,
+        topology: str = "sequential",
+        client: GeminiGuard = None,
+        chat: bool = False,
+        context_tokens: int = 2000,
+        detector: ConvergenceDetector = None,
+        transcript=None,
+    ):
         self.api_key = os.getenv("GEMINI_API_KEY")
-        # Jeśli brak klucza, GeminiGuard obsłuży to ostrzeżeniem, ale debata może nie mieć sensu.
-        self.client = GeminiGuard(self.api_key)
-
-    async def debate_round(self, topic, stance_a, stance_b, round_num, history):
-        # Import wewnątrz metody, aby uniknąć cyklicznego importu z io_guard
-        from io_guard import IOGuard
-        
-        logger.info(f"--- Runda {round_num}: {topic} ---")
-
-        # 1. Optymalizacja pamięci
-        history = await optimize_context(history, max_tokens=2000, model_client=self.client)
-
-        # 2. Agent A (Pro)
-        # Używamy f-stringa z potrójnym cudzysłowem (escaped)
-        prompt_a = f"""
-        Jesteś Agentem A. Bronisz tezy: {stance_a}.
+        # Klient z puli procesu (współdzielony model i cache). Jeśli brak klucza, GeminiGuard
+        # obsłuży to ostrzeżeniem, ale debata może nie mieć sensu.
+        self.client = client or get_guard(self.api_key)
+        self.agents = make_agents(agents) if isinstance(agents, int) else list(agents)
+        plan_turns(topology, len(self.agents), 1)  # walidacja topologii
+        self.topology = topology
+        self.chat = chat
+        self.context_tokens = context_tokens
+        self.detector = detector
+        self.transcript = transcript
+        # Postęp debaty trafia też do dziennika zdarzeń (czytelnicy śledzą go od `seq`)
+        self.events = get_event_log()
+        self._board: Dict[str, Dict] = {}  # tryb wielu tematów: stan każdego tematu w statusie
+        self._multi = False
+
+    def _report(self, topic, delta, replace=False, flush=False):
+        """Zmiana statusu debaty; przy wielu tematach sekcja "debate" trzyma stan per temat."""
+        if not self._multi:
+            publish_status("debate", delta, replace=replace, flush=flush)
+            return
+        # Pełne historie nie trafiają do statusu - run_many zwraca je wywołującemu
+        delta = {k: v for k, v in delta.items() if k != "final_history"}
+        self._board[topic] = delta if replace else {**self._board.get(topic, {}), **delta}
+        active = sum(1 for t in self._board.values() if t.get("status") == "active")
+        publish_status(
+            "debate",
+            {
+                "status": "active" if active else "finished",
+                "active_topics": active,
+                "topics": {k: dict(v) for k, v in self._board.items()},
+            },
+            flush=flush,
+        )
+
+    def _prompt(self, topic, agent, transcript, previous):
+        prompt = f"""
+        Jesteś {agent['name']}. Bronisz tezy: {agent['stance']}.
         Temat: {topic}.
-        Historia dyskusji: {history}
-        
-        Twoja odpowiedź musi być zwięzła (max 3 zdania). Użyj mocnych argumentów.
+        Historia dyskusji:
+        {transcript}
+        """
+        if previous:
+            prompt += f"""
+        Odnieś się krytycznie do ostatniej wypowiedzi ({previous['role']}).
+        """
+        return prompt + f"""
+        {agent['style']} Twoja odpowiedź musi być zwięzła (max 3 zdania).
+        """
+
+    def _chat_message(self, topic, agent, new, previous, first):
+        """Wiadomość do sesji agenta: tylko nowe wypowiedzi (+ opis roli przy pierwszej)."""
+        parts = []
+        if first:
+            parts.append(
+                f"Jesteś {agent['name']}. Bronisz tezy: {agent['stance']}. Temat debaty: {topic}. "
+                f"{agent['style']} Każda odpowiedź max 3 zdania."
+            )
+        if new:
+            parts.append("Nowe wypowiedzi:\n" + "\n".join(TranscriptRenderer.line(m) for m in new))
+        parts.append(
+            f"Odnieś się krytycznie do: {previous['role']}. Twoja kolej."
+            if previous
+            else "Twoja kolej."
+        )
+        return "\n".join(parts)
+
+    async def _decide(self, topic, rounds_done, rounds, max_rounds):
+        """Po rundzie: (kontynuować?, powód zakończenia, miary zbieżności)."""
+        played = len(rounds_done)
+        if self.detector is None:
+            return played < rounds, "rounds", None
+        reason, scores = await self.detector.check(topic, rounds_done)
+        if reason:
+            return False, reason, scores
+        if played >= max_rounds:
+            return False, "max_rounds" if max_rounds > rounds else "rounds", scores
+        return True, None, scores
+
+    async def run(self, topic, rounds=3, max_rounds=None):
         """
-        response_a = await self.client.generate_content_async(prompt_a)
-        history.append({"role": "Agent A", "content": response_a})
-        print(f"🔵 Agent A: {response_a}")
-
-        # Zapis statusu
-        status_data = await IOGuard.read_json()
-        status_data.update({
-            'last_message': response_a,
-            'current_round': round_num,
-            'speaker': 'Agent A'
-        })
-        await IOGuard.write_json(status_data)
-
-        # 3. Agent B (Contra)
-        prompt_b = f"""
-        Jesteś Agentem B. Bronisz tezy: {stance_b}.
-        Odnieś się krytycznie do argumentu Agenta A: "{response_a}"
-        
-        Bądź cyniczny i zabawny. Max 3 zdania.
+        Debata na `rounds` rund. Z detektorem zbieżności może skończyć się wcześniej albo
+        potrwać dłużej - najwyżej `max_rounds` rund (domyślnie `rounds`).
         """
-        response_b = await self.client.generate_content_async(prompt_b)
-        history.append({"role": "Agent B", "content": response_b})
-        print(f"🔴 Agent B: {response_b}")
+        n = len(self.agents)
+        max_rounds = max(rounds, max_rounds or rounds) if self.detector else rounds
+        history = [None] * (n * max_rounds)
+        deps = plan_turns(self.topology, n, max_rounds)
+        done = [asyncio.Event() for _ in history]
+        # Runda r+1 startuje dopiero po decyzji o kontynuacji (gates[r] = True/False)
+        gates = [asyncio.get_running_loop().create_future() for _ in range(max_rounds)]
+        remaining = [n] * max_rounds
+        outcome = {"stop_reason": None, "rounds_played": 0, "convergence": None}
+        # Starsze wypowiedzi są streszczane w tle - tura nie czeka na kompaktowanie
+        compactor = ContextCompactor(self.client, max_tokens=self.context_tokens)
+        renderer = TranscriptRenderer()
+        sessions = (
+            [self.client.start_chat(max_history_tokens=self.context_tokens) for _ in self.agents]
+            if self.chat
+            else None
+        )
+        seen = [set() for _ in self.agents]  # tryb czatu: wypowiedzi już wysłane do sesji agenta
+
+        self._report(
+            topic,
+            {
+                "status": "active",
+                "topic": topic,
+                "rounds": rounds,
+                "max_rounds": max_rounds,
+                "agents": n,
+                "topology": self.topology,
+            },
+            replace=True,
+        )
+        self.events.emit("debate", "progress", status="active", topic=topic, rounds=rounds,
+                         max_rounds=max_rounds, agents=n, topology=self.topology)
+        if self.transcript is not None:
+            self.transcript.set(
+                (topic,),
+                {"status": "active", "topology": self.topology, "agents": n, "history": []},
+            )
+
+        async def close_round(rnd):
+            rounds_done = [history[r * n:(r + 1) * n] for r in range(rnd + 1)]
+            go_on, reason, scores = await self._decide(topic, rounds_done, rounds, max_rounds)
+            outcome.update(rounds_played=rnd + 1, convergence=scores)
+            if scores:
+                self._report(topic, {"convergence": scores})
+            if self.transcript is not None:
+                await self.transcript.flush_async()  # granica rundy: jeden zapis całego dokumentu
+            if go_on:
+                gates[rnd].set_result(True)
+                return
+            outcome["stop_reason"] = reason
+            for gate in gates[rnd:]:
+                if not gate.done():
+                    gate.set_result(False)
+
+        async def turn(i):
+            if i >= n and not await gates[i // n - 1]:
+                return  # debata zakończona przed tą rundą
+            for j in deps[i]:
+                await done[j].wait()
+            round_num, agent = i // len(self.agents) + 1, self.agents[i % len(self.agents)]
+            visible_turns = _ancestors(deps, i)
+            visible = [history[j] for j in visible_turns]
+            if round_num == 1 and i % len(self.agents) == 0:
+                logger.info(
+                    f"--- Debata: {topic} ({self.topology}, {len(self.agents)} agentów) ---"
+                )
+
+            previous = history[deps[i][-1]] if len(deps[i]) == 1 else None
+            started = time.monotonic()
+            if sessions:
+                slot = i % len(self.agents)
+                new = [
+                    j for j in visible_turns if j not in seen[slot] and j % len(self.agents) != slot
+                ]
+                message = self._chat_message(
+                    topic, agent, [history[j] for j in new], previous, first=not seen[slot]
+                )
+                seen[slot].update(new)
+                seen[slot].add(i)
+                response = await sessions[slot].send_message_async(
+                    message, priority=PRIORITY_BATCH, caller=f"debate:{topic}"
+                )
+            else:
+                # Pełna historia zostaje, do promptu trafia widok w budżecie
+                context = await compactor.compact(visible)
+                message = self._prompt(topic, agent, renderer.render(context), previous)
+                response = await self.client.generate_content_async(
+                    message, priority=PRIORITY_BATCH, caller=f"debate:{topic}"
+                )
+            history[i] = {"role": agent["name"], "content": response, "round": round_num}
+            done[i].set()
+            if self.transcript is not None:
+                self.transcript.append((topic, "history"), history[i])
 
-        # Zapis statusu
-        status_data['last_message'] = response_b
-        status_data['speaker'] = 'Agent B'
-        await IOGuard.write_json(status_data)
+            print(f"{agent['icon']} [{topic}] {agent['name']} (runda {round_num}): {response}")
+            self.events.emit("debate", "log", text=f"{agent['icon']} {agent['name']}: {response}",
+                             topic=topic, round=round_num, speaker=agent["name"],
+                             prompt_tokens=estimate_tokens(message),
+                             latency_s=round(time.monotonic() - started, 3))
+            # Zapis statusu - tylko zmiana sekcji "debate" (bez odczytu całego pliku)
+            self._report(
+                topic,
+                {"last_message": response, "current_round": round_num, "speaker": agent["name"]},
+            )
+            # Streszczenie dla kolejnych tur liczy się w tle, zanim będzie potrzebne
+            if not sessions:
+                compactor.prefetch(visible + [history[i]])
+            remaining[i // n] -= 1
+            if not remaining[i // n]:
+                await close_round(i // n)
 
+        tasks = [asyncio.ensure_future(turn(i)) for i in range(len(history))]
+        try:
+            await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:  # tury czekające na nieudaną wypowiedź nigdy by się nie doczekały
+                task.cancel()
+            raise
+        await compactor.wait_pending()
+
+        history = history[:outcome["rounds_played"] * n]
+        if self.transcript is not None:
+            # Kolejność chronologiczna tur (tury równoległe dopisywane są w kolejności ukończenia)
+            self.transcript.merge((topic,), {"status": "finished", "history": history, **outcome})
+            await self.transcript.flush_async()
+        self._report(
+            topic,
+            {"status": "finished", "topic": topic, "final_history": history, **outcome},
+            replace=True,
+            flush=not self._multi,
+        )
+        self.events.emit(
+            "debate",
+            "progress",
+            status="finished",
+            topic=topic,
+            rounds=outcome["rounds_played"],
+            stop_reason=outcome["stop_reason"],
+        )
+        logger.info(
+            f"Debata zakończona sukcesem: {topic} "
+            f"({outcome['rounds_played']} rund, {outcome['stop_reason']})"
+        )
         return history
 
-    async def run(self, topic, rounds=3):
-        from io_guard import IOGuard
-        
-        history = []
-        await IOGuard.write_json({"status": "active", "topic": topic, "rounds": rounds})
-        
-        for i in range(rounds):
-            history = await self.debate_round(topic, "Jestem ZA", "Jestem PRZECIW", i+1, history)
-            await asyncio.sleep(1) # Oddech dla API
-            
-        await IOGuard.write_json({"status": "finished", "final_history": history})
-        logger.info("Debata zakończona sukcesem.")
-        return history
\ No newline at end of file
+    async def run_many(
+        self, topics: List[str], rounds=3, workers=4, max_rounds=None
+    ) -> Dict[str, List[Dict]]:
+        """Wiele debat naraz: najwyżej `workers` tematów jednocześnie, wspólny klient i limity."""
+        self._multi = True
+        self._board = {}
+        queue = asyncio.Queue()
+        for topic in topics:
+            queue.put_nowait(topic)
+        results: Dict[str, List[Dict]] = {}
+
+        async def worker():
+            while True:
+                try:
+                    topic = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                try:
+                    results[topic] = await self.run(topic, rounds, max_rounds=max_rounds)
+                except Exception as e:
+                    logger.error(f"Debata nie powiodła się ({topic}): {e}")
+                    self._report(
+                        topic, {"status": "error", "topic": topic, "error": str(e)}, replace=True
+                    )
+                    results[topic] = []
+
+        try:
+            await asyncio.gather(*(worker() for _ in range(max(1, min(workers, len(topics) or 1)))))
+        finally:
+            self._multi = False
+        publish_status("debate", {"status": "finished", "active_topics": 0, "topics": self._board},
+                       replace=True, flush=True)
+        return {topic: results.get(topic, []) for topic in topics}
+
+
+def load_topics(path: str) -> List[str]:
+    """Tematy z pliku: jeden na linię (puste i zaczynające się od `#` są pomijane)."""
+    with open(path, "r", encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip() and not line.strip().startswith("#")]
@@ -0,0 +1,203 @@
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+from status_writer import file_lock
+
+logger = logging.getLogger(__name__)
+
+EVENT_LOG_FILE = os.getenv("REGIS_EVENT_LOG", "agent_events.jsonl")
+DEFAULT_MAX_BYTES = int(os.getenv("REGIS_EVENT_LOG_MAX_BYTES", str(1024 * 1024)))
+DEFAULT_SEGMENTS = int(os.getenv("REGIS_EVENT_LOG_SEGMENTS", "3"))
+SNAPSHOT_TAIL = 50
+
+
+class EventLog:
+    """
+    Dziennik zdarzeń agentów - plik JSON-lines, tylko dopisywanie.
+
+    Każde zdarzenie dostaje rosnący numer `seq` (również między procesami - dopisywanie
+    odbywa się pod blokadą pliku `<path>.lock`). Gdy aktywny plik przekroczy `max_bytes`,
+    jest przesuwany do `<path>.1` (starsze do `.2` ...), a zachowywanych jest najwyżej
+    `segments` plików - rozmiar dziennika jest ograniczony. Czytelnicy śledzą dziennik od
+    ostatnio widzianego `seq` (`read_since`) zamiast parsować cały dokument statusu.
+    """
+    def __init__(self, path: str = EVENT_LOG_FILE, max_bytes: int = DEFAULT_MAX_BYTES,
+                 segments: int = DEFAULT_SEGMENTS):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.segments = max(1, segments)
+        self._lock = threading.Lock()
+        self._known = None  # (rozmiar pliku, seq) po naszym ostatnim zapisie
+
+    # --- Zapis -------------------------------------------------------------
+
+    @contextmanager
+    def _file_lock(self):
+        with self._lock, file_lock(f"{self.path}.lock"):
+            yield
+
+    def _segment(self, n: int) -> str:
+        return self.path if n == 0 else f"{self.path}.{n}"
+
+    def _last_seq(self, size: int) -> int:
+        if self._known and self._known[0] == size:
+            return self._known[1]
+        for n in range(self.segments):
+            event = _last_event(self._segment(n))
+            if event is not None:
+                return event["seq"]
+        return 0
+
+    def _rotate(self):
+        for n in range(self.segments - 1, 0, -1):
+            source = self._segment(n - 1)
+            if os.path.exists(source):
+                os.replace(source, self._segment(n))
+        if self.segments == 1 and os.path.exists(self.path):
+            os.remove(self.path)
+
+    def append(self, source: str, type: str, **data) -> int:
+        """Dopisuje zdarzenie i zwraca jego `seq`."""
+        with self._file_lock():
+            size = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+            seq = self._last_seq(size) + 1
+            if size >= self.max_bytes:
+                self._rotate()
+                size = 0
+            event = {"seq": seq, "ts": round(time.time(), 3), "source": source, "type": type}
+            event.update(data)
+            line = (json.dumps(event, ensure_ascii=False, separators=(",", ":")) + "\n").encode(
+                "utf-8"
+            )
+            with open(self.path, "ab") as f:
+                f.write(line)
+            self._known = (size + len(line), seq)
+            return seq
+
+    def emit(self, source: str, type: str, **data) -> Optional[int]:
+        """Jak append, ale nie przerywa pracy agenta, gdy zapis się nie powiedzie."""
+        try:
+            return self.append(source, type, **data)
+        except Exception as e:
+            logger.error(f"Failed to append event: {e}")
+            return None
+
+    # --- Odczyt ------------------------------------------------------------
+
+    def read_since(self, since: int = 0, limit: int = None) -> List[Dict[str, Any]]:
+        """Zdarzenia o `seq` > `since`, od najstarszego.
+
+        Sięga do starszych segmentów tylko w razie potrzeby.
+        """
+        paths = []
+        for n in range(self.segments):
+            path = self._segment(n)
+            first = _first_event(path)
+            if first is None:
+                continue
+            paths.append(path)
+            if first["seq"] <= since + 1:
+                break
+
+        events = []
+        for path in reversed(paths):
+            for event in _read_events(path):
+                if event["seq"] > since:
+                    events.append(event)
+                    if limit and len(events) >= limit:
+                        return events
+        return events
+
+    def follow(self, since: int = 0, interval: float = 0.5) -> Iterator[Dict[str, Any]]:
+        """Nieskończony iterator nowych zdarzeń (odpytywanie co `interval` sekund)."""
+        while True:
+            events = self.read_since(since)
+            for event in events:
+                since = event["seq"]
+                yield event
+            if not events:
+                time.sleep(interval)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return fold(self.read_since(0))
+
+
+def _read_events(path: str) -> Iterator[Dict[str, Any]]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # niedokończona ostatnia linia (zapis w toku)
+    except FileNotFoundError:
+        return
+
+
+def _first_event(path: str) -> Optional[Dict[str, Any]]:
+    return next(_read_events(path), None)
+
+
+def _last_event(path: str, block: int = 4096) -> Optional[Dict[str, Any]]:
+    """Ostatnie kompletne zdarzenie w pliku - czyta tylko końcówkę."""
+    try:
+        with open(path, "rb") as f:
+            f.seek(0, os.SEEK_END)
+            end = f.tell()
+            start = max(0, end - block)
+            while True:
+                f.seek(start)
+                lines = f.read(end - start).splitlines()
+                for line in reversed(lines[1:] if start else lines):
+                    try:
+                        return json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                if start == 0:
+                    return None
+                start = max(0, start - block)
+    except FileNotFoundError:
+        return None
+
+
+def fold(
+    events: List[Dict[str, Any]], snapshot: Dict[str, Any] = None, tail: int = SNAPSHOT_TAIL
+) -> Dict[str, Any]:
+    """
+    Składa zdarzenia w migawkę stanu - osobno dla każdego źródła (jules, debate, ...).
+    Przyjmuje poprzednią migawkę, więc można ją aktualizować przyrostowo.
+    """
+    snapshot = snapshot or {"seq": 0, "sources": {}}
+    for event in events:
+        state = snapshot["sources"].setdefault(event["source"], {"timeline": [], "thinking": []})
+        fields = {k: v for k, v in event.items() if k not in ("seq", "ts", "source", "type")}
+        if event["type"] == "log":
+            text = fields.pop("text", "")
+            state["timeline"] = (state["timeline"] + [text])[-tail:]
+            state["live_log"] = text
+        elif event["type"] == "thinking":
+            state["thinking"] = fields.pop("items", [])
+        state.update(fields)
+        state["last_event"] = event["type"]
+        state["updated"] = event["ts"]
+        snapshot["seq"] = event["seq"]
+    return snapshot
+
+
+_default_logs: Dict[str, EventLog] = {}
+_default_lock = threading.Lock()
+
+
+def get_event_log(path: str = EVENT_LOG_FILE) -> EventLog:
+    """Jeden EventLog na plik w obrębie procesu (ścieżka względna do bieżącego katalogu)."""
+    key = os.path.abspath(path)
+    with _default_lock:
+        log = _default_logs.get(key)
+        if log is None:
+            log = _default_logs[key] = EventLog(key)
+        return log
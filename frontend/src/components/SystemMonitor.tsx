@@ -4,17 +4,33 @@ const SystemMonitor = () => {
   const [stats, setStats] = useState({ cpu: 0, ram: 0, battery: 100, net: 0 });
 
   useEffect(() => {
+    const apply = (data: any) => {
+      const sys = data.system ?? data;
+      if (sys.status === 'ONLINE') {setStats({ cpu: sys.cpu, ram: sys.ram, battery: sys.battery, net: sys.net_io || 0 });}
+    };
     const fetchData = async () => {
       try {
         const res = await fetch('http://localhost:5000/api/status');
-        const data = await res.json();
-        if (data.status === 'ONLINE') {setStats({ cpu: data.cpu, ram: data.ram, battery: data.battery, net: data.net_io || 0 });}
+        apply(await res.json());
       } catch (e) {
         setStats({cpu: Math.floor(Math.random()*30)+10, ram: 50, battery: 85, net: 0});
       }
     };
-    const interval = setInterval(fetchData, 2000);
-    return () => clearInterval(interval);
+
+    // Push channel first; polling only as a fallback when SSE is unavailable
+    let interval: ReturnType<typeof setInterval> | undefined;
+    const source = new EventSource('http://localhost:5000/api/status/stream');
+    source.onmessage = (event) => apply(JSON.parse(event.data));
+    source.onerror = () => {
+      if (source.readyState === EventSource.CLOSED && !interval) {
+        fetchData();
+        interval = setInterval(fetchData, 2000);
+      }
+    };
+    return () => {
+      source.close();
+      if (interval) clearInterval(interval);
+    };
   }, []);
 
   const Bar = ({ label, value }: { label: string, value: number }) => (
@@ -1,5 +1,12 @@
 import os
+import json
+import asyncio
+import weakref
+import time
+import hashlib
 import logging
+import threading
+from collections import OrderedDict, deque
 import google.generativeai as genai
 from google.api_core.exceptions import ResourceExhausted, ServiceUnavailable, InternalServerError
 from tenacity import (
@@ -9,36 +16,190 @@ from tenacity import (
     retry_if_exception_type,
     before_sleep_log
 )
+from background_loop import BackgroundLoop
+from response_cache import get_default_cache
+from rate_limiter import PRIORITY_DEFAULT, estimate_tokens, get_scheduler
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_MODEL = "gemini-2.0-flash-exp"
+MOCK_RESPONSE = "[[MOCK RESPONSE: Brak klucza API. Ustaw GEMINI_API_KEY.]]"
+
+# genai.configure() ustawia globalnego klienta SDK - wywołujemy go tylko przy zmianie klucza,
+# żeby nie zrywać już rozgrzanych kanałów HTTP/gRPC.
+_configure_lock = threading.Lock()
+_configured_key = None
+
+
+def _configure(api_key):
+    global _configured_key
+    with _configure_lock:
+        if _configured_key != api_key:
+            genai.configure(api_key=api_key)
+            _configured_key = api_key
+
+
+# Natywny klient async SDK (grpc.aio) jest globalny dla procesu i związany z pętlą, na której
+# powstał, a CLI wołają asyncio.run() wielokrotnie - druga pętla dostałaby "Event loop is closed".
+# Dlatego wszystkie wywołania async Gemini wykonują się na jednej pętli żyjącej tyle co proces;
+# korutyny z innych pętli są na nią przekazywane (`_on_gemini_loop`).
+_async_loop = BackgroundLoop(name="gemini-async")
+
+# Limit równoległych wywołań async (na pętlę zdarzeń). Semafor tworzymy leniwie dla każdej
+# pętli osobno, bo asyncio.Semaphore jest związany z pętlą.
+_max_concurrency = int(os.getenv("GEMINI_MAX_CONCURRENCY", "64"))
+_semaphores = weakref.WeakKeyDictionary()
+_in_flight = 0
+
+
+def get_async_loop():
+    """Wspólna pętla wywołań async Gemini (np. dla serwera ASGI backendu)."""
+    return _async_loop
+
+
+def run_async(coro, timeout=None):
+    """Wykonuje korutynę na pętli Gemini i czeka na wynik - zamiast asyncio.run() w kodzie sync."""
+    return _async_loop.run(coro, timeout=timeout)
+
+
+async def _on_gemini_loop(coro):
+    """Czeka na `coro` wykonywaną na pętli Gemini (bezpośrednio, jeśli już na niej jesteśmy)."""
+    loop = _async_loop.loop
+    if asyncio.get_running_loop() is loop:
+        return await coro
+    return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, loop))
+
+
+async def _next_chunk(stream):
+    try:
+        return True, await stream.__anext__()
+    except StopAsyncIteration:
+        return False, None
+
+
+async def _iterate_on_gemini_loop(stream):
+    """Przekazuje fragmenty async generatora działającego na pętli Gemini do bieżącej pętli."""
+    loop = _async_loop.loop
+    if asyncio.get_running_loop() is loop:
+        async for chunk in stream:
+            yield chunk
+        return
+    try:
+        while True:
+            more, chunk = await _on_gemini_loop(_next_chunk(stream))
+            if not more:
+                return
+            yield chunk
+    finally:
+        asyncio.run_coroutine_threadsafe(stream.aclose(), loop)
+
+
+async def _limited(coro):
+    """Wykonuje `coro` w limicie GEMINI_MAX_CONCURRENCY, licząc zapytania w toku."""
+    global _in_flight
+    async with _get_semaphore():
+        _in_flight += 1
+        try:
+            return await coro
+        finally:
+            _in_flight -= 1
+
+
+def set_max_concurrency(limit):
+    """Zmienia limit równoległych zapytań async (dotyczy nowych pętli zdarzeń)."""
+    global _max_concurrency
+    _max_concurrency = max(1, int(limit))
+    _semaphores.clear()
+
+
+def _get_semaphore():
+    loop = asyncio.get_running_loop()
+    semaphore = _semaphores.get(loop)
+    if semaphore is None:
+        semaphore = _semaphores[loop] = asyncio.Semaphore(_max_concurrency)
+    return semaphore
+
+
+class StreamInterruptedError(RuntimeError):
+    """Strumień urwał się po wysłaniu części odpowiedzi - wywołujący ma już niepełny tekst."""
+
+
+def _usage_tokens(response):
+    usage = getattr(response, "usage_metadata", None)
+    return getattr(usage, "total_token_count", 0) or 0
+
+
+def _freeze(value):
+    """Stabilna reprezentacja konfiguracji (dict / GenerationConfig / lista) do kluczy puli."""
+    if value is None:
+        return None
+    if not isinstance(value, (dict, list, tuple)):
+        value = getattr(value, "__dict__", value)
+    return json.dumps(value, sort_keys=True, default=str)
+
+
 class GeminiGuard:
     """
     Wrapper na klienta Gemini zapewniający obsługę błędów, retry policy
     oraz (w przyszłości) zliczanie tokenów.
     """
-    def __init__(self, api_key=None, model_name="gemini-2.0-flash-exp"):
+    def __init__(self, api_key=None, model_name=DEFAULT_MODEL, generation_config=None,
+                 safety_settings=None):
         self.api_key = api_key or os.getenv("GEMINI_API_KEY")
+        self.model_name = model_name
+        # Odcisk konfiguracji modelu - część klucza cache odpowiedzi
+        self.config_fingerprint = [_freeze(generation_config), _freeze(safety_settings)]
         if not self.api_key:
             # Fallback dla testów lokalnych - OSTRZEŻENIE
             logger.warning("Brak GEMINI_API_KEY. Próba uruchomienia w trybie mock (jeśli brak klucza).")
             # W produkcji tutaj powinien być raise ValueError
-        
+
         if self.api_key:
-            genai.configure(api_key=self.api_key)
-            self.model = genai.GenerativeModel(model_name)
+            _configure(self.api_key)
+            self.model = genai.GenerativeModel(
+                model_name,
+                generation_config=generation_config,
+                safety_settings=safety_settings
+            )
         else:
             self.model = None
 
+    def _cache_lookup(self, prompt, temperature, use_cache):
+        """Zwraca (cache, klucz, trafienie) - cache jest None, gdy wyłączony."""
+        cache = get_default_cache() if use_cache else None
+        if cache is None:
+            return None, None, None
+        key = cache.make_key(self.model_name, prompt, temperature, self.config_fingerprint)
+        cached = cache.get(key)
+        if cached is not None:
+            logger.debug("Cache HIT dla promptu (%d znaków)", len(prompt))
+        return cache, key, cached
+
+    def generate_content(self, prompt, temperature=0.7, use_cache=True, priority=PRIORITY_DEFAULT,
+                         caller=None):
+        if not self.model:
+             return MOCK_RESPONSE
+
+        cache, key, cached = self._cache_lookup(prompt, temperature, use_cache)
+        if cached is not None:
+            return cached
+
+        text = self._generate(prompt, temperature, priority, caller)
+        if cache is not None:
+            cache.set(key, text)
+        return text
+
     @retry(
         wait=wait_random_exponential(multiplier=1, max=60),
         stop=stop_after_attempt(5),
         retry=retry_if_exception_type((ResourceExhausted, ServiceUnavailable, InternalServerError)),
         before_sleep=before_sleep_log(logger, logging.WARNING)
     )
-    def generate_content(self, prompt, temperature=0.7):
-        if not self.model:
-             return "[[MOCK RESPONSE: Brak klucza API. Ustaw GEMINI_API_KEY.]]"
+    def _generate(self, prompt, temperature, priority, caller=None):
+        # Każda próba (także ponowiona) przechodzi przez wspólny limiter RPM/TPM
+        scheduler = get_scheduler()
+        estimated = estimate_tokens(prompt)
+        scheduler.acquire(estimated, priority=priority, caller=caller)
         try:
             response = self.model.generate_content(
                 prompt,
@@ -46,18 +207,389 @@ class GeminiGuard:
                     temperature=temperature
                 )
             )
+            scheduler.record_usage(estimated, _usage_tokens(response))
             return response.text
         except Exception as e:
             logger.error(f"Błąd generowania treści: {e}")
             raise
 
-    async def generate_content_async(self, prompt, temperature=0.7):
-        """Wersja asynchroniczna dla modułu debaty."""
-        import asyncio
-        loop = asyncio.get_running_loop()
-        return await loop.run_in_executor(None, self.generate_content, prompt, temperature)
+    async def generate_content_async(self, prompt, temperature=0.7, use_cache=True,
+                                     priority=PRIORITY_DEFAULT, caller=None):
+        """
+        Wersja asynchroniczna dla modułu debaty.
+
+        Korzysta z natywnego `generate_content_async` SDK - nie zajmuje wątku na czas
+        zapytania. Samo zapytanie wykonuje się na pętli Gemini (można je wywołać z dowolnej
+        pętli), a liczbę równoległych zapytań ogranicza semafor (GEMINI_MAX_CONCURRENCY).
+        """
+        if not self.model:
+            return MOCK_RESPONSE
+
+        cache, key, cached = self._cache_lookup(prompt, temperature, use_cache)
+        if cached is not None:
+            return cached
+
+        text = await _on_gemini_loop(
+            _limited(self._generate_async(prompt, temperature, priority, caller))
+        )
+
+        if cache is not None:
+            cache.set(key, text)
+        return text
+
+    # tenacity rozpoznaje korutynę i używa AsyncRetrying (asyncio.sleep zamiast time.sleep)
+    @retry(
+        wait=wait_random_exponential(multiplier=1, max=60),
+        stop=stop_after_attempt(5),
+        retry=retry_if_exception_type((ResourceExhausted, ServiceUnavailable, InternalServerError)),
+        before_sleep=before_sleep_log(logger, logging.WARNING)
+    )
+    async def _generate_async(self, prompt, temperature, priority, caller=None):
+        scheduler = get_scheduler()
+        estimated = estimate_tokens(prompt)
+        await scheduler.acquire_async(estimated, priority=priority, caller=caller)
+        try:
+            response = await self.model.generate_content_async(
+                prompt,
+                generation_config=genai.types.GenerationConfig(
+                    temperature=temperature
+                )
+            )
+            scheduler.record_usage(estimated, _usage_tokens(response))
+            return response.text
+        except Exception as e:
+            logger.error(f"Błąd generowania treści (async): {e}")
+            raise
+
+    def start_chat(self, max_history_tokens=None):
+        """Sesja wieloturowa - wywołujący wysyła tylko nową turę (patrz GeminiChat)."""
+        return GeminiChat(self, max_history_tokens=max_history_tokens)
+
+    def stream_content(self, prompt, temperature=0.7, use_cache=True, priority=PRIORITY_DEFAULT,
+                       caller=None):
+        """
+        Generator zwracający kolejne fragmenty odpowiedzi w miarę ich generowania.
+
+        Retry obejmuje nawiązanie strumienia i czekanie na pierwszy fragment. Błąd po
+        wysłaniu pierwszego fragmentu kończy strumień wyjątkiem StreamInterruptedError.
+        Pełna odpowiedź trafia do cache po zakończeniu.
+        """
+        if not self.model:
+            yield MOCK_RESPONSE
+            return
+
+        cache, key, cached = self._cache_lookup(prompt, temperature, use_cache)
+        if cached is not None:
+            yield cached
+            return
+
+        estimated = estimate_tokens(prompt)
+        response, first, chunks = self._open_stream(
+            prompt, temperature, priority, estimated, caller
+        )
+        parts = []
+        if first:
+            parts.append(first)
+            yield first
+        try:
+            for chunk in chunks:
+                text = chunk.text
+                if text:
+                    parts.append(text)
+                    yield text
+        except Exception as e:
+            logger.error(f"Błąd strumieniowania treści: {e}")
+            raise StreamInterruptedError(
+                f"Strumień przerwany po {len(parts)} fragmentach: {e}"
+            ) from e
+
+        get_scheduler().record_usage(estimated, _usage_tokens(response))
+        if cache is not None:
+            cache.set(key, "".join(parts))
+
+    @retry(
+        wait=wait_random_exponential(multiplier=1, max=60),
+        stop=stop_after_attempt(5),
+        retry=retry_if_exception_type((ResourceExhausted, ServiceUnavailable, InternalServerError)),
+        before_sleep=before_sleep_log(logger, logging.WARNING)
+    )
+    def _open_stream(self, prompt, temperature, priority, estimated, caller=None):
+        """(odpowiedź, pierwszy fragment albo None, reszta fragmentów) - ponawiane w całości."""
+        get_scheduler().acquire(estimated, priority=priority, caller=caller)
+        response = self.model.generate_content(
+            prompt,
+            generation_config=genai.types.GenerationConfig(
+                temperature=temperature
+            ),
+            stream=True
+        )
+        chunks = iter(response)
+        for chunk in chunks:
+            if chunk.text:
+                return response, chunk.text, chunks
+        return response, None, chunks
+
+
+    async def stream_content_async(self, prompt, temperature=0.7, use_cache=True,
+                                   priority=PRIORITY_DEFAULT, caller=None):
+        """
+        Asynchroniczny odpowiednik stream_content (async generator) dla serwera ASGI.
+
+        Czekanie na kolejne fragmenty nie zajmuje wątku; strumień działa na pętli Gemini.
+        Retry i błędy po pierwszym fragmencie (StreamInterruptedError) oraz cache pełnej
+        odpowiedzi - jak w wersji synchronicznej.
+        """
+        if not self.model:
+            yield MOCK_RESPONSE
+            return
+
+        cache, key, cached = self._cache_lookup(prompt, temperature, use_cache)
+        if cached is not None:
+            yield cached
+            return
+
+        parts = []
+        stream = self._stream_async(prompt, temperature, priority, caller)
+        async for text in _iterate_on_gemini_loop(stream):
+            parts.append(text)
+            yield text
+
+        if cache is not None:
+            cache.set(key, "".join(parts))
+
+    async def _stream_async(self, prompt, temperature, priority, caller=None):
+        """Strumień fragmentów na pętli Gemini, w limicie równoległych zapytań."""
+        global _in_flight
+        estimated = estimate_tokens(prompt)
+        async with _get_semaphore():
+            _in_flight += 1
+            sent = 0
+            try:
+                response, first, chunks = await self._open_stream_async(
+                    prompt, temperature, priority, estimated, caller
+                )
+                if first:
+                    sent += 1
+                    yield first
+                async for chunk in chunks:
+                    text = chunk.text
+                    if text:
+                        sent += 1
+                        yield text
+            except Exception as e:
+                logger.error(f"Błąd strumieniowania treści (async): {e}")
+                if sent:
+                    raise StreamInterruptedError(
+                        f"Strumień przerwany po {sent} fragmentach: {e}"
+                    ) from e
+                raise
+            finally:
+                _in_flight -= 1
+        get_scheduler().record_usage(estimated, _usage_tokens(response))
+
+    @retry(
+        wait=wait_random_exponential(multiplier=1, max=60),
+        stop=stop_after_attempt(5),
+        retry=retry_if_exception_type((ResourceExhausted, ServiceUnavailable, InternalServerError)),
+        before_sleep=before_sleep_log(logger, logging.WARNING)
+    )
+    async def _open_stream_async(self, prompt, temperature, priority, estimated, caller=None):
+        """Jak _open_stream: ponawiane jest wszystko do pierwszego fragmentu włącznie."""
+        await get_scheduler().acquire_async(estimated, priority=priority, caller=caller)
+        response = await self.model.generate_content_async(
+            prompt,
+            generation_config=genai.types.GenerationConfig(
+                temperature=temperature
+            ),
+            stream=True
+        )
+        chunks = aiter(response)
+        async for chunk in chunks:
+            if chunk.text:
+                return response, chunk.text, chunks
+        return response, None, chunks
+
+class GeminiChat:
+    """
+    Sesja czatu (`model.start_chat`) z tymi samymi zabezpieczeniami co GeminiGuard.
+
+    Wywołujący przekazuje tylko nową wiadomość - historię trzyma sesja. API Gemini jest
+    bezstanowe (SDK dosyła historię w każdym zapytaniu), dlatego historia jest ograniczona
+    do `max_history_tokens`: najstarsze wymiany (pytanie + odpowiedź) są odrzucane, więc
+    koszt kolejnych tur nie rośnie z długością rozmowy. Bez cache odpowiedzi - wynik zależy
+    od stanu sesji.
+    """
+    def __init__(self, guard, max_history_tokens=None):
+        self.guard = guard
+        self.max_history_tokens = max_history_tokens
+        self._session = guard.model.start_chat(history=[]) if guard.model else None
+        self._exchanges = deque()  # tokeny kolejnych wymian obecnych w historii sesji
+        self.history_tokens = 0
+
+    async def send_message_async(
+        self, text, temperature=0.7, priority=PRIORITY_DEFAULT, caller=None
+    ):
+        if self._session is None:
+            return MOCK_RESPONSE
+        reply = await _on_gemini_loop(
+            _limited(self._send_async(text, temperature, priority, caller))
+        )
+        self._exchanges.append(estimate_tokens(text) + estimate_tokens(reply))
+        self.history_tokens += self._exchanges[-1]
+        self._trim()
+        return reply
+
+    def _trim(self):
+        if not self.max_history_tokens:
+            return
+        dropped = 0
+        while len(self._exchanges) > 1 and self.history_tokens > self.max_history_tokens:
+            self.history_tokens -= self._exchanges.popleft()
+            dropped += 1
+        if dropped:
+            self._session.history = self._session.history[2 * dropped:]
+
+    @retry(
+        wait=wait_random_exponential(multiplier=1, max=60),
+        stop=stop_after_attempt(5),
+        retry=retry_if_exception_type((ResourceExhausted, ServiceUnavailable, InternalServerError)),
+        before_sleep=before_sleep_log(logger, logging.WARNING)
+    )
+    async def _send_async(self, text, temperature, priority, caller=None):
+        # Limiter liczy całe zapytanie: historię sesji + nową wiadomość
+        scheduler = get_scheduler()
+        estimated = self.history_tokens + estimate_tokens(text)
+        await scheduler.acquire_async(estimated, priority=priority, caller=caller)
+        try:
+            response = await self._session.send_message_async(
+                text,
+                generation_config=genai.types.GenerationConfig(
+                    temperature=temperature
+                )
+            )
+            scheduler.record_usage(estimated, _usage_tokens(response))
+            return response.text
+        except Exception as e:
+            logger.error(f"Błąd wiadomości czatu (async): {e}")
+            raise
+
+
+class GeminiPool:
+    """
+    Współdzielony, bezpieczny wątkowo rejestr instancji GeminiGuard.
+
+    Klucz: (api_key, model_name, generation_config, safety_settings). Rozgrzany model
+    (wraz z kanałem transportowym SDK) jest używany ponownie zamiast budowania go
+    przy każdym żądaniu. Rozmiar jest ograniczony (LRU), a nieużywane wpisy
+    wygasają po `idle_ttl` sekundach.
+    """
+    def __init__(self, max_size=8, idle_ttl=900.0):
+        self.max_size = max_size
+        self.idle_ttl = idle_ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # klucz -> [guard, last_used, build_time]
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.build_time_total = 0.0
+        self.build_time_saved = 0.0
+
+    def get(self, api_key=None, model_name=DEFAULT_MODEL, generation_config=None,
+            safety_settings=None):
+        api_key = api_key or os.getenv("GEMINI_API_KEY")
+        key = (
+            hashlib.sha256(api_key.encode("utf-8")).hexdigest() if api_key else None,
+            model_name,
+            _freeze(generation_config),
+            _freeze(safety_settings),
+        )
+        now = time.monotonic()
+
+        with self._lock:
+            self._evict_idle(now)
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry[1] = now
+                self._entries.move_to_end(key)
+                self.hits += 1
+                self.build_time_saved += entry[2]
+                return entry[0]
+
+            self.misses += 1
+            start = time.perf_counter()
+            guard = GeminiGuard(
+                api_key=api_key,
+                model_name=model_name,
+                generation_config=generation_config,
+                safety_settings=safety_settings
+            )
+            build_time = time.perf_counter() - start
+            self.build_time_total += build_time
+            self._entries[key] = [guard, now, build_time]
+
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+            return guard
+
+    def _evict_idle(self, now):
+        if not self.idle_ttl:
+            return
+        expired = [
+            k for k, (_, last_used, _) in self._entries.items() if now - last_used > self.idle_ttl
+        ]
+        for k in expired:
+            del self._entries[k]
+            self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            requests = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / requests, 4) if requests else 0.0,
+                "build_time_total_s": round(self.build_time_total, 4),
+                "build_time_saved_s": round(self.build_time_saved, 4),
+            }
+
+
+_pool = GeminiPool(
+    max_size=int(os.getenv("GEMINI_POOL_SIZE", "8")),
+    idle_ttl=float(os.getenv("GEMINI_POOL_IDLE_TTL", "900"))
+)
+
+
+def get_guard(api_key=None, model_name=DEFAULT_MODEL, generation_config=None, safety_settings=None):
+    """Zwraca współdzieloną instancję GeminiGuard z puli procesu."""
+    return _pool.get(api_key, model_name, generation_config, safety_settings)
+
+
+def get_stats():
+    """Statystyki warstwy klienta Gemini (pula, cache odpowiedzi, async, planista zapytań)."""
+    cache = get_default_cache()
+    return {
+        "pool": _pool.stats(),
+        "cache": cache.stats() if cache is not None else None,
+        "async": {"max_concurrency": _max_concurrency, "in_flight": _in_flight},
+        "scheduler": get_scheduler().stats(),
+    }
+
 
 # Funkcja dla wstecznej kompatybilności z regis.py
-def generate_content_safe(prompt, model_name="gemini-2.0-flash-exp"):
-    guard = GeminiGuard(model_name=model_name)
-    return guard.generate_content(prompt)
\ No newline at end of file
+def generate_content_safe(prompt, model_name=DEFAULT_MODEL, priority=PRIORITY_DEFAULT):
+    guard = get_guard(model_name=model_name)
+    return guard.generate_content(prompt, priority=priority)
+
+
+def stream_content_safe(prompt, model_name=DEFAULT_MODEL, priority=PRIORITY_DEFAULT):
+    """Strumieniowa wersja generate_content_safe - generator fragmentów odpowiedzi."""
+    guard = get_guard(model_name=model_name)
+    yield from guard.stream_content(prompt, priority=priority)
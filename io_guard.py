@@ -3,16 +3,137 @@ import os
 import aiofiles
 import argparse
 import asyncio
+import logging
+import threading
+from status_writer import write_atomic
 # Importujemy SimpleDebate wewnątrz funkcji main, aby uniknąć problemów przy imporcie cyklicznym,
 # lub jeśli plik debaty jeszcze nie istnieje w momencie startu interpretera (rzadkie, ale możliwe w fix script).
 
 STATUS_FILE = "status_report.json"
+logger = logging.getLogger(__name__)
 
 class IOGuard:
     """
     Zarządza bezpiecznym zapisem i odczytem stanu (Atomic Write).
     Chroni przed uszkodzeniem pliku JSON przy przerwaniu zasilania lub race condition.
+
+    Metody statyczne (read_json/write_json) to tryb bezstanowy: pełny odczyt lub zapis pliku.
+    Instancja (`IOGuard(path)`) to tryb stanowy: dokument żyje w pamięci, zmiany przychodzą
+    jako operacje `patch` (set/merge/append/delete), a na dysk trafia jeden atomowy zapis
+    na `flush()` - wołany na granicach rund albo co `flush_interval` s przez wątek w tle.
+    Zapis jest pomijany, gdy od ostatniego nic się nie zmieniło; `fsync` jest opcjonalny.
     """
+    def __init__(self, filepath=STATUS_FILE, flush_interval=1.0, fsync=False, load=True):
+        self.filepath = filepath
+        self.flush_interval = flush_interval
+        self.fsync = fsync
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._dirty = False
+        self.patches = 0
+        self.writes = 0
+        self.document = {}
+        if load:
+            try:
+                with open(filepath, 'r', encoding='utf-8') as f:
+                    loaded = json.load(f)
+                if isinstance(loaded, dict):
+                    self.document = loaded
+            except (OSError, ValueError):
+                pass
+
+    # --- Tryb stanowy: operacje na dokumencie w pamięci ----------------------
+
+    def _parent(self, path):
+        node = self.document
+        for key in path[:-1]:
+            node = node.setdefault(key, {})
+        return node
+
+    def patch(self, ops):
+        """Stosuje listę operacji `(op, ścieżka, wartość)`; ścieżka to krotka kluczy."""
+        with self._lock:
+            for op, path, *value in ops:
+                parent, key = self._parent(path), path[-1]
+                if op == "set":
+                    parent[key] = value[0]
+                elif op == "merge":
+                    parent.setdefault(key, {}).update(value[0])
+                elif op == "append":
+                    parent.setdefault(key, []).append(value[0])
+                elif op == "delete":
+                    parent.pop(key, None)
+                else:
+                    raise ValueError(f"Nieznana operacja IOGuard.patch: {op}")
+                self.patches += 1
+            self._dirty = True
+        if self.flush_interval and self._thread is None:
+            self._start()
+
+    def set(self, path, value):
+        self.patch([("set", path, value)])
+
+    def merge(self, path, value):
+        self.patch([("merge", path, value)])
+
+    def append(self, path, value):
+        self.patch([("append", path, value)])
+
+    def delete(self, path):
+        self.patch([("delete", path)])
+
+    def flush(self):
+        """Jeden atomowy zapis dokumentu, jeśli coś się zmieniło. Zwraca True, gdy zapisano."""
+        with self._write_lock:
+            with self._lock:
+                if not self._dirty:
+                    return False
+                data = json.dumps(self.document, ensure_ascii=False, separators=(",", ":")).encode(
+                    "utf-8"
+                )
+                self._dirty = False
+            try:
+                write_atomic(self.filepath, data, fsync=self.fsync)
+            except OSError as e:
+                with self._lock:
+                    self._dirty = True
+                logger.error(f"Błąd zapisu IOGuard: {e}")
+                return False
+            self.writes += 1
+            return True
+
+    async def flush_async(self):
+        """flush() w wątku roboczym - pętla zdarzeń nie czeka na dysk."""
+        return await asyncio.to_thread(self.flush)
+
+    def _start(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name="ioguard-flush", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+
+    def close(self):
+        """Zatrzymuje wątek zapisu i zapisuje ostatnie zmiany."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # --- Tryb bezstanowy -------------------------------------------------------
     
     @staticmethod
     async def read_json(filepath=STATUS_FILE):
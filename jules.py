@@ -1,17 +1,24 @@
 import os
 import sys
-import json
 import time
+import asyncio
 import logging
-import google.generativeai as genai
-from typing import Dict, Any, List
+from functools import partial
+from typing import Dict, Any, List, Callable, Optional
+from audit_index import AuditIndex, content_hash
+from chunker import map_reduce
+from gemini_client import get_guard, run_async
+from rate_limiter import PRIORITY_BATCH
+from response_cache import enable_default_cache
+from event_log import EVENT_LOG_FILE, get_event_log
+from status_client import STATUS_FILE, publish_status
+from status_writer import TIMELINE_TAIL
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
 # Constants
-STATUS_FILE = "status_report.json"
 PROTOCOL_FILE = "GEMINI.md"
 
 # Load API Key
@@ -19,10 +26,9 @@ GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY") or os.getenv("GEMINI_API_KEY") or o
 if not GOOGLE_API_KEY:
     logger.error("Missing Google API Key")
     # We continue, assuming the agent might handle it or fail gracefully later
-else:
-    genai.configure(api_key=GOOGLE_API_KEY)
 
 # Model Configuration
+MODEL_NAME = "gemini-2.0-flash"
 GENERATION_CONFIG = {
     "temperature": 0.7,
     "top_p": 0.95,
@@ -31,6 +37,19 @@ GENERATION_CONFIG = {
     "response_mime_type": "text/plain",
 }
 
+# Bump when prompts change - stored audits from older prompt versions are not reused
+PROMPT_VERSION = "4.0"
+
+# Files longer than this are audited chunk by chunk (map-reduce) instead of inline
+INLINE_LIMIT = 10000
+
+# Agents analysed concurrently in pipeline mode: (name, persona, focus)
+AGENTS = [
+    ("Architekt", "The Idealist", "Czystość kodu, wzorce."),
+    ("Hacker", "The Cynic", "Bezpieczeństwo, edge-cases."),
+    ("PM", "The Pragmatist", "Koszty, czas, priorytety."),
+]
+
 SAFETY_SETTINGS = [
     {"category": "HARM_CATEGORY_HARASSMENT", "threshold": "BLOCK_NONE"},
     {"category": "HARM_CATEGORY_HATE_SPEECH", "threshold": "BLOCK_NONE"},
@@ -38,82 +57,250 @@ SAFETY_SETTINGS = [
     {"category": "HARM_CATEGORY_DANGEROUS_CONTENT", "threshold": "BLOCK_NONE"},
 ]
 
-def update_status(phase: str, percent: int, logs: List[str], thinking: List[str] = None):
-    """Updates the status_report.json file for the frontend."""
+def update_status(phase: str, percent: int, logs: List[str], thinking: List[str] = None,
+                  eta: str = None, extra: Dict[str, Any] = None, workdir: str = None,
+                  emitted: Dict[str, Any] = None):
+    """
+    Updates the "jules" section of status_report.json for the frontend.
+
+    The section goes to the backend status broker; without a broker it is written directly
+    (coalesced over JULES_STATUS_WINDOW, atomic, other sections left intact). Only the last
+    TIMELINE_TAIL timeline entries are sent, so the cost does not grow with the audit.
+    The final status (100%) is written immediately. Every call also appends only what
+    changed (new timeline entries, phase, thinking) to the event log (agent_events.jsonl).
+    Relative status and event-log paths resolve against `workdir` (default: current directory).
+    `emitted` is the run's own record of what was already logged (new_emitted_state()); each
+    audit run passes its own, so concurrent or consecutive runs never share it. Without it
+    the whole timeline is logged.
+    """
     status_data = {
         "status": "🟡 W trakcie" if percent < 100 else "🟢 Finalna",
         "mode": "🤖 Generatywny (Jules Auditor)",
         "progress": {
             "phase": f"{phase} – {percent}%",
-            "eta": "Obliczanie..." if percent < 100 else "Zakończono",
-            "timeline": logs,
+            "eta": eta or ("Obliczanie..." if percent < 100 else "Zakończono"),
+            "timeline": logs[-TIMELINE_TAIL:],
+            "timeline_total": len(logs),
             "live_log": logs[-1] if logs else "Inicjalizacja..."
         },
-        "thinking": thinking or []
+        "thinking": list(thinking or [])
     }
-
-    try:
-        with open(STATUS_FILE, 'w', encoding='utf-8') as f:
-            json.dump(status_data, f, indent=2, ensure_ascii=False)
-    except Exception as e:
-        logger.error(f"Failed to update status file: {e}")
-
-def run_gemini(prompt: str) -> str:
-    """Runs a single prompt against the Gemini model."""
+    if extra:
+        status_data.update(extra)
+
+    publish_status("jules", status_data, replace=True, flush=percent >= 100,
+                   path=os.path.join(workdir, STATUS_FILE) if workdir else None)
+    _emit_events(phase, percent, logs, thinking, eta, extra, workdir,
+                 emitted if emitted is not None else new_emitted_state())
+
+def new_emitted_state() -> Dict[str, Any]:
+    """What one audit run has already sent to the event log: timeline length, progress, thinking."""
+    return {"timeline": None, "count": 0, "progress": None, "thinking": None}
+
+def _emit_events(phase: str, percent: int, logs: List[str], thinking: Optional[List[str]],
+                 eta: Optional[str], extra: Optional[Dict[str, Any]], workdir: str,
+                 emitted: Dict[str, Any]):
+    events = get_event_log(os.path.join(workdir or "", EVENT_LOG_FILE))
+    start = emitted["count"] if emitted["timeline"] is logs else 0
+    for text in logs[start:]:
+        events.emit("jules", "log", text=text)
+    emitted.update(timeline=logs, count=len(logs))
+
+    progress = {"phase": phase, "percent": percent, "eta": eta, **(extra or {})}
+    if progress != emitted["progress"]:
+        events.emit("jules", "progress", **progress)
+        emitted["progress"] = progress
+    if thinking and thinking != emitted["thinking"]:
+        events.emit("jules", "thinking", items=list(thinking))
+        emitted["thinking"] = list(thinking)
+
+# status(phase, percent, timeline, thinking) - update_status for single audits,
+# a no-op in batch mode
+StatusCallback = Callable[[str, int, List[str], Optional[List[str]]], None]
+
+def _no_status(phase: str, percent: int, logs: List[str], thinking: List[str] = None):
+    pass
+
+def _guard():
+    return get_guard(GOOGLE_API_KEY, MODEL_NAME, GENERATION_CONFIG, SAFETY_SETTINGS)
+
+async def run_gemini_async(prompt: str) -> str:
+    """
+    Runs a single prompt against the Gemini model (pooled client, reused across calls).
+    Async, so independent prompts run concurrently; errors come back as "❌ Błąd API Gemini".
+    """
     try:
-        model = genai.GenerativeModel(
-            model_name="gemini-2.0-flash",
-            generation_config=GENERATION_CONFIG,
-            safety_settings=SAFETY_SETTINGS
+        return await _guard().generate_content_async(
+            prompt,
+            temperature=GENERATION_CONFIG["temperature"],
+            priority=PRIORITY_BATCH,
+            caller="jules",
         )
-        response = model.generate_content(prompt)
-        return response.text
     except Exception as e:
         logger.error(f"Gemini API Error: {e}")
         return f"❌ Błąd API Gemini: {str(e)}"
 
-def run_jules_audit(target_file: str = None, context: str = None):
-    """Main execution flow for Jules Auditor."""
-    timeline = []
-    thoughts = []
+def _elapsed(start: float) -> str:
+    seconds = int(time.monotonic() - start)
+    return f"{seconds // 60}:{seconds % 60:02d}"
 
-    # --- PHASE 1: INITIALIZATION ---
-    timeline.append("✅ [0:00] Inicjalizacja Jules Auditor v4.0")
-    update_status("🔬 [1/3] Skeleton", 10, timeline)
-
-    file_content = ""
-    if target_file and os.path.exists(target_file):
-        try:
-            with open(target_file, 'r', encoding='utf-8') as f:
-                file_content = f.read()
-            timeline.append(f"✅ [0:05] Wczytano plik: {target_file}")
-        except Exception as e:
-            timeline.append(f"❌ [0:05] Błąd odczytu: {target_file}")
-
-    update_status("🔬 [1/3] Skeleton", 20, timeline)
-
-    # --- PHASE 2: SKELETON OF THOUGHT ---
-    skeleton_prompt = f"""
+def _skeleton_prompt(file_content: str, context: str = None, digest: str = None) -> str:
+    if digest is not None:
+        source = f"""PLIK DOCELOWY ({len(file_content)} znaków - ustalenia z audytu fragmentów):
+    {digest}"""
+    else:
+        source = f"""PLIK DOCELOWY:
+    ```
+    {file_content}
+    ```"""
+    return f"""
     Jesteś Jules Extension Auditor v4.0.
     Twój cel: Przeprowadzić szybką analizę Skeleton-of-Thought dla podanego kodu/kontekstu.
 
     KONTEKST UŻYTKOWNIKA: {context or 'Brak dodatkowego kontekstu.'}
-    PLIK DOCELOWY:
-    ```
-    {file_content[:10000]}
-    ```
-    (Przycięto do 10k znaków jeśli za długi)
+    {source}
 
     Zadanie: Wypisz w punktach plan głębokiej analizy (Architektura, Bezpieczeństwo, UX).
     Nie rozwiązuj jeszcze problemów. Tylko zarysuj obszary debaty dla Agentów (Architekt, Hacker, PM).
     """
 
-    thoughts.append("Generowanie szkieletu myślowego...")
-    update_status("🔬 [1/3] Skeleton", 30, timeline, thoughts)
+def _chunk_prompt(chunk_text: str, filename: str) -> str:
+    # No line numbers or chunk index here: the prompt depends only on the chunk's own text,
+    # so unchanged chunks hit the response cache when another part of the file is edited.
+    return f"""
+    Jesteś Jules Extension Auditor v4.0. Analizujesz FRAGMENT większego pliku {filename}.
+    Wypisz zwięźle (max 8 punktów) ustalenia: architektura, bezpieczeństwo, błędy, UX.
+    Nie przepisuj kodu, odwołuj się do nazw funkcji/klas.
+
+    FRAGMENT:
+    ```
+    {chunk_text}
+    ```
+    """
+
+async def _audit_chunks(file_content: str, target_file: str, timeline: List[str],
+                        thoughts: List[str], start: float, status: StatusCallback) -> str:
+    """Map-reduce over syntax-aware chunks of a large file; returns the merged findings."""
+    filename = os.path.basename(target_file or "plik")
+
+    async def audit_chunk(chunk):
+        return await run_gemini_async(_chunk_prompt(chunk.text, filename))
+
+    def on_chunk_done(chunk, done, total):
+        timeline.append(
+            f"✅ [{_elapsed(start)}] Fragment {done}/{total} "
+            f"(linie {chunk.start_line}-{chunk.end_line})"
+        )
+        status("🔬 [1/3] Skeleton", 20 + 10 * done // total, timeline, thoughts)
+
+    return await map_reduce(
+        file_content, target_file or filename, audit_chunk, on_chunk_done=on_chunk_done
+    )
+
+def _agent_prompt(agent, skeleton_response: str) -> str:
+    name, persona, focus = agent
+    return f"""
+    Jesteś Agent {name} ({persona}). Twoja perspektywa: {focus}
+    Bierzesz udział w debacie audytowej z pozostałymi agentami (Architekt, Hacker, PM).
+
+    SZKIELET:
+    {skeleton_response}
+
+    Dla każdego punktu szkieletu przedstaw swoje stanowisko (max 3 zdania na punkt).
+    Output sformatuj jako listę w Markdown.
+    """
+
+def _solution_prompt(debate_response: str, with_verdict: bool = False) -> str:
+    verdict = (
+        "\n    0. Najpierw werdykt PM dla każdego punktu debaty (tabela Markdown)."
+        if with_verdict else ""
+    )
+    return f"""
+    Na podstawie werdyktów z debaty, wygeneruj finalny raport "Google Jules Audit".
+
+    Wymagania:{verdict}
+    1. 6 Konkretnych Rozwiązań (Gotowy kod/komendy).
+    2. Formatowanie Markdown.
+    3. Język: Polski (Techniczny).
+    4. Styl: Cyberpunk / Professional.
+
+    DEBATA:
+    {debate_response}
+    """
+
+async def _run_dag(nodes: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Runs a dependency graph of coroutines: {name: (deps, fn)}, where fn(results) receives
+    the results of its dependencies. Every node starts as soon as its own deps are done.
+    """
+    tasks = {}
+
+    async def run_node(name):
+        deps, fn = nodes[name]
+        results = {dep: await tasks[dep] for dep in deps}
+        return await fn(results)
+
+    for name in nodes:
+        tasks[name] = asyncio.ensure_future(run_node(name))
+    return {name: await task for name, task in tasks.items()}
+
+async def _run_pipeline(
+    skeleton_prompt: str,
+    timeline: List[str],
+    thoughts: List[str],
+    start: float,
+    status: StatusCallback,
+):
+    """
+    Pipeline mode: skeleton -> Architekt | Hacker | PM (concurrent) -> merge -> solutions.
+    Returns (skeleton_response, debate_response, final_response).
+    """
+    done_agents = []
+
+    async def skeleton(_):
+        response = await run_gemini_async(skeleton_prompt)
+        timeline.append(f"✅ [{_elapsed(start)}] Szkielet wygenerowany")
+        thoughts.append(f"Równoległa analiza {len(AGENTS)} agentów...")
+        status("⚡ [2/3] Debata Agentów", 45, timeline, thoughts)
+        return response
+
+    def agent_node(agent):
+        async def analyse(results):
+            response = await run_gemini_async(_agent_prompt(agent, results["skeleton"]))
+            done_agents.append(agent[0])
+            timeline.append(f"✅ [{_elapsed(start)}] Agent {agent[0]} zakończył analizę")
+            percent = 45 + 35 * len(done_agents) // len(AGENTS)
+            status("⚡ [2/3] Debata Agentów", percent, timeline, thoughts)
+            return response
+        return analyse
+
+    async def merge(results):
+        # Lightweight merge: no extra model call - the PM verdict comes with the solutions prompt
+        return "\n\n".join(
+            f"### Agent {name} ({persona})\n{results[f'agent:{name}']}"
+            for name, persona, _ in AGENTS
+        )
+
+    async def solutions(results):
+        thoughts.append("Synteza werdyktu i rozwiązań...")
+        status("⏳ [3/3] Finalizacja", 90, timeline, thoughts)
+        return await run_gemini_async(_solution_prompt(results["merge"], with_verdict=True))
+
+    nodes = {"skeleton": ((), skeleton)}
+    for agent in AGENTS:
+        nodes[f"agent:{agent[0]}"] = (("skeleton",), agent_node(agent))
+    nodes["merge"] = (tuple(f"agent:{name}" for name, _, _ in AGENTS), merge)
+    nodes["solutions"] = (("merge",), solutions)
 
-    skeleton_response = run_gemini(skeleton_prompt)
+    results = await _run_dag(nodes)
+    return results["skeleton"], results["merge"], results["solutions"]
+
+async def _run_sequential(skeleton_prompt: str, timeline: List[str], thoughts: List[str],
+                          status: StatusCallback):
+    """Classic flow: skeleton -> one role-played debate call -> solutions."""
+    skeleton_response = await run_gemini_async(skeleton_prompt)
     timeline.append("✅ [0:20] Szkielet wygenerowany")
-    update_status("⚡ [2/3] Debata Agentów", 45, timeline, thoughts)
+    status("⚡ [2/3] Debata Agentów", 45, timeline, thoughts)
 
     # --- PHASE 3: MULTI-AGENT DEBATE ---
     debate_prompt = f"""
@@ -130,64 +317,174 @@ def run_jules_audit(target_file: str = None, context: str = None):
     """
 
     thoughts.append("Uruchamianie symulacji debaty wewnętrznej...")
-    update_status("⚡ [2/3] Debata Agentów", 60, timeline, thoughts)
+    status("⚡ [2/3] Debata Agentów", 60, timeline, thoughts)
 
-    debate_response = run_gemini(debate_prompt)
+    debate_response = await run_gemini_async(debate_prompt)
     timeline.append("✅ [0:45] Debata zakończona")
-    update_status("⏳ [3/3] Finalizacja", 80, timeline, thoughts)
+    status("⏳ [3/3] Finalizacja", 80, timeline, thoughts)
 
     # --- PHASE 4: SOLUTIONS & REPORT ---
-    solution_prompt = f"""
-    Na podstawie werdyktów z debaty, wygeneruj finalny raport "Google Jules Audit".
+    thoughts.append("Synteza rozwiązań i generowanie raportu...")
+    status("⏳ [3/3] Finalizacja", 90, timeline, thoughts)
 
-    Wymagania:
-    1. 6 Konkretnych Rozwiązań (Gotowy kod/komendy).
-    2. Formatowanie Markdown.
-    3. Język: Polski (Techniczny).
-    4. Styl: Cyberpunk / Professional.
+    final_response = await run_gemini_async(_solution_prompt(debate_response))
+    return skeleton_response, debate_response, final_response
 
-    DEBATA:
-    {debate_response}
+async def audit_async(file_content: str, target_file: str = None, context: str = None,
+                      pipeline: bool = False, status: StatusCallback = None,
+                      timeline: List[str] = None, thoughts: List[str] = None,
+                      start: float = None) -> Dict[str, str]:
+    """
+    Core audit of one file's content, without writing the report.
+    Returns {"skeleton", "debate", "solutions"}. Used by run_jules_audit and the batch mode.
     """
+    status = status or _no_status
+    timeline = [] if timeline is None else timeline
+    thoughts = [] if thoughts is None else thoughts
+    start = time.monotonic() if start is None else start
 
-    thoughts.append("Synteza rozwiązań i generowanie raportu...")
-    update_status("⏳ [3/3] Finalizacja", 90, timeline, thoughts)
+    # --- PHASE 2: SKELETON OF THOUGHT ---
+    digest = None
+    if len(file_content) > INLINE_LIMIT:
+        thoughts.append("Plik jest duży - audyt fragmentami (map-reduce)...")
+        status("🔬 [1/3] Skeleton", 20, timeline, thoughts)
+        digest = await _audit_chunks(file_content, target_file, timeline, thoughts, start, status)
 
-    final_response = run_gemini(solution_prompt)
+    skeleton_prompt = _skeleton_prompt(file_content, context, digest)
 
-    # Combine everything into one report
-    full_report = f"""# JULES AUDIT REPORT v4.0
+    thoughts.append("Generowanie szkieletu myślowego...")
+    status("🔬 [1/3] Skeleton", 30, timeline, thoughts)
+
+    if pipeline:
+        skeleton_response, debate_response, final_response = await _run_pipeline(
+            skeleton_prompt, timeline, thoughts, start, status
+        )
+    else:
+        skeleton_response, debate_response, final_response = await _run_sequential(
+            skeleton_prompt, timeline, thoughts, status
+        )
+    return {"skeleton": skeleton_response, "debate": debate_response, "solutions": final_response}
+
+def audit_version(context: str = None, pipeline: bool = False) -> str:
+    """Everything besides file content that shapes the audit: model, prompts, mode, user context."""
+    context_hash = content_hash(context or "")[:16]
+    mode = "pipeline" if pipeline else "sequential"
+    return f"{MODEL_NAME}|{PROMPT_VERSION}|{INLINE_LIMIT}|{mode}|{context_hash}"
+
+def audit_failed(result: Dict[str, str]) -> Optional[str]:
+    """Gemini errors come back as text from run_gemini_async - returns the first one, if any."""
+    for section in result.values():
+        if section.startswith("❌ Błąd API Gemini"):
+            return section
+    return None
+
+def render_report(result: Dict[str, str]) -> str:
+    return f"""# JULES AUDIT REPORT v4.0
 Data: {time.strftime("%Y-%m-%d %H:%M:%S")}
 
 ## 1. SKELETON
-{skeleton_response}
+{result["skeleton"]}
 
 ## 2. AGENT DEBATE
-{debate_response}
+{result["debate"]}
 
 ## 3. FINAL SOLUTIONS
-{final_response}
+{result["solutions"]}
 """
 
+def run_jules_audit(target_file: str = None, context: str = None, pipeline: bool = False,
+                    index: AuditIndex = None, force: bool = False, workdir: str = None) -> str:
+    """
+    Main execution flow for Jules Auditor (blocking) - returns the rendered report.
+    Runs run_jules_audit_async on the process-wide Gemini loop instead of a fresh asyncio.run,
+    whose loop the SDK's async client could not be reused from.
+    """
+    return run_async(run_jules_audit_async(
+        target_file, context, pipeline=pipeline, index=index, force=force, workdir=workdir
+    ))["report"]
+
+async def run_jules_audit_async(target_file: str = None, context: str = None,
+                                pipeline: bool = False, index: AuditIndex = None,
+                                force: bool = False, workdir: str = None) -> Dict[str, Any]:
+    """
+    Audits one file and writes GEMINI.md; returns {"report", "error"}, where error is the
+    first Gemini error from the sections (see audit_failed) or None.
+    With pipeline=True the agent analyses run as concurrent calls over the skeleton.
+    With an index, an unchanged file reuses its stored audit unless force=True.
+    Relative paths (target file, GEMINI.md, status files) resolve against `workdir`
+    instead of the process-wide working directory.
+    """
+    if workdir:
+        target_file = os.path.join(workdir, target_file) if target_file else None
+    report_path = os.path.join(workdir or "", PROTOCOL_FILE)
+    status = partial(update_status, workdir=workdir, emitted=new_emitted_state())
+    start = time.monotonic()
+    timeline = []
+    thoughts = []
+
+    # --- PHASE 1: INITIALIZATION ---
+    timeline.append("✅ [0:00] Inicjalizacja Jules Auditor v4.0")
+    status("🔬 [1/3] Skeleton", 10, timeline)
+
+    file_content = ""
+    if target_file and os.path.exists(target_file):
+        try:
+            with open(target_file, 'r', encoding='utf-8') as f:
+                file_content = f.read()
+            timeline.append(f"✅ [0:05] Wczytano plik: {target_file}")
+        except Exception:
+            timeline.append(f"❌ [0:05] Błąd odczytu: {target_file}")
+
+    status("🔬 [1/3] Skeleton", 20, timeline)
+
+    use_index = index is not None and bool(target_file and file_content)
+    if use_index:
+        digest, version = content_hash(file_content), audit_version(context, pipeline)
+    result = index.get(target_file, digest, version) if use_index and not force else None
+
+    if result is not None:
+        timeline.append(f"♻️ [{_elapsed(start)}] Plik bez zmian - wynik z indeksu audytów")
+    else:
+        result = await audit_async(
+            file_content, target_file, context, pipeline=pipeline, status=status,
+            timeline=timeline, thoughts=thoughts, start=start
+        )
+        if use_index and not audit_failed(result):
+            index.put(target_file, digest, version, result)
+
+    # Combine everything into one report
+    full_report = render_report(result)
+
     # Save to PROTOCOL_FILE (GEMINI.md)
     try:
-        with open(PROTOCOL_FILE, 'w', encoding='utf-8') as f:
+        with open(report_path, 'w', encoding='utf-8') as f:
             f.write(full_report)
-        timeline.append(f"✅ [1:00] Raport zapisany w {PROTOCOL_FILE}")
+        timeline.append(f"✅ [1:00] Raport zapisany w {report_path}")
     except Exception as e:
         timeline.append(f"❌ Błąd zapisu raportu: {e}")
 
-    thoughts.append("Proces zakończony pomyślnie.")
+    error = audit_failed(result)
+    thoughts.append("Proces zakończony z błędami API." if error else "Proces zakończony pomyślnie.")
     timeline.append("🏁 Zakończono.")
-    update_status("Gotowe", 100, timeline, thoughts)
+    status("Gotowe", 100, timeline, thoughts)
 
-    return full_report
+    return {"report": full_report, "error": error}
 
 if __name__ == "__main__":
     import argparse
     parser = argparse.ArgumentParser()
     parser.add_argument("--file", help="Target file to analyze")
     parser.add_argument("--context", help="User context")
+    parser.add_argument("--no-cache", action="store_true", help="Bypass the response cache")
+    parser.add_argument("--pipeline", action="store_true", help="Run agent analyses concurrently")
+    parser.add_argument(
+        "--force", action="store_true", help="Re-audit even if the file is unchanged"
+    )
     args = parser.parse_args()
 
-    run_jules_audit(args.file, args.context)
+    if not args.no_cache:
+        enable_default_cache()
+
+    run_jules_audit(
+        args.file, args.context, pipeline=args.pipeline, index=AuditIndex(), force=args.force
+    )
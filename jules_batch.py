@@ -0,0 +1,288 @@
+import asyncio
+import fnmatch
+import json
+import logging
+import os
+import time
+from typing import Any, Dict, List
+
+import jules
+from audit_index import AuditIndex, content_hash
+from gemini_client import run_async
+
+logger = logging.getLogger(__name__)
+
+INDEX_FILE = "GEMINI.index.json"
+DEFAULT_GLOBS = ["*.py"]
+ALWAYS_SKIPPED = {".git"}
+
+
+class GitIgnore:
+    """
+    Minimal .gitignore matcher (root and nested files).
+
+    Supports comments, `!` negation, trailing `/` (directories only) and anchored
+    patterns containing `/`. Later rules win, like in git.
+    """
+    def __init__(self, root: str):
+        self.root = os.path.abspath(root)
+        self._rules = {}  # directory -> [(pattern, negate, dir_only, anchored)]
+
+    def load(self, directory: str):
+        path = os.path.join(directory, ".gitignore")
+        rules = []
+        if os.path.isfile(path):
+            with open(path, 'r', encoding='utf-8', errors='ignore') as f:
+                for line in f:
+                    line = line.rstrip("\n").strip()
+                    if not line or line.startswith("#"):
+                        continue
+                    negate = line.startswith("!")
+                    if negate:
+                        line = line[1:]
+                    dir_only = line.endswith("/")
+                    line = line.rstrip("/")
+                    anchored = "/" in line
+                    rules.append((line.lstrip("/"), negate, dir_only, anchored))
+        self._rules[os.path.abspath(directory)] = rules
+
+    def ignored(self, path: str, is_dir: bool) -> bool:
+        path = os.path.abspath(path)
+        result = False
+        directory = os.path.dirname(path)
+        bases = []
+        while True:
+            if directory in self._rules:
+                bases.append(directory)
+            if directory == self.root or os.path.dirname(directory) == directory:
+                break
+            directory = os.path.dirname(directory)
+
+        for base in reversed(bases):
+            rel = os.path.relpath(path, base).replace(os.sep, "/")
+            name = os.path.basename(path)
+            for pattern, negate, dir_only, anchored in self._rules[base]:
+                if dir_only and not is_dir:
+                    continue
+                target = rel if anchored else name
+                if fnmatch.fnmatch(target, pattern):
+                    result = not negate
+        return result
+
+
+def find_files(root: str, globs: List[str] = None) -> List[str]:
+    """Walks `root` respecting .gitignore files; returns sorted paths matching any glob."""
+    globs = globs or DEFAULT_GLOBS
+    if os.path.isfile(root):
+        return [root]
+
+    gitignore = GitIgnore(root)
+    found = []
+    for directory, dirnames, filenames in os.walk(root):
+        gitignore.load(directory)
+        dirnames[:] = sorted(
+            d for d in dirnames
+            if d not in ALWAYS_SKIPPED and not gitignore.ignored(os.path.join(directory, d), True)
+        )
+        for name in sorted(filenames):
+            path = os.path.join(directory, name)
+            if any(fnmatch.fnmatch(name, g) for g in globs) and not gitignore.ignored(path, False):
+                found.append(path)
+    return found
+
+
+def _format_duration(seconds: float) -> str:
+    seconds = int(seconds)
+    return f"{seconds // 60}:{seconds % 60:02d}"
+
+
+class BatchProgress:
+    """Tracks throughput, failures and in-flight files; mirrors them into status_report.json."""
+    def __init__(self, total: int, workdir: str = None):
+        self.total = total
+        self.workdir = workdir
+        self.emitted = jules.new_emitted_state()
+        self.done = 0
+        self.failed = 0
+        self.reused = 0
+        self.start = time.monotonic()
+        self.timeline = [f"✅ [0:00] Batch audit: {total} plików"]
+        self.in_progress = []
+        self.failures = []
+
+    def files_per_minute(self) -> float:
+        elapsed = time.monotonic() - self.start
+        return round(self.done / (elapsed / 60), 2) if elapsed > 0 and self.done else 0.0
+
+    def report(self, final: bool = False):
+        rate = self.files_per_minute()
+        remaining = self.total - self.done
+        eta = None
+        if not final and rate:
+            eta = _format_duration(remaining / rate * 60)
+        percent = 100 if final else int(100 * self.done / self.total) if self.total else 100
+        jules.update_status(
+            "🏁 Batch zakończony" if final else f"📚 Batch audit {self.done}/{self.total}",
+            min(percent, 100 if final else 99),
+            self.timeline,
+            [f"Audyt: {path}" for path in self.in_progress],
+            eta=eta,
+            extra={"batch": {
+                "total": self.total,
+                "done": self.done,
+                "failed": self.failed,
+                "reused": self.reused,
+                "files_per_minute": rate,
+                "elapsed_s": round(time.monotonic() - self.start, 1),
+                "failures": self.failures[-20:],
+            }},
+            workdir=self.workdir,
+            emitted=self.emitted,
+        )
+
+
+async def run_batch(
+    files: List[str],
+    context: str = None,
+    workers: int = 4,
+    pipeline: bool = False,
+    output: str = jules.PROTOCOL_FILE,
+    index_path: str = INDEX_FILE,
+    audit_index: AuditIndex = None,
+    force: bool = False,
+    workdir: str = None,
+) -> Dict[str, Any]:
+    """
+    Audits `files` on a bounded pool of async workers sharing one pooled Gemini client.
+    With `audit_index`, unchanged files reuse their stored audit (unless `force`).
+    Relative `output`, `index_path` and status files resolve against `workdir`.
+    """
+    if workdir:
+        output, index_path = os.path.join(workdir, output), os.path.join(workdir, index_path)
+    version = jules.audit_version(context, pipeline)
+    queue = asyncio.Queue()
+    for path in files:
+        queue.put_nowait(path)
+    progress = BatchProgress(len(files), workdir)
+    entries = {}
+    progress.report()
+
+    async def worker():
+        while True:
+            try:
+                path = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            progress.in_progress.append(path)
+            progress.report()
+            started = time.monotonic()
+            entry = {"file": path, "status": "ok", "error": None}
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    content = f.read()
+                entry["sha256"] = content_hash(content)
+                result = None
+                if audit_index is not None and not force:
+                    result = audit_index.get(path, entry["sha256"], version)
+                if result is not None:
+                    entry["status"] = "reused"
+                else:
+                    result = await jules.audit_async(content, path, context, pipeline=pipeline)
+                    error = jules.audit_failed(result)
+                    if error:
+                        entry.update(status="error", error=error)
+                    elif audit_index is not None:
+                        audit_index.put(path, entry["sha256"], version, result)
+                entry["result"] = result
+            except Exception as e:
+                logger.error(f"Batch audit failed for {path}: {e}")
+                entry.update(status="error", error=str(e))
+
+            entry["duration_s"] = round(time.monotonic() - started, 2)
+            entries[path] = entry
+            progress.in_progress.remove(path)
+            progress.done += 1
+            stamp = _format_duration(time.monotonic() - progress.start)
+            if entry["status"] == "ok":
+                progress.timeline.append(f"✅ [{stamp}] {path} ({entry['duration_s']}s)")
+            elif entry["status"] == "reused":
+                progress.reused += 1
+                progress.timeline.append(f"♻️ [{stamp}] {path} (bez zmian, z indeksu)")
+            else:
+                progress.failed += 1
+                progress.failures.append({"file": path, "error": entry["error"]})
+                progress.timeline.append(f"❌ [{stamp}] {path}: {entry['error']}")
+            progress.report()
+
+    await asyncio.gather(*(worker() for _ in range(max(1, min(workers, len(files) or 1)))))
+
+    ordered = [entries[path] for path in files]
+    summary = {
+        "total": progress.total,
+        "ok": progress.total - progress.failed,
+        "failed": progress.failed,
+        "reused": progress.reused,
+        "elapsed_s": round(time.monotonic() - progress.start, 1),
+        "files_per_minute": progress.files_per_minute(),
+    }
+    _write_report(ordered, summary, output)
+    _write_index(ordered, summary, index_path, output)
+    progress.timeline.append(f"✅ Raport zapisany w {output} (indeks: {index_path})")
+    progress.report(final=True)
+    return summary
+
+
+def _write_report(entries: List[Dict[str, Any]], summary: Dict[str, Any], output: str):
+    parts = [
+        "# JULES BATCH AUDIT REPORT v4.0",
+        f"Data: {time.strftime('%Y-%m-%d %H:%M:%S')}",
+        f"Pliki: {summary['total']} (ok: {summary['ok']}, błędy: {summary['failed']}) · "
+        f"czas: {summary['elapsed_s']}s · {summary['files_per_minute']} plików/min",
+        "",
+    ]
+    for entry in entries:
+        parts.append(f"## {entry['file']}")
+        if "result" not in entry:
+            parts.append(f"❌ {entry['error']}\n")
+            continue
+        result = entry["result"]
+        parts.append(f"### 1. SKELETON\n{result['skeleton']}\n")
+        parts.append(f"### 2. AGENT DEBATE\n{result['debate']}\n")
+        parts.append(f"### 3. FINAL SOLUTIONS\n{result['solutions']}\n")
+    with open(output, 'w', encoding='utf-8') as f:
+        f.write("\n".join(parts))
+
+
+def _write_index(
+    entries: List[Dict[str, Any]], summary: Dict[str, Any], index_path: str, output: str
+):
+    index = {
+        "generated": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "report": output,
+        "summary": summary,
+        "files": [
+            {
+                "file": entry["file"],
+                "sha256": entry.get("sha256"),
+                "status": entry["status"],
+                "error": entry["error"],
+                "duration_s": entry["duration_s"],
+                "section": f"## {entry['file']}",
+            }
+            for entry in entries
+        ],
+    }
+    with open(index_path, 'w', encoding='utf-8') as f:
+        json.dump(index, f, indent=2, ensure_ascii=False)
+
+
+def run(root: str, globs: List[str] = None, context: str = None, workers: int = 4,
+        pipeline: bool = False, audit_index: AuditIndex = None, force: bool = False,
+        workdir: str = None) -> Dict[str, Any]:
+    """Blocking batch audit of `root`, run on the process-wide Gemini loop."""
+    files = find_files(os.path.join(workdir or "", root), globs)
+    logger.info(f"Batch audit: {len(files)} files under {root}")
+    return run_async(run_batch(
+        files, context, workers=workers, pipeline=pipeline, audit_index=audit_index, force=force,
+        workdir=workdir
+    ))
@@ -1,7 +1,9 @@
 import argparse
+import os
 import sys
 import logging
 import subprocess
+from jules_daemon import send_job
 
 # Logging configuration
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -11,21 +13,95 @@ def main():
     """
     CLI wrapper for Jules (jules.py).
     Expected usage from Electron: python jules_cli.py --command analyze --file <path> --context <string>
+    Batch mode: python jules_cli.py --path <dir> [--glob "*.py" ...] [--workers N]
     """
     parser = argparse.ArgumentParser(description="Jules CLI Wrapper")
     parser.add_argument("--command", choices=["analyze"], default="analyze", help="Command to run")
     parser.add_argument("--file", help="Target file")
+    parser.add_argument("--path", help="Batch mode: audit every matching file under this directory")
+    parser.add_argument(
+        "--glob", action="append", help="Batch mode: filename pattern (repeatable, default *.py)"
+    )
+    parser.add_argument("--workers", type=int, default=4, help="Batch mode: concurrent audits")
+    parser.add_argument(
+        "--force", action="store_true", help="Re-audit files even if unchanged since the last run"
+    )
+    parser.add_argument(
+        "--compact-index", action="store_true", help="Drop stale entries from the audit index"
+    )
+    parser.add_argument(
+        "--no-daemon", action="store_true", help="Do not forward to a running jules_daemon.py"
+    )
     parser.add_argument("--context", help="Context string")
+    parser.add_argument("--no-cache", action="store_true", help="Bypass the Gemini response cache")
+    parser.add_argument(
+        "--pipeline", action="store_true", help="Run the Architekt/Hacker/PM analyses concurrently"
+    )
 
     args = parser.parse_args()
 
+    if args.compact_index:
+        from audit_index import AuditIndex
+
+        print(f"Audit index compacted: {AuditIndex().compact()}")
+        if not (args.path or args.file):
+            return
+
+    if args.command == "analyze" and not args.no_daemon:
+        # Thin client mode: a warm jules_daemon.py skips the interpreter + SDK cold start
+        job = {
+            "command": "analyze",
+            "cwd": os.getcwd(),
+            "file": args.file,
+            "path": args.path,
+            "globs": args.glob,
+            "workers": args.workers,
+            "context": args.context,
+            "pipeline": args.pipeline,
+            "force": args.force,
+            "no_cache": args.no_cache,
+        }
+        response = send_job(job)
+        if response is not None:
+            logger.info("Job handled by the Jules daemon.")
+            if not response.get("ok"):
+                logger.error(
+                    f"Jules daemon job failed: {response.get('error') or response.get('summary')}"
+                )
+                sys.exit(1)
+            print(f"Jules process finished successfully. {response.get('summary') or ''}".rstrip())
+            return
+        logger.info("Jules daemon not running - falling back to a local run.")
+
+    if args.command == "analyze" and args.path:
+        # Batch runs in-process: one interpreter and one pooled Gemini client for all files
+        import jules_batch
+        from audit_index import AuditIndex
+        from response_cache import enable_default_cache
+
+        if not args.no_cache:
+            enable_default_cache()
+        summary = jules_batch.run(
+            args.path, args.glob, args.context, workers=args.workers, pipeline=args.pipeline,
+            audit_index=AuditIndex(), force=args.force
+        )
+        print(f"Batch audit finished: {summary}")
+        if summary["failed"]:
+            sys.exit(1)
+
     # For now, we only support the 'analyze' command which runs the audit
-    if args.command == "analyze":
+    elif args.command == "analyze":
         cmd = [sys.executable, "jules.py"]
         if args.file:
             cmd.extend(["--file", args.file])
         if args.context:
             cmd.extend(["--context", args.context])
+        if args.no_cache:
+            cmd.append("--no-cache")
+        if args.pipeline:
+            cmd.append("--pipeline")
+        if args.force:
+            cmd.append("--force")
 
         logger.info(f"Spawning Jules Process: {cmd}")
 
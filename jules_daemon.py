@@ -0,0 +1,298 @@
+import argparse
+import asyncio
+import hmac
+import json
+import logging
+import os
+import secrets
+import socket
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional
+
+# Logging configuration (stderr - stdout is reserved for the --stdio protocol)
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Daemon endpoints live next to the response cache; only the owning user can reach them
+RUNTIME_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".regis_cache")
+DEFAULT_SOCKET = os.getenv("JULES_DAEMON_SOCKET", os.path.join(RUNTIME_DIR, "jules_daemon.sock"))
+# TCP is only for platforms without Unix sockets in asyncio (Windows); it requires the token
+TOKEN_FILE = os.getenv("JULES_DAEMON_TOKEN_FILE", os.path.join(RUNTIME_DIR, "jules_daemon.token"))
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = int(os.getenv("JULES_DAEMON_PORT", "8765"))
+UNIX_SOCKETS = (
+    hasattr(socket, "AF_UNIX") and hasattr(asyncio, "start_unix_server") and os.name != "nt"
+)
+
+
+def _read_token(path: str = TOKEN_FILE) -> Optional[str]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+
+def _write_private(path: str, data: str):
+    """Creates `path` readable and writable by the owner only (0600), replacing an old file."""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), mode=0o700, exist_ok=True)
+    if os.path.exists(path):
+        os.remove(path)
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        f.write(data)
+
+
+def _connect(socket_path: str, host: str, port: int, timeout: float) -> Optional[socket.socket]:
+    if UNIX_SOCKETS:
+        if not os.path.exists(socket_path):
+            return None
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(timeout)
+        try:
+            sock.connect(socket_path)
+        except OSError:
+            sock.close()
+            return None
+        return sock
+    try:
+        return socket.create_connection((host, port), timeout=timeout)
+    except OSError:
+        return None
+
+
+def send_job(job: Dict[str, Any], socket_path: str = DEFAULT_SOCKET, host: str = DEFAULT_HOST,
+             port: int = DEFAULT_PORT, connect_timeout: float = 0.5) -> Optional[Dict[str, Any]]:
+    """
+    Thin client: sends one JSON-lines job to a running daemon and waits for the reply.
+    Returns None when no daemon is listening, so the caller can fall back to spawning.
+    Deliberately imports nothing heavy - this runs in every jules_cli.py invocation.
+    """
+    sock = _connect(socket_path, host, port, connect_timeout)
+    if sock is None:
+        return None
+    if not UNIX_SOCKETS:
+        job = {**job, "token": _read_token()}
+    with sock:
+        sock.settimeout(None)
+        sock.sendall(json.dumps(job, ensure_ascii=False).encode("utf-8") + b"\n")
+        with sock.makefile("r", encoding="utf-8") as reader:
+            line = reader.readline()
+    if not line:
+        return {"ok": False, "error": "Daemon closed the connection without a reply"}
+    return json.loads(line)
+
+
+class JulesWorker:
+    """
+    Resident worker: keeps the interpreter, google.generativeai, the pooled client,
+    the response cache and the audit index warm between jobs.
+
+    Jobs run one at a time (they share GEMINI.md and status_report.json) on one
+    persistent event loop - the process-wide Gemini loop, which the SDK's async
+    client stays bound to between jobs. A per-job asyncio.run() would break every
+    job after the first.
+    """
+    def __init__(self, cache: bool = True):
+        # The heavy imports happen once, here, instead of on every click in the UI
+        import jules
+        import jules_batch
+        import response_cache
+        from audit_index import AuditIndex
+        from gemini_client import get_async_loop
+
+        self.jules = jules
+        self.jules_batch = jules_batch
+        self.response_cache = response_cache
+        self.index = AuditIndex()
+        self.loop = get_async_loop()
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="jules-job")
+        self.started = time.time()
+        self.jobs_done = 0
+        # Audits are cached like in jules.py; a job (or the whole daemon) can opt out with no_cache
+        self.cache = cache
+        if cache:
+            response_cache.enable_default_cache()
+
+    def handle(self, job: Dict[str, Any]) -> Dict[str, Any]:
+        """Runs one job on the worker loop and blocks until its reply."""
+        return self.loop.run(self.handle_async(job))
+
+    async def handle_async(self, job: Dict[str, Any]) -> Dict[str, Any]:
+        command = job.get("command", "analyze")
+        if command == "ping":
+            return {
+                "ok": True,
+                "pid": os.getpid(),
+                "uptime_s": round(time.time() - self.started, 1),
+                "jobs_done": self.jobs_done,
+            }
+        if command != "analyze":
+            return {"ok": False, "error": f"Unknown command: {command}"}
+
+        # Relative paths (file, report, status) resolve against the caller's directory;
+        # the daemon's own working directory is never changed
+        workdir = os.path.abspath(job.get("cwd") or os.getcwd())
+        if not os.path.isdir(workdir):
+            return {"ok": False, "error": f"Not a directory: {workdir}"}
+        bypass_cache = self.cache and job.get("no_cache")
+        if bypass_cache:
+            self.response_cache.disable_default_cache()
+        try:
+            if job.get("path"):
+                files = self.jules_batch.find_files(
+                    os.path.join(workdir, job["path"]), job.get("globs")
+                )
+                summary = await self.jules_batch.run_batch(
+                    files,
+                    job.get("context"),
+                    workers=job.get("workers", 4),
+                    pipeline=job.get("pipeline", False),
+                    audit_index=self.index,
+                    force=job.get("force", False),
+                    workdir=workdir,
+                )
+                return {"ok": not summary["failed"], "summary": summary}
+            outcome = await self.jules.run_jules_audit_async(
+                job.get("file"), job.get("context"), pipeline=job.get("pipeline", False),
+                index=self.index, force=job.get("force", False), workdir=workdir
+            )
+            response = {"ok": not outcome["error"],
+                        "report": os.path.join(workdir, self.jules.PROTOCOL_FILE)}
+            if outcome["error"]:
+                response["error"] = outcome["error"]
+            return response
+        except Exception as e:
+            logger.error(f"Job failed: {e}", exc_info=True)
+            return {"ok": False, "error": str(e)}
+        finally:
+            if bypass_cache:
+                self.response_cache.enable_default_cache()
+            self.jobs_done += 1
+
+    async def run_job(self, job: Dict[str, Any]) -> Dict[str, Any]:
+        loop = asyncio.get_running_loop()
+        response = await loop.run_in_executor(self.executor, self.handle, job)
+        if "id" in job:
+            response["id"] = job["id"]
+        return response
+
+
+async def serve(
+    socket_path: str = DEFAULT_SOCKET,
+    host: str = DEFAULT_HOST,
+    port: int = DEFAULT_PORT,
+    cache: bool = True,
+):
+    """
+    Listens on a Unix socket with 0600 permissions, so only the owning user can submit jobs
+    (they run with the owner's files and API key). Without Unix sockets the daemon listens on
+    local TCP and every job must carry the token from TOKEN_FILE (also 0600).
+    """
+    sock = _connect(socket_path, host, port, timeout=0.5)
+    if sock is not None:
+        sock.close()
+        raise SystemExit("Jules daemon is already running")
+    worker = JulesWorker(cache=cache)
+    token = None if UNIX_SOCKETS else secrets.token_hex(32)
+
+    async def on_client(reader, writer):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    job = json.loads(line)
+                except json.JSONDecodeError as e:
+                    response = {"ok": False, "error": f"Invalid JSON: {e}"}
+                else:
+                    if token is not None and not hmac.compare_digest(
+                        str(job.pop("token", "")), token
+                    ):
+                        response = {"ok": False, "error": "Invalid or missing daemon token"}
+                    else:
+                        response = await worker.run_job(job)
+                writer.write(json.dumps(response, ensure_ascii=False).encode("utf-8") + b"\n")
+                await writer.drain()
+        finally:
+            writer.close()
+
+    if UNIX_SOCKETS:
+        os.makedirs(os.path.dirname(os.path.abspath(socket_path)), mode=0o700, exist_ok=True)
+        if os.path.exists(socket_path):
+            os.remove(socket_path)  # stale socket of a previous run (nobody answered above)
+        previous_umask = os.umask(0o177)
+        try:
+            server = await asyncio.start_unix_server(on_client, socket_path)
+        finally:
+            os.umask(previous_umask)
+        os.chmod(socket_path, 0o600)
+        logger.info(f"Jules daemon listening on {socket_path} (pid {os.getpid()})")
+    else:
+        _write_private(TOKEN_FILE, token)
+        server = await asyncio.start_server(on_client, host, port)
+        logger.info(
+            f"Jules daemon listening on {host}:{port}, token in {TOKEN_FILE} (pid {os.getpid()})"
+        )
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        endpoint = socket_path if UNIX_SOCKETS else TOKEN_FILE
+        if os.path.exists(endpoint):
+            os.remove(endpoint)
+
+
+def serve_stdio(cache: bool = True):
+    """Same protocol over stdin/stdout - for a host process (e.g. Electron) owning the daemon."""
+    worker = JulesWorker(cache=cache)
+    logger.info("Jules daemon ready on stdio")
+    for line in sys.stdin:
+        if not line.strip():
+            continue
+        try:
+            job = json.loads(line)
+            response = worker.handle(job)
+            if "id" in job:
+                response["id"] = job["id"]
+        except json.JSONDecodeError as e:
+            response = {"ok": False, "error": f"Invalid JSON: {e}"}
+        sys.stdout.write(json.dumps(response, ensure_ascii=False) + "\n")
+        sys.stdout.flush()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Jules resident worker (JSON-lines over a Unix socket or stdio)"
+    )
+    parser.add_argument(
+        "--socket", default=DEFAULT_SOCKET, help="Unix socket path (created with 0600 permissions)"
+    )
+    parser.add_argument(
+        "--host", default=DEFAULT_HOST, help="TCP bind address where Unix sockets are unavailable"
+    )
+    parser.add_argument(
+        "--port", type=int, default=DEFAULT_PORT, help="TCP port where Unix sockets are unavailable"
+    )
+    parser.add_argument(
+        "--stdio", action="store_true", help="Read jobs from stdin instead of a socket"
+    )
+    parser.add_argument(
+        "--no-cache", action="store_true", help="Bypass the Gemini response cache for every job"
+    )
+    args = parser.parse_args()
+
+    try:
+        if args.stdio:
+            serve_stdio(cache=not args.no_cache)
+        else:
+            asyncio.run(serve(args.socket, args.host, args.port, cache=not args.no_cache))
+    except KeyboardInterrupt:
+        logger.info("Jules daemon stopped.")
+
+
+if __name__ == "__main__":
+    main()
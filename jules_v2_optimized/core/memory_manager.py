@@ -1,26 +1,64 @@
 import json
 import logging
+from collections import deque
 
 logger = logging.getLogger(__name__)
 
+
+def estimate_tokens(text):
+    """Zgrubna estymacja liczby tokenów (~4 znaki na token)."""
+    return max(1, len(text) // 4)
+
+
 class MemoryManager:
-    def __init__(self, max_history=10):
-        self.history = []
+    """
+    Historia rozmowy w `deque` z sumą tokenów liczoną przyrostowo.
+
+    Przycinanie usuwa najstarsze wpisy w O(1) (budżet `max_tokens` i `max_history`),
+    a tekst kontekstu jest cache'owany do następnej zmiany. `history` to migawka tylko
+    do odczytu (krotka) - `history.append(...)` czy `history = []` zgłaszają błąd zamiast
+    po cichu gubić zapis; historię zmieniają wyłącznie `add_message()` i `clear()`.
+    """
+    def __init__(self, max_history=10, max_tokens=32000, token_counter=None):
         self.max_history = max_history
+        self.max_tokens = max_tokens
+        self._count = token_counter or estimate_tokens
+        self._messages = deque()
+        self.total_tokens = 0
+        self._context = None
+
+    @property
+    def history(self):
+        return tuple({"role": m["role"], "content": m["content"]} for m in self._messages)
 
     def add_message(self, role, content):
-        self.history.append({"role": role, "content": content})
+        tokens = self._count(content)
+        self._messages.append({"role": role, "content": content, "tokens": tokens})
+        self.total_tokens += tokens
+        self._context = None
         self._prune()
 
+    def clear(self):
+        self._messages.clear()
+        self.total_tokens = 0
+        self._context = None
+
     def _prune(self):
         """Utrzymuje historię w ryzach."""
-        if len(self.history) > self.max_history:
-            # Usuwamy najstarsze, ale zostawiamy system prompt jeśli by był
+        if len(self._messages) > self.max_history or self.total_tokens > self.max_tokens:
+            # Usuwamy najstarsze, ale zawsze zostaje ostatnia wiadomość
             logger.info("Przycinanie historii pamięci...")
-            self.history = self.history[-self.max_history:]
+            while len(self._messages) > 1 and (
+                len(self._messages) > self.max_history or self.total_tokens > self.max_tokens
+            ):
+                self.total_tokens -= self._messages.popleft()["tokens"]
 
     def get_context_string(self):
-        return "\n".join([f"{msg['role'].upper()}: {msg['content']}" for msg in self.history])
+        if self._context is None:
+            self._context = "\n".join(
+                f"{msg['role'].upper()}: {msg['content']}" for msg in self._messages
+            )
+        return self._context
 
     async def optimize_context(self, history_list, max_tokens=4000, model_client=None):
         """Metoda do inteligentnego skracania (stub dla kompatybilności z debate.py)."""
@@ -28,4 +66,4 @@ class MemoryManager:
         current_len = sum(len(x['content']) for x in history_list)
         if current_len > max_tokens * 4: # Zgrubne przybliżenie znaków
             return history_list[-5:] # Zwróć ostatnie 5 wpisów
-        return history_list
\ No newline at end of file
+        return history_list
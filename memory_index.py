@@ -0,0 +1,253 @@
+import hashlib
+import heapq
+import json
+import logging
+import math
+import mmap
+import operator
+import os
+import re
+import threading
+import zlib
+from array import array
+from collections import Counter
+from typing import Callable, Dict, List, Optional
+
+from response_cache import CACHE_DIR
+from status_writer import file_lock, write_atomic
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_INDEX_DIR = os.getenv("REGIS_MEMORY_INDEX", os.path.join(CACHE_DIR, "memory_index"))
+DEFAULT_DIM = 512
+# Limit wierszy (najnowsze zostają); po przekroczeniu o 25% indeks jest kompaktowany
+DEFAULT_MAX_ROWS = int(os.getenv("REGIS_MEMORY_INDEX_MAX_ROWS", "20000"))
+JULES_MEMORY_FILE = os.getenv(
+    "REGIS_JULES_MEMORY",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".jules_memory.json"),
+)
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+# Etykiety z szablonu tury (USER:/MODEL:/Mode:/Context:) występują wszędzie -
+# tylko zawyżałyby podobieństwo
+_LABELS = {"user", "model", "mode", "context", "input", "file", "sha256"}
+
+
+def _features(text: str) -> Counter:
+    """Cechy tekstu: słowa, pary sąsiednich słów i trigramy znakowe (odporne na odmianę)."""
+    words = [w for w in (w.lower() for w in _WORD.findall(text)) if w not in _LABELS]
+    features = Counter(f"w:{w}" for w in words)
+    features.update(f"b:{a} {b}" for a, b in zip(words, words[1:]))
+    for w in words:
+        padded = f"#{w}#"
+        features.update(f"c:{padded[i:i + 3]}" for i in range(len(padded) - 2))
+    return features
+
+
+def embed(text: str, dim: int = DEFAULT_DIM) -> Dict[int, float]:
+    """
+    Rzadki wektor cech haszowanych (hashing trick ze znakiem), znormalizowany L2.
+
+    crc32 zamiast wbudowanego `hash()` - wynik musi być stały między procesami,
+    bo wektory leżą na dysku.
+    """
+    vector: Dict[int, float] = {}
+    for feature, count in _features(text).items():
+        h = zlib.crc32(feature.encode("utf-8"))
+        sign = 1.0 if h & 0x80000000 else -1.0
+        slot = h % dim
+        vector[slot] = vector.get(slot, 0.0) + sign * (1.0 + math.log(count))
+    norm = math.sqrt(sum(v * v for v in vector.values())) or 1.0
+    return {slot: v / norm for slot, v in vector.items() if v}
+
+
+class MemoryIndex:
+    """
+    Lokalny indeks wyszukiwania po podobieństwie (cosinus) nad zapisanymi turami i poprawkami.
+
+    Na dysku dwa pliki dopisywane przyrostowo: `vectors.f32` (gęste wiersze float32 po `dim`
+    wartości, czytane przez mmap bez kopiowania) i `records.jsonl` (metadane, wiersz na wektor).
+    Wyszukiwanie liczy iloczyn tylko po niezerowych cechach zapytania - kolumna po kolumnie,
+    więc koszt to O(liczba wierszy x cechy zapytania) w pętlach C. Klucz rekordu (`key`)
+    zapobiega duplikatom przy ponownym indeksowaniu tego samego źródła. Rozmiar jest
+    ograniczony do `max_rows` najnowszych rekordów - kompaktowanie przepisuje oba pliki
+    atomowo, a inne procesy wykrywają to po zmianie pliku rekordów i wczytują go od nowa.
+    """
+    def __init__(self, directory: str = DEFAULT_INDEX_DIR, dim: int = DEFAULT_DIM,
+                 max_rows: int = DEFAULT_MAX_ROWS):
+        self.directory = directory
+        self.dim = dim
+        self.max_rows = max_rows
+        self.row_bytes = 4 * dim
+        self.vectors_path = os.path.join(directory, "vectors.f32")
+        self.records_path = os.path.join(directory, "records.jsonl")
+        self.records: List[Dict] = []
+        self._keys = set()
+        self._records_offset = 0
+        self._records_inode = None
+        self._mmap = None
+        self._view = None
+        self._mapped_rows = 0
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        with self._lock:
+            self._refresh()
+
+    def __len__(self):
+        return len(self.records)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._keys
+
+    def _refresh(self):
+        """Doczytuje rekordy dopisane od ostatniego odczytu (także przez inne procesy)."""
+        try:
+            with open(self.records_path, "rb") as f:
+                inode = os.fstat(f.fileno()).st_ino
+                if inode != self._records_inode:
+                    # Pierwszy odczyt albo plik przepisany przez kompaktowanie - wczytanie od nowa
+                    self._unmap()
+                    self.records, self._keys, self._records_offset = [], set(), 0
+                    self._records_inode = inode
+                f.seek(self._records_offset)
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        break  # niedokończony zapis innego procesu
+                    self._records_offset += len(line)
+                    record = json.loads(line)
+                    self.records.append(record)
+                    self._keys.add(record["key"])
+        except FileNotFoundError:
+            pass
+
+    def _map(self):
+        """Mapuje (ponownie) plik wektorów, jeśli przybyły wiersze."""
+        rows = len(self.records)
+        if rows == self._mapped_rows:
+            return
+        self._unmap()
+        if rows:
+            with open(self.vectors_path, "rb") as f:
+                self._mmap = mmap.mmap(f.fileno(), rows * self.row_bytes, access=mmap.ACCESS_READ)
+            self._view = memoryview(self._mmap).cast("f")
+        self._mapped_rows = rows
+
+    def _unmap(self):
+        if self._view is not None:
+            self._view.release()
+            self._view = None
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        self._mapped_rows = 0
+
+    def add(self, key: str, text: str, **meta) -> bool:
+        """Dodaje rekord (przyrostowo, jeden wiersz). Zwraca False, jeśli klucz już jest."""
+        added = self._append(key, text, meta)
+        if (
+            added
+            and self.max_rows
+            and len(self.records) > self.max_rows + max(1, self.max_rows // 4)
+        ):
+            self.compact()
+        return added
+
+    def _append(self, key: str, text: str, meta: Dict) -> bool:
+        with self._lock, file_lock(f"{self.records_path}.lock"):
+            self._refresh()
+            if key in self._keys:
+                return False
+            row = array("f", bytes(self.row_bytes))
+            for slot, value in embed(text, self.dim).items():
+                row[slot] = value
+            record = {"key": key, "text": text, **meta}
+            # Wektor bez rekordu (przerwany zapis) jest obcinany - wiersze zgadzają się z rekordami
+            with open(self.vectors_path, "ab") as f:
+                f.truncate(len(self.records) * self.row_bytes)
+                f.write(row.tobytes())
+            line = (json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8")
+            with open(self.records_path, "ab") as f:
+                f.write(line)
+                self._records_inode = os.fstat(f.fileno()).st_ino
+            self._records_offset += len(line)
+            self.records.append(record)
+            self._keys.add(key)
+            return True
+
+    def compact(self, max_rows: int = None) -> int:
+        """
+        Zostawia `max_rows` najnowszych rekordów (wektory i rekordy przepisane atomowo).
+        Zwraca liczbę usuniętych.
+        """
+        max_rows = self.max_rows if max_rows is None else max_rows
+        with self._lock, file_lock(f"{self.records_path}.lock"):
+            self._refresh()
+            dropped = max(0, len(self.records) - max_rows)
+            if not dropped:
+                return 0
+            self._map()
+            vectors = self._view[dropped * self.dim:].tobytes()
+            records = self.records[dropped:]
+            self._unmap()
+            lines = b"".join(
+                (json.dumps(r, ensure_ascii=False) + "\n").encode("utf-8") for r in records
+            )
+            # Najpierw wektory: czytelnik pod blokadą nigdy nie zobaczy rekordów bez wektorów
+            write_atomic(self.vectors_path, vectors)
+            write_atomic(self.records_path, lines)
+            self._records_inode = None
+            self._refresh()
+            return dropped
+
+    def search(self, query: str, k: int = 5, min_score: float = 0.0,
+               where: Optional[Callable[[Dict], bool]] = None) -> List[Dict]:
+        """Top-k rekordów najbardziej podobnych do `query` (kopie z polem `score`)."""
+        vector = embed(query, self.dim)
+        with self._lock:
+            # Blokada pliku tylko na doczytanie i mapowanie - mapowanie przetrwa kompaktowanie
+            with file_lock(f"{self.records_path}.lock"):
+                self._refresh()
+                self._map()
+            rows = self._mapped_rows
+            if not rows or not vector:
+                return []
+            scores = [0.0] * rows
+            view = self._view
+            for slot, weight in vector.items():
+                column = view[slot::self.dim].tolist()
+                scores = list(map(operator.add, scores, map(weight.__mul__, column)))
+            candidates = range(rows)
+            if where is not None:
+                candidates = [i for i in candidates if where(self.records[i])]
+            best = heapq.nlargest(k, candidates, key=scores.__getitem__)
+            return [
+                {**self.records[i], "score": round(scores[i], 4)}
+                for i in best if scores[i] > min_score
+            ]
+
+    def close(self):
+        with self._lock:
+            self._unmap()
+
+
+def index_fix_records(index: MemoryIndex, path: str = JULES_MEMORY_FILE) -> int:
+    """Dopisuje do indeksu nowe wpisy `history` z pliku pamięci Julesa. Zwraca liczbę dodanych."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            history = json.load(f).get("history", [])
+    except (OSError, ValueError, AttributeError):
+        return 0
+    added = 0
+    for entry in history:
+        if not isinstance(entry, dict) or not entry.get("error_signature"):
+            continue
+        text = (f"Błąd: {entry['error_signature']} -> strategia: {entry.get('strategy_used', '?')} "
+                f"({entry.get('outcome', '?')})")
+        key = (
+            "fix:"
+            + hashlib.sha1(
+                f"{entry['error_signature']}|{entry.get('timestamp')}".encode("utf-8")
+            ).hexdigest()
+        )
+        added += index.add(key, text, kind="fix", timestamp=entry.get("timestamp"))
+    return added
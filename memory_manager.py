@@ -1,42 +1,383 @@
+import asyncio
+import hashlib
 import logging
+import os
+import threading
+import weakref
+from collections import OrderedDict, deque
+
+from rate_limiter import PRIORITY_BATCH, estimate_tokens
 
 logger = logging.getLogger(__name__)
 
+# Budżet pamięci rozmowy w tokenach (a nie w liczbie wiadomości) - duże pliki nie rozsadzą okna
+DEFAULT_MAX_TOKENS = int(os.getenv("REGIS_MEMORY_TOKENS", "32000"))
+DEFAULT_MAX_MESSAGES = 50
+
+TRUNCATION_MARKER = "\n[... skrócono {tokens} tokenów ...]"
+
+TOKEN_CACHE_SIZE = int(os.getenv("REGIS_TOKEN_CACHE_SIZE", "4096"))
+COUNT_TOKENS_TIMEOUT = float(os.getenv("REGIS_COUNT_TOKENS_TIMEOUT", "10"))
+
+
+class ModelTokenCounter:
+    """
+    Licznik tokenów oparty na `count_tokens` modelu, z cache LRU (klucz: sha256 tekstu).
+
+    `model` to GenerativeModel, GeminiGuard (liczy jego `.model`) albo funkcja bez argumentów
+    zwracająca jedno z nich - rozwiązywana leniwie, przy pierwszym liczeniu. Bez modelu
+    (np. brak klucza API) albo gdy zapytanie się nie powiedzie, zwraca estymację len//4.
+    Wywołany w wątku pętli zdarzeń nie czeka na sieć: od razu zwraca estymację, a dokładną
+    liczbę pobiera w tle do cache.
+    """
+    def __init__(self, model, cache_size=TOKEN_CACHE_SIZE):
+        self._source = model
+        self._model = None
+        self._resolved = False
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._counting = set()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.fallbacks = 0
+
+    def _resolve(self):
+        if not self._resolved:
+            model = self._source
+            if callable(model) and not (hasattr(model, "count_tokens") or hasattr(model, "model")):
+                model = model()
+            model = getattr(model, "model", model)  # GeminiGuard -> GenerativeModel
+            self._model = model if hasattr(model, "count_tokens") else None
+            self._resolved = True
+        return self._model
+
+    def _count_now(self, model, text, key):
+        try:
+            response = model.count_tokens(text, request_options={"timeout": COUNT_TOKENS_TIMEOUT})
+            tokens = int(response.total_tokens)
+        except Exception as e:
+            logger.debug(f"count_tokens nie powiodło się, używam estymacji: {e}")
+            with self._lock:
+                self.fallbacks += 1
+            return estimate_tokens(text)
+        finally:
+            with self._lock:
+                self._counting.discard(key)
+        with self._lock:
+            self._cache[key] = tokens
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return tokens
+
+    def __call__(self, text):
+        if not text:
+            return 0
+        key = hashlib.sha256(text.encode("utf-8")).digest()
+        with self._lock:
+            tokens = self._cache.get(key)
+            if tokens is not None:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return tokens
+            self.misses += 1
+        model = self._resolve()
+        if model is None:
+            return estimate_tokens(text)
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return self._count_now(model, text, key)
+        with self._lock:
+            counting = key in self._counting
+            self._counting.add(key)
+        if not counting:
+            loop.run_in_executor(None, self._count_now, model, text, key)
+        return estimate_tokens(text)
+
+
+def _default_counter(model):
+    return ModelTokenCounter(model) if model is not None else estimate_tokens
+
+
 class MemoryManager:
-    """Zarządza pamięcią podręczną agenta."""
-    def __init__(self):
-        self.history = []
+    """
+    Zarządza pamięcią podręczną agenta.
+    Bezpieczna dla wielu wątków (Regis obsługuje żądania współbieżnie).
+
+    Wiadomości leżą w `deque` razem z liczbą tokenów policzoną raz, przy dodaniu - suma jest
+    utrzymywana przyrostowo, a najstarsze wpisy wypadają w O(1), gdy przekroczony jest budżet
+    `max_tokens` (lub `max_messages`). Pojedyncza wiadomość większa niż cały budżet jest
+    skracana. Tekst kontekstu jest cache'owany i budowany ponownie tylko po zmianie.
+    Tokeny liczy `token_counter`; domyślnie - gdy podano `model` - ModelTokenCounter
+    (`model.count_tokens` z cache), a bez modelu estymacja len//4.
+
+    Z `store` (ConversationStore) i `session` historia przeżywa proces: wiadomości są zapisywane
+    na bieżąco, a przy pierwszym użyciu wczytywana jest tylko końcówka sesji
+    mieszcząca się w budżecie.
+    """
+
+    def __init__(
+        self,
+        max_tokens=DEFAULT_MAX_TOKENS,
+        max_messages=DEFAULT_MAX_MESSAGES,
+        token_counter=None,
+        store=None,
+        session=None,
+        model=None,
+    ):
+        self.max_tokens = max_tokens
+        self.max_messages = max_messages
+        self._count = token_counter or _default_counter(model)
+        self._messages = deque()
+        self.total_tokens = 0
+        self._context = None
+        self._lock = threading.RLock()
+        self.store = store
+        self.session = session
+        self._loaded = store is None or session is None
+
+    def _ensure_loaded(self):
+        if self._loaded:
+            return
+        with self._lock:
+            if self._loaded:
+                return
+            for m in self.store.load_window(self.session, self.max_tokens, self.max_messages):
+                self._append(m["role"], m["content"], m["tokens"])
+            self._loaded = True
+
+    @property
+    def history(self):
+        """Migawka historii tylko do odczytu (krotka) - zmiany wyłącznie przez add_message/clear."""
+        self._ensure_loaded()
+        with self._lock:
+            return tuple({"role": m["role"], "content": m["content"]} for m in self._messages)
+
+    def __len__(self):
+        self._ensure_loaded()
+        return len(self._messages)
+
+    def _fit(self, content):
+        """Skraca treść dłuższą niż cały budżet (zostaje początek - instrukcje i tryb pracy)."""
+        tokens = self._count(content)
+        if tokens <= self.max_tokens:
+            return content, tokens
+        keep = max(0, int(len(content) * self.max_tokens / tokens) - len(TRUNCATION_MARKER) - 16)
+        content = content[:keep] + TRUNCATION_MARKER.format(
+            tokens=tokens - self._count(content[:keep])
+        )
+        return content, self._count(content)
+
+    def _append(self, role, content, tokens):
+        self._messages.append({"role": role, "content": content, "tokens": tokens,
+                               "line": f"{role.upper()}: {content}"})
+        self.total_tokens += tokens
+        while len(self._messages) > 1 and (
+            self.total_tokens > self.max_tokens or len(self._messages) > self.max_messages
+        ):
+            self.total_tokens -= self._messages.popleft()["tokens"]
+        self._context = None
 
     def add_message(self, role, content):
-        self.history.append({"role": role, "content": content})
-        # Prosta polityka retencji - trzymamy ostatnie 50 wiadomości
-        if len(self.history) > 50:
-            self.history.pop(0)
+        content, tokens = self._fit(content)
+        self._ensure_loaded()
+        with self._lock:
+            self._append(role, content, tokens)
+            if self.store is not None and self.session is not None:
+                self.store.append(self.session, role, content, tokens)
+
+    def clear(self):
+        with self._lock:
+            self._messages.clear()
+            self.total_tokens = 0
+            self._context = None
 
     def get_context_string(self):
-        return "\n".join([f"{msg['role'].upper()}: {msg['content']}" for msg in self.history])
+        self._ensure_loaded()
+        with self._lock:
+            if self._context is None:
+                self._context = "\n".join(m["line"] for m in self._messages)
+            return self._context
+
+# Ile ostatnich wypowiedzi zostaje zawsze w oryginale (reszta jest streszczana)
+KEEP_RECENT = 3
+# Od jakiej części budżetu streszczenie jest przygotowywane z wyprzedzeniem (w tle)
+PRECOMPACT_THRESHOLD = 0.75
+SUMMARY_CACHE_SIZE = 128
+
+
+def _message_tokens(message, counter=estimate_tokens):
+    return counter(str(message.get("content", "")))
+
+
+class ContextCompactor:
+    """
+    Kompaktowanie historii przez streszczenie starszych wypowiedzi modelem.
+
+    Streszczenia są cache'owane pod skrótem (sha256) dokładnie tego zakresu wiadomości, który
+    obejmują - kolejne streszczenie zaczyna od najdłuższego już streszczonego prefiksu i dokłada
+    tylko nowe wypowiedzi. `compact()` nigdy nie czeka na model: używa najlepszego gotowego
+    streszczenia (plus nieobjęte nim wypowiedzi, najstarsze odrzucane, jeśli nie mieszczą się
+    w budżecie), a pełne streszczenie zleca w tle. Gdy historia przekroczy `threshold` budżetu,
+    streszczenie jest liczone z wyprzedzeniem, więc zwykle jest gotowe, zanim będzie potrzebne.
+    Tokeny liczy `token_counter`, domyślnie `count_tokens` modelu klienta (ModelTokenCounter).
+    """
+    def __init__(self, model_client=None, max_tokens=4000, keep_recent=KEEP_RECENT,
+                 threshold=PRECOMPACT_THRESHOLD, token_counter=None):
+        self.model_client = model_client
+        self.max_tokens = max_tokens
+        self.keep_recent = keep_recent
+        self.threshold = threshold
+        self._count = token_counter or _default_counter(model_client)
+        self._summaries = OrderedDict()  # skrót zakresu (prefiksu historii) -> streszczenie
+        self._pending = {}  # skrót zakresu -> asyncio.Task
+        self.summaries_made = 0
+        self.cache_hits = 0
+
+    # --- Zakresy i cache ---------------------------------------------------
+
+    @staticmethod
+    def _prefix_keys(messages):
+        """Skróty wszystkich prefiksów `messages` (jeden przebieg, inkrementalnie)."""
+        digest = hashlib.sha256()
+        keys = []
+        for message in messages:
+            digest.update(f"{message.get('role')}\x00{message.get('content')}\x01".encode("utf-8"))
+            keys.append(digest.hexdigest())
+        return keys
+
+    def _best_summary(self, keys):
+        """(liczba objętych wiadomości, streszczenie) dla najdłuższego streszczonego prefiksu."""
+        for covered in range(len(keys), 0, -1):
+            entry = self._summaries.get(keys[covered - 1])
+            if entry is not None:
+                self._summaries.move_to_end(keys[covered - 1])
+                return covered, entry
+        return 0, None
+
+    def _remember(self, key, summary):
+        self._summaries[key] = summary
+        self._summaries.move_to_end(key)
+        while len(self._summaries) > SUMMARY_CACHE_SIZE:
+            self._summaries.popitem(last=False)
+
+    # --- Streszczanie w tle --------------------------------------------------
+
+    async def _summarize(self, key, old, keys):
+        covered, entry = self._best_summary(keys)
+        parts = []
+        if entry:
+            parts.append(f"Dotychczasowe streszczenie:\n{entry}")
+        parts.extend(f"{m.get('role')}: {m.get('content')}" for m in old[covered:])
+        prompt = (
+            "Streść poniższy fragment dyskusji w maks. 5 zdaniach. Zachowaj tezy każdej strony, "
+            "ustalenia i otwarte kwestie. Nie dodawaj nic od siebie.\n\n" + "\n".join(parts)
+        )
+        try:
+            summary = await self.model_client.generate_content_async(
+                prompt, temperature=0.2, priority=PRIORITY_BATCH
+            )
+            self._remember(key, summary.strip())
+            self.summaries_made += 1
+        except Exception as e:
+            logger.warning(f"Streszczanie kontekstu nie powiodło się: {e}")
+        finally:
+            self._pending.pop(key, None)
+
+    def _schedule(self, old, keys):
+        if self.model_client is None or not old:
+            return
+        key = keys[-1]
+        if key in self._summaries or key in self._pending:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        self._pending[key] = loop.create_task(self._summarize(key, old, keys))
+
+    def prefetch(self, history):
+        """Zleca streszczenie w tle, jeśli historia zbliża się do budżetu (nie czeka na wynik)."""
+        if sum(_message_tokens(m, self._count) for m in history) < self.threshold * self.max_tokens:
+            return
+        old = history[:-self.keep_recent] if self.keep_recent else list(history)
+        self._schedule(old, self._prefix_keys(old))
+
+    async def wait_pending(self):
+        """Czeka na streszczenia w toku (np. przed zakończeniem programu lub w testach)."""
+        if self._pending:
+            await asyncio.gather(*self._pending.values(), return_exceptions=True)
+
+    # --- Kompaktowanie -------------------------------------------------------
+
+    async def compact(self, history):
+        total = sum(_message_tokens(m, self._count) for m in history)
+        if total <= self.max_tokens:
+            if total >= self.threshold * self.max_tokens:
+                self.prefetch(history)
+            return history
+
+        logger.info("🔪 Wykryto przekroczenie limitu tokenów. Optymalizacja kontekstu...")
+        recent = history[-self.keep_recent:] if self.keep_recent else []
+        old = history[:len(history) - len(recent)]
+        if not old:
+            return recent
+
+        keys = self._prefix_keys(old)
+        covered, summary = self._best_summary(keys)
+        if covered == len(old):
+            self.cache_hits += 1
+        else:
+            self._schedule(old, keys)
+
+        head = (
+            [
+                {
+                    "role": "system",
+                    "content": f"[Streszczenie wcześniejszych {covered} wypowiedzi]: {summary}",
+                }
+            ]
+            if summary
+            else []
+        )
+        tail = list(old[covered:])
+        budget = self.max_tokens - sum(_message_tokens(m, self._count) for m in head + recent)
+        tail_tokens = sum(_message_tokens(m, self._count) for m in tail)
+        if tail_tokens > budget:
+            note = {
+                "role": "system",
+                "content": (
+                    f"[Pominięto {len(tail)} starszych wypowiedzi - streszczenie w przygotowaniu.]"
+                ),
+            }
+            budget -= _message_tokens(note, self._count)
+            dropped = 0
+            while tail and tail_tokens > budget:
+                tail_tokens -= _message_tokens(tail.pop(0), self._count)
+                dropped += 1
+            note["content"] = (
+                f"[Pominięto {dropped} starszych wypowiedzi - streszczenie w przygotowaniu.]"
+            )
+            head.append(note)
+        return head + tail + recent
+
+
+_compactors = weakref.WeakKeyDictionary()
+
 
 async def optimize_context(history, max_tokens=4000, model_client=None):
     """
     Inteligentnie skracanie historii.
-    Jeśli historia jest długa, podsumowuje starsze wpisy.
-    """
-    # Symulacja liczenia tokenów (1 słowo ~= 1.3 tokena)
-    estimated_tokens = sum(len(str(m.get('content', ''))) for m in history) // 3
-    
-    if estimated_tokens < max_tokens:
-        return history
-
-    logger.info("🔪 Wykryto przekroczenie limitu tokenów. Optymalizacja kontekstu...")
-    
-    # Zachowaj ostatnie 3 wiadomości bez zmian
-    recent_history = history[-3:]
-    old_history = history[:-3]
-
-    if not old_history:
-        return recent_history
-
-    summary_text = f"[System: Poprzednie {len(old_history)} rund debaty zostało zarchiwizowane ze względu na limit pamięci.]"
-    
-    optimized_history = [{"role": "system", "content": summary_text}] + recent_history
-    return optimized_history
\ No newline at end of file
+    Jeśli historia jest długa, starsze wpisy są zastępowane streszczeniem (ContextCompactor
+    współdzielony per klient modelu); bez klienta najstarsze wpisy są tylko odrzucane.
+    """
+    if model_client is None:
+        return await ContextCompactor(None, max_tokens=max_tokens).compact(history)
+    compactor = _compactors.get(model_client)
+    if compactor is None or compactor.max_tokens != max_tokens:
+        compactor = _compactors[model_client] = ContextCompactor(
+            model_client, max_tokens=max_tokens
+        )
+    return await compactor.compact(history)
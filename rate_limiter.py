@@ -0,0 +1,256 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Klasy priorytetów - niższa wartość = wcześniej w kolejce
+PRIORITY_INTERACTIVE = 0  # czat /api/chat, CLI na żądanie użytkownika
+PRIORITY_DEFAULT = 1
+PRIORITY_BATCH = 2        # audyty Julesa, debaty w tle
+
+PRIORITY_NAMES = {
+    PRIORITY_INTERACTIVE: "interactive",
+    PRIORITY_DEFAULT: "default",
+    PRIORITY_BATCH: "batch",
+}
+
+# Jak często oczekujący (nie będący na czele kolejki) sprawdzają stan w trybie async
+_ASYNC_POLL_INTERVAL = 0.02
+
+
+def estimate_tokens(text):
+    """Zgrubna estymacja liczby tokenów (~4 znaki na token)."""
+    return max(1, len(text) // 4)
+
+
+class TokenBucket:
+    """Kubełek tokenów uzupełniany liniowo: `per_minute` tokenów na minutę."""
+    def __init__(self, per_minute, capacity=None, clock=time.monotonic):
+        self.rate = per_minute / 60.0
+        self.capacity = capacity or per_minute
+        self.tokens = float(self.capacity)
+        self._clock = clock
+        self.updated = clock()
+
+    def _refill(self, now):
+        elapsed = now - self.updated
+        if elapsed > 0:
+            self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+            self.updated = now
+
+    def delay_for(self, amount, now):
+        """Ile sekund trzeba poczekać, aż w kubełku będzie `amount` tokenów (0 = od razu)."""
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    def consume(self, amount, now):
+        self._refill(now)
+        self.tokens -= min(amount, self.capacity)
+
+    def adjust(self, delta):
+        """Korekta po poznaniu rzeczywistego zużycia (może zejść poniżej zera - dług)."""
+        self.tokens = min(self.capacity, self.tokens - delta)
+
+
+class _Ticket:
+    __slots__ = ("priority", "cost", "tag", "seq", "enqueued", "granted", "cancelled")
+
+    def __init__(self, priority, cost, tag, seq, enqueued):
+        self.priority = priority
+        self.cost = cost
+        self.tag = tag
+        self.seq = seq
+        self.enqueued = enqueued
+        self.granted = False
+        self.cancelled = False
+
+    def sort_key(self):
+        return (self.priority, self.tag, self.seq)
+
+
+class RequestScheduler:
+    """
+    Planista zapytań do Gemini z limitami RPM/TPM (kubełki tokenów).
+
+    Zapytania czekają w jednej kolejce uporządkowanej po (priorytet, znacznik fair-queuing).
+    W obrębie priorytetu kolejni nadawcy (`caller`) są przeplatani według wirtualnego czasu
+    (start-time fair queuing), więc jeden masowy audyt nie zagłodzi innych. `caller` to stała
+    tożsamość przekazywana jawnie (komponent, temat debaty); domyślnie nazwa klasy priorytetu.
+    Znaczniki nadawców, które zostały w tyle za czasem wirtualnym, są usuwane. Obsługuje
+    zarówno wątki (`acquire`), jak i korutyny (`acquire_async`) w tym samym procesie.
+    """
+    def __init__(self, rpm=None, tpm=None, clock=time.monotonic):
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._cond = threading.Condition(self._lock)
+        self._queue = []  # heap: (sort_key, ticket)
+        self._seq = itertools.count()
+        self._vtime = 0.0
+        self._finish_tags = {}
+        self.rpm_bucket = TokenBucket(rpm, clock=clock) if rpm else None
+        self.tpm_bucket = TokenBucket(tpm, clock=clock) if tpm else None
+
+        self.granted = 0
+        self.max_queue_depth = 0
+        self._wait_total = {p: 0.0 for p in PRIORITY_NAMES}
+        self._wait_max = {p: 0.0 for p in PRIORITY_NAMES}
+        self._granted_by_priority = {p: 0 for p in PRIORITY_NAMES}
+
+    # --- Kolejka -----------------------------------------------------------
+
+    def _enqueue(self, cost, priority, caller):
+        if caller is None:
+            caller = PRIORITY_NAMES.get(priority, str(priority))
+        start_tag = max(self._vtime, self._finish_tags.get(caller, 0.0))
+        self._finish_tags[caller] = start_tag + cost
+        ticket = _Ticket(priority, cost, start_tag, next(self._seq), self._clock())
+        heapq.heappush(self._queue, (ticket.sort_key(), ticket))
+        self.max_queue_depth = max(self.max_queue_depth, len(self._queue))
+        return ticket
+
+    def _head(self):
+        while self._queue and self._queue[0][1].cancelled:
+            heapq.heappop(self._queue)
+        return self._queue[0][1] if self._queue else None
+
+    def _try_grant(self, ticket):
+        """Zwraca 0, jeśli bilet został przydzielony, a w przeciwnym razie czas czekania."""
+        head = self._head()
+        if head is not ticket:
+            return None
+        now = self._clock()
+        delay = 0.0
+        if self.rpm_bucket:
+            delay = max(delay, self.rpm_bucket.delay_for(1, now))
+        if self.tpm_bucket:
+            delay = max(delay, self.tpm_bucket.delay_for(ticket.cost, now))
+        if delay > 0:
+            return delay
+
+        heapq.heappop(self._queue)
+        if self.rpm_bucket:
+            self.rpm_bucket.consume(1, now)
+        if self.tpm_bucket:
+            self.tpm_bucket.consume(ticket.cost, now)
+        self._vtime = ticket.tag
+        if self._head() is None:
+            # Koniec okresu zajętości - czas wirtualny dogania najpóźniejszy znacznik końca
+            self._vtime = max(self._finish_tags.values(), default=self._vtime)
+        self._prune_tags()
+        ticket.granted = True
+
+        waited = now - ticket.enqueued
+        self.granted += 1
+        self._granted_by_priority[ticket.priority] = (
+            self._granted_by_priority.get(ticket.priority, 0) + 1
+        )
+        self._wait_total[ticket.priority] = self._wait_total.get(ticket.priority, 0.0) + waited
+        self._wait_max[ticket.priority] = max(self._wait_max.get(ticket.priority, 0.0), waited)
+        self._cond.notify_all()
+        return 0.0
+
+    def _prune_tags(self):
+        """Usuwa znaczniki <= czasu wirtualnego - dla kolejnego biletu liczyłby się `_vtime`."""
+        stale = [caller for caller, tag in self._finish_tags.items() if tag <= self._vtime]
+        for caller in stale:
+            del self._finish_tags[caller]
+
+    def _cancel(self, ticket):
+        ticket.cancelled = True
+        self._cond.notify_all()
+
+    # --- API ---------------------------------------------------------------
+
+    def acquire(self, tokens=1, priority=PRIORITY_DEFAULT, caller=None, timeout=None):
+        """
+        Blokuje wątek do czasu przydziału. Zwraca czas oczekiwania w sekundach.
+
+        `caller` - stała tożsamość nadawcy dla fair queuing (nie nazwa wątku ani zadania,
+        bo te są unikalne i każde zapytanie byłoby osobnym nadawcą).
+        """
+        deadline = None if timeout is None else self._clock() + timeout
+        with self._cond:
+            ticket = self._enqueue(tokens, priority, caller)
+            while True:
+                delay = self._try_grant(ticket)
+                if delay == 0.0:
+                    return self._clock() - ticket.enqueued
+                if deadline is not None:
+                    remaining = deadline - self._clock()
+                    if remaining <= 0:
+                        self._cancel(ticket)
+                        raise TimeoutError("Przekroczono czas oczekiwania na limit zapytań Gemini")
+                    delay = remaining if delay is None else min(delay, remaining)
+                self._cond.wait(delay)
+
+    async def acquire_async(self, tokens=1, priority=PRIORITY_DEFAULT, caller=None):
+        """Wersja dla korutyn - czeka przez asyncio.sleep, nie blokując pętli zdarzeń."""
+        with self._lock:
+            ticket = self._enqueue(tokens, priority, caller)
+        try:
+            while True:
+                with self._lock:
+                    delay = self._try_grant(ticket)
+                if delay == 0.0:
+                    return self._clock() - ticket.enqueued
+                await asyncio.sleep(delay if delay is not None else _ASYNC_POLL_INTERVAL)
+        except BaseException:
+            with self._lock:
+                if not ticket.granted:
+                    self._cancel(ticket)
+            raise
+
+    def record_usage(self, estimated, actual):
+        """Rozlicza różnicę między estymacją a faktycznym zużyciem tokenów (usage_metadata)."""
+        if self.tpm_bucket and actual:
+            with self._lock:
+                self.tpm_bucket.adjust(actual - estimated)
+
+    def stats(self):
+        with self._lock:
+            self._head()
+            waits = {}
+            for priority, name in PRIORITY_NAMES.items():
+                granted = self._granted_by_priority.get(priority, 0)
+                waits[name] = {
+                    "granted": granted,
+                    "avg_wait_s": round(self._wait_total.get(priority, 0.0) / granted, 4)
+                    if granted
+                    else 0.0,
+                    "max_wait_s": round(self._wait_max.get(priority, 0.0), 4),
+                }
+            return {
+                "rpm": int(self.rpm_bucket.rate * 60) if self.rpm_bucket else None,
+                "tpm": int(self.tpm_bucket.rate * 60) if self.tpm_bucket else None,
+                "callers": len(self._finish_tags),
+                "queue_depth": sum(1 for _, t in self._queue if not t.cancelled),
+                "max_queue_depth": self.max_queue_depth,
+                "granted": self.granted,
+                "priorities": waits,
+            }
+
+
+_default_scheduler = RequestScheduler(
+    rpm=int(os.getenv("GEMINI_RPM", "0")) or None,
+    tpm=int(os.getenv("GEMINI_TPM", "0")) or None,
+)
+
+
+def get_scheduler():
+    """Wspólny planista procesu (limity z GEMINI_RPM / GEMINI_TPM; 0 = bez limitu)."""
+    return _default_scheduler
+
+
+def configure_scheduler(rpm=None, tpm=None):
+    """Podmienia wspólnego planistę (np. z ustawień CLI lub backendu)."""
+    global _default_scheduler
+    _default_scheduler = RequestScheduler(rpm=rpm, tpm=tpm)
+    return _default_scheduler
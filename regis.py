@@ -1,9 +1,21 @@
-import threading
-import logging
+import hashlib
 import json  # [DODANO] Wymagane do serializacji konfiguracji agenta
-from typing import Dict, Any
-from memory_manager import MemoryManager
-from gemini_client import generate_content_safe
+import logging
+import os
+import threading
+from typing import Any, Callable, Dict, Iterator
+
+from chunker import map_reduce
+from conversation_store import ConversationStore
+from gemini_client import generate_content_safe, get_guard, run_async, stream_content_safe
+from memory_index import MemoryIndex, index_fix_records
+from memory_manager import MemoryManager, ModelTokenCounter
+from request_executor import (
+    ExecutorBusyError,
+    RequestExecutor,
+    RequestTimeoutError,
+    executor_from_env,
+)
 
 # --- WSTRZYKNIĘCIE ARCY-PROMPTU V4.0 (Jules Auditor) ---
 _ARCY_DATA = {
@@ -34,19 +46,100 @@ class RegisError(Exception): pass
 class JulesError(RegisError): pass  # Alias for compatibility if needed or separate error
 class BrainConnectionError(RegisError): pass
 class ContextError(RegisError): pass
+class RegisBusyError(RegisError): pass  # Limit żądań w toku wyczerpany - spróbuj ponownie później
+class RegisTimeoutError(RegisError): pass
+
+# Pliki dłuższe niż limit nie są wklejane w całości -
+# trafiają do promptu jako streszczenie fragmentów
+INLINE_FILE_LIMIT = int(os.getenv("REGIS_INLINE_FILE_CHARS", "30000"))
+# Budżet historii sesji (--session) dołączanej do promptu
+SESSION_WINDOW_TOKENS = int(os.getenv("REGIS_SESSION_WINDOW_TOKENS", "8000"))
+# Zamiast całego okna historii do promptu trafia ostatnia wymiana + top-k trafień z indeksu pamięci
+RECALL_K = int(os.getenv("REGIS_RECALL_K", "5"))
+RECALL_MIN_SCORE = float(os.getenv("REGIS_RECALL_MIN_SCORE", "0.2"))
+RECALL_SNIPPET_CHARS = int(os.getenv("REGIS_RECALL_SNIPPET_CHARS", "600"))
+RECENT_MESSAGES = 2
 
 logger = logging.getLogger(__name__)
-processing_lock = threading.Lock()
-memory = MemoryManager()
+# Żądania są wykonywane współbieżnie (REGIS_MAX_WORKERS) - praca to głównie czekanie na Gemini
+executor = executor_from_env()
+# Tokeny pamięci rozmowy liczy model (count_tokens, z cache); bez klucza API - estymacja len//4
+token_counter = ModelTokenCounter(get_guard)
+memory = MemoryManager(token_counter=token_counter)
+_store = None
+_sessions: Dict[str, MemoryManager] = {}
+_sessions_lock = threading.Lock()
 
-def process_request(payload: Dict[str, Any]) -> str:
-    if processing_lock.locked():
-        logger.warning("System zajęty. Oczekiwanie na zwolnienie zasobów...")
-    
-    with processing_lock:
-        return _safe_execute(payload)
+def get_memory(session: str = None) -> MemoryManager:
+    """
+    Pamięć rozmowy: bez sesji ulotna (per proces),
+    z sesją - trwała, wczytywana leniwie z ConversationStore.
+    """
+    global _store
+    if not session:
+        return memory
+    with _sessions_lock:
+        if session not in _sessions:
+            if _store is None:
+                _store = ConversationStore()
+            _sessions[session] = MemoryManager(
+                max_tokens=SESSION_WINDOW_TOKENS, store=_store, session=session,
+                token_counter=token_counter,
+            )
+        return _sessions[session]
 
-def _safe_execute(payload: Dict[str, Any]) -> str:
+_index = None
+_index_lock = threading.Lock()
+
+def get_memory_index() -> MemoryIndex:
+    """Indeks pamięci (leniwie); przy otwarciu dopisuje nowe wpisy z JULES_MEMORY_FILE."""
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = MemoryIndex()
+            index_fix_records(_index)
+        return _index
+
+def configure_executor(max_workers=None, max_queue=None, timeout=None, admission_timeout=None):
+    """Podmienia wykonawcę żądań (dla hostów osadzających Regis); pominięte wartości zostają."""
+    global executor
+    previous = executor
+    executor = RequestExecutor(
+        max_workers=max_workers or previous.max_workers,
+        max_queue=previous.max_queue if max_queue is None else max_queue,
+        timeout=previous.timeout if timeout is None else timeout,
+        admission_timeout=previous.admission_timeout
+        if admission_timeout is None
+        else admission_timeout,
+    )
+    previous.shutdown(wait=False)
+    return executor
+
+def process_request(payload: Dict[str, Any], timeout: float = None) -> str:
+    try:
+        return executor.submit(_safe_execute, payload, timeout=timeout)
+    except ExecutorBusyError as e:
+        raise RegisBusyError(f"System zajęty: {e}")
+    except RequestTimeoutError as e:
+        raise RegisTimeoutError(str(e))
+
+def process_request_stream(payload: Dict[str, Any], timeout: float = None) -> Iterator[str]:
+    """Jak process_request, ale zwraca fragmenty odpowiedzi w miarę generowania."""
+    try:
+        yield from executor.stream(_safe_execute_stream, payload, timeout=timeout)
+    except ExecutorBusyError as e:
+        raise RegisBusyError(f"System zajęty: {e}")
+    except RequestTimeoutError as e:
+        raise RegisTimeoutError(str(e))
+
+def _build_prompt(payload: Dict[str, Any], recall: Callable[[str], str] = None):
+    """
+    Zwraca (prompt, wpis_do_pamięci, komunikat_błędu) - przy błędzie prompt i wpis to None.
+
+    Wpis do pamięci to zwięzły opis tury (tryb, plik jako ścieżka + sha256 + rozmiar, kontekst),
+    a nie pełny prompt - historia sesji nie powiela treści plików przy kolejnych wywołaniach.
+    `recall(wpis)` zwraca pamięć dołączaną do promptu (wyszukaną po opisie bieżącej tury).
+    """
     mode = payload.get("mode")
     target_file = payload.get("target_file")
     user_context = payload.get("user_context")
@@ -56,33 +149,146 @@ def _safe_execute(payload: Dict[str, Any]) -> str:
     # Budowanie promptu z obsługą błędów plikowych
     # [ZMODYFIKOWANO] Dodano SYSTEM_INSTRUCTION na początku listy
     prompt_parts = [SYSTEM_INSTRUCTION, f"Mode: {mode}."]
+    turn_parts = [f"Mode: {mode}."]
     
     if target_file:
         try:
             with open(target_file, 'r', encoding='utf-8') as f:
                 content = f.read()
-            # Używamy eskejpowania backslashy dla newlines w f-stringu zapisanym do pliku
-            prompt_parts.append(f"Input file ({target_file}):\n```\n{content}\n```")
         except FileNotFoundError:
-            return f"❌ Błąd: Nie znaleziono pliku {target_file}"
+            return None, None, f"❌ Błąd: Nie znaleziono pliku {target_file}"
         except Exception as e:
-            return f"❌ Błąd odczytu pliku: {str(e)}"
+            return None, None, f"❌ Błąd odczytu pliku: {str(e)}"
+        sha = hashlib.sha256(content.encode("utf-8")).hexdigest()[:16]
+        turn_parts.append(f"Input file: {target_file} (sha256 {sha}, {len(content)} znaków)")
+
+        if len(content) > INLINE_FILE_LIMIT:
+            try:
+                digest = run_async(_digest_file(content, target_file, mode))
+            except Exception as e:
+                logger.error(f"Critical Brain Failure (map-reduce): {e}")
+                raise BrainConnectionError(f"Nie udało się przeanalizować pliku fragmentami: {e}")
+            prompt_parts.append(
+                f"Input file ({target_file}, {len(content)} znaków - streszczenie fragmentów):\n"
+                f"{digest}"
+            )
+        else:
+            # Używamy eskejpowania backslashy dla newlines w f-stringu zapisanym do pliku
+            prompt_parts.append(f"Input file ({target_file}):\n```\n{content}\n```")
 
     if user_context:
         prompt_parts.append(f"Context: {user_context}")
+        turn_parts.append(f"Context: {user_context}")
+
+    turn = "\n".join(turn_parts)
+    remembered = recall(turn) if recall else ""
+    if remembered:
+        prompt_parts.insert(1, remembered)
+    return "\n".join(prompt_parts), turn, None
 
-    final_prompt = "\n".join(prompt_parts)
-    memory.add_message("user", final_prompt)
+def _recall(session: str, conversation: MemoryManager, turn: str) -> str:
+    """
+    Ostatnia wymiana sesji + najbardziej podobne wcześniejsze tury tej sesji i zapisane poprawki.
+    Bez sesji - tylko poprawki: tury z innych wywołań nigdy nie trafiają do promptu.
+    """
+    sections = []
+    recent = conversation.history[-RECENT_MESSAGES:] if session else []
+    if recent:
+        sections.append("Previous turns of this session:\n" + "\n".join(
+            f"{m['role'].upper()}: {m['content']}" for m in recent
+        ))
+    recent_users = {m["content"] for m in recent if m["role"] == "user"}
+    try:
+        hits = get_memory_index().search(
+            turn,
+            k=RECALL_K,
+            min_score=RECALL_MIN_SCORE,
+            where=lambda r: (
+                r.get("kind") == "fix"
+                or (
+                    session is not None
+                    and r.get("session") == session
+                    and r.get("user") not in recent_users
+                )
+            ),
+        )
+    except Exception as e:
+        logger.warning(f"Memory index unavailable: {e}")
+        hits = []
+    if hits:
+        sections.append(
+            "Relevant memory (past turns and fixes):\n" + "\n".join(f"- {h['text']}" for h in hits)
+        )
+    return "\n".join(sections)
+
+def _remember_turn(session: str, turn: str, response: str):
+    """Indeksuje zakończoną turę sesji (opis + początek odpowiedzi); tury bez sesji pomija."""
+    if not session:
+        return
+    snippet = (
+        response if len(response) <= RECALL_SNIPPET_CHARS else response[:RECALL_SNIPPET_CHARS] + "…"
+    )
+    key = "turn:" + hashlib.sha1(f"{session}|{turn}|{response}".encode("utf-8")).hexdigest()
+    try:
+        get_memory_index().add(
+            key, f"USER: {turn}\nMODEL: {snippet}", kind="turn", session=session, user=turn
+        )
+    except Exception as e:
+        logger.warning(f"Failed to index turn: {e}")
+
+async def _digest_file(content: str, target_file: str, mode: str) -> str:
+    """Map-reduce dużego pliku: każdy fragment streszczany współbieżnie pod kątem trybu pracy."""
+    guard = get_guard()
+
+    async def summarize(chunk):
+        return await guard.generate_content_async(
+            f"Mode: {mode}. Poniżej FRAGMENT większego pliku {os.path.basename(target_file)}.\n"
+            f"Streść go zwięźle: sygnatury funkcji/klas, kluczowa logika, potencjalne błędy.\n"
+            f"```\n{chunk.text}\n```",
+            temperature=0.2
+        )
+
+    return await map_reduce(content, target_file, summarize)
+
+def _safe_execute(payload: Dict[str, Any]) -> str:
+    session = payload.get("session")
+    conversation = get_memory(session)
+    final_prompt, turn, error = _build_prompt(payload, lambda t: _recall(session, conversation, t))
+    if error:
+        return error
+    conversation.add_message("user", turn)
 
     try:
         response_text = generate_content_safe(final_prompt)
-        memory.add_message("model", response_text)
+        conversation.add_message("model", response_text)
+        _remember_turn(session, turn, response_text)
         return response_text
 
     except Exception as e:
         logger.error(f"Critical Brain Failure: {e}")
         raise BrainConnectionError(f"Nie udało się połączyć z API Gemini: {e}")
 
+def _safe_execute_stream(payload: Dict[str, Any]) -> Iterator[str]:
+    session = payload.get("session")
+    conversation = get_memory(session)
+    final_prompt, turn, error = _build_prompt(payload, lambda t: _recall(session, conversation, t))
+    if error:
+        yield error
+        return
+    conversation.add_message("user", turn)
+
+    parts = []
+    try:
+        for chunk in stream_content_safe(final_prompt):
+            parts.append(chunk)
+            yield chunk
+    except Exception as e:
+        logger.error(f"Critical Brain Failure: {e}")
+        raise BrainConnectionError(f"Nie udało się połączyć z API Gemini: {e}")
+    response_text = "".join(parts)
+    conversation.add_message("model", response_text)
+    _remember_turn(session, turn, response_text)
+
 if __name__ == "__main__":
     logging.basicConfig(level=logging.INFO)
     print("Regis Core System Loaded.")
\ No newline at end of file
@@ -1,5 +1,8 @@
 import argparse
+import asyncio
 import sys
+import json
+import time
 import logging
 from typing import Optional
 
@@ -7,16 +10,89 @@ from typing import Optional
 # If you refactor into packages, change imports to: from jules.core import regis
 try:
     import regis
-    from regis import JulesError, BrainConnectionError
+    from regis import JulesError, BrainConnectionError, RegisBusyError, RegisTimeoutError
 except ImportError:
     # Fallback for flat file structure
     import regis
-    from regis import JulesError, BrainConnectionError
+    from regis import JulesError, BrainConnectionError, RegisBusyError, RegisTimeoutError
+from event_log import get_event_log
+from response_cache import enable_default_cache
 
 # Logging configuration
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Chat and debate answers are meant to differ between runs - the persistent cache would replay
+# them, so for these commands it is opt-in (--cache); other commands use it unless --no-cache
+CACHE_OPT_IN_COMMANDS = {"chat", "debate"}
+
+def format_event(event: dict) -> str:
+    """One line per event: [seq] HH:MM:SS source/type: text (or the remaining fields)."""
+    stamp = time.strftime("%H:%M:%S", time.localtime(event["ts"]))
+    fields = {k: v for k, v in event.items() if k not in ("seq", "ts", "source", "type")}
+    text = fields.pop("text", None) or json.dumps(fields, ensure_ascii=False)
+    return f"[{event['seq']}] {stamp} {event['source']}/{event['type']}: {text}"
+
+def show_status(since: int, follow: bool):
+    """Prints agent events newer than `since`; with `follow`, keeps tailing the event log."""
+    events = get_event_log()
+    last = since
+    for event in events.read_since(since):
+        print(format_event(event))
+        last = event["seq"]
+    if follow:
+        for event in events.follow(last):
+            print(format_event(event), flush=True)
+    elif last == since:
+        print(f"No events after seq {since}.")
+
+def run_debates(args):
+    """debate: one topic from --context, or a batch from --topics-file run concurrently."""
+    from convergence import ConvergenceDetector
+    from debate import SimpleDebate, load_topics
+    from io_guard import IOGuard
+
+    topics = (
+        load_topics(args.topics_file)
+        if args.topics_file
+        else [args.context]
+        if args.context
+        else []
+    )
+    if not topics:
+        print("❌ Give a topic with --context or a file of topics with --topics-file.")
+        sys.exit(1)
+    # --output: debates are saved as they run - an in-memory document, one write per round/second
+    transcript = IOGuard(args.output, flush_interval=1.0, load=False) if args.output else None
+    engine = SimpleDebate(
+        agents=args.agents, topology=args.topology, chat=args.chat_session, transcript=transcript
+    )
+    if args.until_converged:
+        engine.detector = ConvergenceDetector(judge=engine.client if args.judge else None)
+    started = time.monotonic()
+    try:
+        if len(topics) == 1:
+            results = {
+                topics[0]: asyncio.run(
+                    engine.run(topics[0], rounds=args.rounds, max_rounds=args.max_rounds)
+                )
+            }
+        else:
+            results = asyncio.run(engine.run_many(
+                topics, rounds=args.rounds, workers=args.workers, max_rounds=args.max_rounds
+            ))
+    finally:
+        if transcript is not None:
+            transcript.close()
+    elapsed = time.monotonic() - started
+
+    print("\n--- DEBATES ---\n")
+    for topic, history in results.items():
+        print(f"{'✅' if history else '❌'} {topic}: {len(history)} turns")
+    print(f"\n{len(topics)} topic(s) in {elapsed:.1f}s")
+    if transcript is not None:
+        print(f"Transcripts saved to {args.output} ({transcript.writes} writes)")
+
 def main():
     """
     Main entry point for Jules CLI.
@@ -30,7 +106,7 @@ def main():
     # Main command (analyze, debug, etc.)
     parser.add_argument(
         "command",
-        choices=["analyze", "debug", "refactor", "chat"],
+        choices=["analyze", "debug", "refactor", "chat", "status", "debate"],
         help="Agent operation mode"
     )
 
@@ -53,12 +129,128 @@ def main():
         help="Enables verbose debug mode"
     )
 
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Print the answer token by token as it arrives"
+    )
+
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Bypass the response cache and always call Gemini"
+    )
+
+    parser.add_argument(
+        "--cache",
+        action="store_true",
+        help="chat/debate: reuse cached answers for identical prompts "
+        "(off by default for these commands)",
+    )
+
+    parser.add_argument(
+        "--session", "-s",
+        type=str,
+        help="Conversation session ID; prior turns of the session are kept on disk and reused"
+    )
+
+    parser.add_argument(
+        "--since",
+        type=int,
+        default=0,
+        help="status: only show events with a sequence number greater than this"
+    )
+
+    parser.add_argument(
+        "--follow",
+        action="store_true",
+        help="status: keep printing new events as they are appended"
+    )
+
+    parser.add_argument(
+        "--topics-file",
+        type=str,
+        help="debate: file with one topic per line; all topics are debated concurrently"
+    )
+
+    parser.add_argument(
+        "--rounds",
+        type=int,
+        default=3,
+        help="debate: number of rounds per topic"
+    )
+
+    parser.add_argument(
+        "--agents",
+        type=int,
+        default=2,
+        help="debate: number of agents taking part in each debate"
+    )
+
+    parser.add_argument(
+        "--topology",
+        choices=["sequential", "simultaneous", "panel"],
+        default="sequential",
+        help="debate: turn order (reply chain, parallel openings, or parallel panel rounds)"
+    )
+
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=4,
+        help="debate: how many topics run at the same time"
+    )
+
+    parser.add_argument(
+        "--until-converged",
+        action="store_true",
+        help="debate: stop early once the agents agree or repeat themselves"
+    )
+
+    parser.add_argument(
+        "--max-rounds",
+        type=int,
+        help="debate: with --until-converged, keep debating past --rounds up to this many rounds"
+    )
+
+    parser.add_argument(
+        "--judge",
+        action="store_true",
+        help="debate: with --until-converged, ask the model to judge borderline rounds"
+    )
+
+    parser.add_argument(
+        "--chat-session",
+        action="store_true",
+        help="debate: give every agent its own Gemini chat session and send only the new turns"
+    )
+
+    parser.add_argument(
+        "--output", "-o",
+        type=str,
+        help="debate: write the full transcripts to this JSON file"
+    )
+
     args = parser.parse_args()
 
     if args.debug:
         logger.setLevel(logging.DEBUG)
         logger.debug("DEBUG mode enabled. Jules sees everything.")
 
+    if args.command == "status":
+        try:
+            show_status(args.since, args.follow)
+        except KeyboardInterrupt:
+            pass
+        return
+
+    if not args.no_cache and (args.cache or args.command not in CACHE_OPT_IN_COMMANDS):
+        enable_default_cache()
+
+    if args.command == "debate":
+        run_debates(args)
+        return
+
     try:
         logger.info(f"Starting procedure: {args.command.upper()}")
         
@@ -66,20 +258,35 @@ def main():
         request_payload = {
             "mode": args.command,
             "target_file": args.file,
-            "user_context": args.context
+            "user_context": args.context,
+            "session": args.session
         }
 
         # Invoke core logic
-        result = regis.process_request(request_payload)
-        
-        print("\n--- JULES OUTPUT ---\n")
-        print(result)
-        print("\n--------------------\n")
+        if args.stream:
+            print("\n--- JULES OUTPUT ---\n")
+            for chunk in regis.process_request_stream(request_payload):
+                print(chunk, end="", flush=True)
+            print("\n\n--------------------\n")
+        else:
+            result = regis.process_request(request_payload)
+
+            print("\n--- JULES OUTPUT ---\n")
+            print(result)
+            print("\n--------------------\n")
 
     except BrainConnectionError as e:
         logger.error(f"API Connection Error: {e}")
         print("❌ Jules cannot connect to the cloud. Check your internet and API key.")
         sys.exit(1)
+    except RegisBusyError as e:
+        logger.error(f"Request rejected: {e}")
+        print("⏳ Jules is busy with other requests. Try again in a moment.")
+        sys.exit(1)
+    except RegisTimeoutError as e:
+        logger.error(f"Request timed out: {e}")
+        print("⌛ Jules did not answer in time (REGIS_REQUEST_TIMEOUT).")
+        sys.exit(1)
     except JulesError as e:
         logger.error(f"Internal Jules Error: {e}")
         print(f"⚠️ An error occurred in agent logic: {e}")
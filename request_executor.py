@@ -0,0 +1,169 @@
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Any, Callable, Iterator
+
+logger = logging.getLogger(__name__)
+
+_STREAM_END = object()
+
+
+class ExecutorBusyError(RuntimeError):
+    """Kolejka przyjęć jest pełna - żądanie odrzucone (backpressure)."""
+
+
+class RequestTimeoutError(TimeoutError):
+    """Żądanie nie zakończyło się w zadanym czasie."""
+
+
+class RequestExecutor:
+    """
+    Współbieżny wykonawca żądań z ograniczoną kolejką przyjęć.
+
+    Naraz wykonuje się co najwyżej `max_workers` żądań, a kolejne `max_queue` czeka na wolny
+    wątek. Gdy oba limity są wyczerpane, wywołujący czeka do `admission_timeout` sekund
+    (backpressure), a potem dostaje ExecutorBusyError. Każde żądanie ma własny limit czasu
+    (`timeout`) - po jego przekroczeniu wywołujący dostaje RequestTimeoutError, a miejsce
+    w kolejce zwalnia się dopiero, gdy zadanie faktycznie się skończy.
+    """
+    def __init__(self, max_workers=8, max_queue=32, timeout=120.0, admission_timeout=2.0):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.admission_timeout = admission_timeout
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="regis-request")
+        self._slots = threading.BoundedSemaphore(max_workers + max_queue)
+        self._lock = threading.Lock()
+        self.pending = 0
+        self.running = 0
+        self.completed = 0
+        self.rejected = 0
+        self.timed_out = 0
+
+    def _admit(self):
+        if not self._slots.acquire(timeout=self.admission_timeout):
+            with self._lock:
+                self.rejected += 1
+            logger.warning("System zajęty - żądanie odrzucone.")
+            raise ExecutorBusyError(
+                f"Przekroczono limit {self.max_workers + self.max_queue} żądań w toku"
+            )
+        with self._lock:
+            self.pending += 1
+
+    def _release(self, _future=None):
+        with self._lock:
+            self.pending -= 1
+            self.completed += 1
+        self._slots.release()
+
+    def _tracked(self, fn, *args):
+        with self._lock:
+            self.running += 1
+        try:
+            return fn(*args)
+        finally:
+            with self._lock:
+                self.running -= 1
+
+    def submit(self, fn: Callable[..., Any], *args, timeout: float = None) -> Any:
+        """Wykonuje `fn(*args)` w puli i czeka na wynik (najwyżej `timeout` sekund)."""
+        self._admit()
+        try:
+            future = self._pool.submit(self._tracked, fn, *args)
+        except BaseException:
+            self._release()
+            raise
+        future.add_done_callback(self._release)
+
+        timeout = self.timeout if timeout is None else timeout
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            with self._lock:
+                self.timed_out += 1
+            raise RequestTimeoutError(f"Żądanie nie zakończyło się w {timeout}s")
+
+    def stream(
+        self, fn: Callable[..., Iterator[Any]], *args, timeout: float = None
+    ) -> Iterator[Any]:
+        """
+        Jak submit, ale dla generatora: elementy są przekazywane przez kolejkę w miarę
+        produkowania. Porzucenie iteratora przez wywołującego zatrzymuje producenta.
+        """
+        self._admit()
+        items = queue.Queue()
+        stop = threading.Event()
+
+        def produce():
+            try:
+                for item in fn(*args):
+                    if stop.is_set():
+                        return
+                    items.put((True, item))
+                items.put((True, _STREAM_END))
+            except BaseException as e:
+                items.put((False, e))
+
+        try:
+            future = self._pool.submit(self._tracked, produce)
+        except BaseException:
+            self._release()
+            raise
+        future.add_done_callback(self._release)
+
+        timeout = self.timeout if timeout is None else timeout
+        deadline = None if timeout is None else time.monotonic() + timeout
+        try:
+            while True:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                try:
+                    if remaining is not None and remaining <= 0:
+                        raise queue.Empty
+                    ok, item = items.get(timeout=remaining)
+                except queue.Empty:
+                    with self._lock:
+                        self.timed_out += 1
+                    raise RequestTimeoutError(f"Żądanie nie zakończyło się w {timeout}s")
+                if not ok:
+                    raise item
+                if item is _STREAM_END:
+                    return
+                yield item
+        finally:
+            stop.set()
+            future.cancel()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "max_workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "running": self.running,
+                "queued": self.pending - self.running,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "timed_out": self.timed_out,
+            }
+
+    def shutdown(self, wait=True):
+        self._pool.shutdown(wait=wait)
+
+
+def executor_from_env() -> RequestExecutor:
+    """
+    Wykonawca skonfigurowany z REGIS_MAX_WORKERS / REGIS_MAX_QUEUE /
+    REGIS_REQUEST_TIMEOUT / REGIS_ADMISSION_TIMEOUT.
+    """
+    timeout = float(os.getenv("REGIS_REQUEST_TIMEOUT", "120"))
+    return RequestExecutor(
+        max_workers=int(os.getenv("REGIS_MAX_WORKERS", "8")),
+        max_queue=int(os.getenv("REGIS_MAX_QUEUE", "32")),
+        timeout=timeout or None,
+        admission_timeout=float(os.getenv("REGIS_ADMISSION_TIMEOUT", "2")),
+    )
@@ -0,0 +1,177 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".regis_cache")
+DEFAULT_DB_PATH = os.path.join(CACHE_DIR, "responses.sqlite3")
+
+
+class ResponseCache:
+    """
+    Cache odpowiedzi modelu adresowany treścią.
+
+    Dwa poziomy: LRU w pamięci procesu oraz SQLite na dysku (współdzielony między
+    kolejnymi uruchomieniami CLI). Wpisy starsze niż `ttl` sekund są traktowane jak brak.
+    """
+    def __init__(self, path=DEFAULT_DB_PATH, ttl=7 * 24 * 3600, max_memory_entries=256,
+                 max_disk_entries=5000):
+        self.path = path
+        self.ttl = ttl
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_entries = max_disk_entries
+        self._lock = threading.Lock()
+        self._memory = OrderedDict()  # klucz -> (created, value)
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.writes = 0
+
+        self._db = None
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+                "created REAL NOT NULL, accessed REAL NOT NULL)"
+            )
+            self._db.execute(
+                "CREATE INDEX IF NOT EXISTS idx_responses_accessed ON responses(accessed)"
+            )
+            self._db.commit()
+            self._disk_count = self._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    @staticmethod
+    def make_key(model, prompt, temperature, generation_config=None):
+        """Hash SHA-256 z (model, prompt, temperature, konfiguracja generowania)."""
+        payload = json.dumps(
+            [model, prompt, temperature, generation_config],
+            sort_keys=True, ensure_ascii=False, default=str
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _expired(self, created, now):
+        return bool(self.ttl) and now - created > self.ttl
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if not self._expired(entry[0], now):
+                    self._memory.move_to_end(key)
+                    self.memory_hits += 1
+                    return entry[1]
+                del self._memory[key]
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT value, created FROM responses WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None:
+                    value, created = row
+                    if not self._expired(created, now):
+                        self._db.execute(
+                            "UPDATE responses SET accessed = ? WHERE key = ?", (now, key)
+                        )
+                        self._db.commit()
+                        self._remember(key, created, value)
+                        self.disk_hits += 1
+                        return value
+                    self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    self._db.commit()
+                    self._disk_count -= 1
+
+            self.misses += 1
+            return None
+
+    def set(self, key, value):
+        now = time.time()
+        with self._lock:
+            self._remember(key, now, value)
+            self.writes += 1
+            if self._db is None:
+                return
+            try:
+                existed = self._db.execute(
+                    "SELECT 1 FROM responses WHERE key = ?", (key,)
+                ).fetchone()
+                self._db.execute(
+                    "INSERT OR REPLACE INTO responses (key, value, created, accessed) "
+                    "VALUES (?, ?, ?, ?)",
+                    (key, value, now, now),
+                )
+                if not existed:
+                    self._disk_count += 1
+                if self._disk_count > self.max_disk_entries:
+                    overflow = self._disk_count - self.max_disk_entries
+                    self._db.execute(
+                        "DELETE FROM responses WHERE key IN "
+                        "(SELECT key FROM responses ORDER BY accessed ASC LIMIT ?)", (overflow,)
+                    )
+                    self._disk_count -= overflow
+                self._db.commit()
+            except sqlite3.Error as e:
+                logger.warning(f"Nie udało się zapisać odpowiedzi w cache: {e}")
+
+    def _remember(self, key, created, value):
+        self._memory[key] = (created, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM responses")
+                self._db.commit()
+                self._disk_count = 0
+
+    def stats(self):
+        with self._lock:
+            hits = self.memory_hits + self.disk_hits
+            lookups = hits + self.misses
+            return {
+                "memory_entries": len(self._memory),
+                "disk_entries": self._disk_count if self._db is not None else 0,
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "writes": self.writes,
+                "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+_default_cache = None
+_default_lock = threading.Lock()
+
+
+def enable_default_cache(**kwargs):
+    """Włącza cache odpowiedzi dla całego procesu (opt-in, np. z CLI)."""
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = ResponseCache(**kwargs)
+        return _default_cache
+
+
+def disable_default_cache():
+    global _default_cache
+    with _default_lock:
+        _default_cache = None
+
+
+def get_default_cache():
+    """Aktywny cache procesu lub None. Zmienna REGIS_RESPONSE_CACHE=1 włącza go bez CLI."""
+    if _default_cache is None and os.getenv("REGIS_RESPONSE_CACHE") == "1":
+        return enable_default_cache()
+    return _default_cache
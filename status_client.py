@@ -0,0 +1,102 @@
+import json
+import logging
+import os
+import socket
+import threading
+import time
+from typing import Any, Dict
+
+from status_writer import get_writer
+
+logger = logging.getLogger(__name__)
+
+STATUS_FILE = "status_report.json"
+BROKER_HOST = "127.0.0.1"
+BROKER_PORT = int(os.getenv("REGIS_STATUS_PORT", "8766"))
+# Po nieudanym połączeniu z brokerem kolejna próba dopiero po tym czasie
+# (tryb awaryjny w międzyczasie)
+RECONNECT_INTERVAL = 5.0
+
+
+class StatusClient:
+    """
+    Nadawca zmian statusu do brokera w backendzie (backend/status_broker.py).
+
+    Każdy agent pisze tylko swoją sekcję (`jules`, `debate`, ...) i wysyła same zmiany
+    (delta) jako linie JSON po lokalnym TCP - broker scala je i sam zapisuje plik.
+    Gdy broker nie działa, zmiany trafiają do pliku bezpośrednio: koalescowany zapis
+    wyłącznie własnej sekcji pod blokadą pliku, bez nadpisywania sekcji innych procesów.
+    """
+    def __init__(self, host: str = BROKER_HOST, port: int = BROKER_PORT, path: str = STATUS_FILE):
+        self.host = host
+        self.port = port
+        self.path = path
+        self._lock = threading.Lock()
+        self._sock = None
+        self._retry_at = 0.0
+        self._sections: Dict[str, Dict[str, Any]] = {}
+
+    def _send(self, message: Dict[str, Any]) -> bool:
+        line = (json.dumps(message, ensure_ascii=False) + "\n").encode("utf-8")
+        if self._sock is None:
+            if time.monotonic() < self._retry_at:
+                return False
+            try:
+                self._sock = socket.create_connection((self.host, self.port), timeout=0.2)
+            except OSError:
+                self._retry_at = time.monotonic() + RECONNECT_INTERVAL
+                return False
+        try:
+            self._sock.sendall(line)
+            return True
+        except OSError:
+            self._sock.close()
+            self._sock = None
+            self._retry_at = time.monotonic() + RECONNECT_INTERVAL
+            return False
+
+    def publish(
+        self,
+        section: str,
+        delta: Dict[str, Any],
+        replace: bool = False,
+        flush: bool = False,
+        path: str = None,
+    ) -> bool:
+        """
+        Scala `delta` z sekcją `section` (z `replace` - podmienia całą sekcję).
+        Zwraca True, gdy zmianę przyjął broker, False - gdy zapisano ją w trybie awaryjnym
+        (do `path`, domyślnie pliku klienta - np. katalog zadania w demonie Julesa).
+        """
+        with self._lock:
+            state = {} if replace else dict(self._sections.get(section, {}))
+            state.update(delta)
+            self._sections[section] = state
+            if self._send({"section": section, "delta": delta, "replace": replace}):
+                return True
+        get_writer(path or self.path, section=section).update(state, flush=flush)
+        return False
+
+    def close(self):
+        with self._lock:
+            if self._sock is not None:
+                self._sock.close()
+                self._sock = None
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_status_client() -> StatusClient:
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = StatusClient()
+        return _client
+
+
+def publish_status(section: str, delta: Dict[str, Any], replace: bool = False, flush: bool = False,
+                   path: str = None) -> bool:
+    """Skrót: zmiana sekcji statusu przez wspólnego klienta procesu."""
+    return get_status_client().publish(section, delta, replace=replace, flush=flush, path=path)
@@ -0,0 +1,176 @@
+import atexit
+import hashlib
+import json
+import logging
+import os
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WINDOW = float(os.getenv("JULES_STATUS_WINDOW", "0.25"))
+TIMELINE_TAIL = int(os.getenv("JULES_STATUS_TIMELINE_TAIL", "50"))
+
+
+def write_atomic(path: str, data: bytes, fsync: bool = False):
+    """Zapis przez plik tymczasowy + os.replace - czytelnik nigdy nie zobaczy połowy pliku."""
+    directory = os.path.dirname(os.path.abspath(path))
+    tmp_path = os.path.join(
+        directory, f".{os.path.basename(path)}.{os.getpid()}.{threading.get_ident()}.tmp"
+    )
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+        if fsync:
+            f.flush()
+            os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+@contextmanager
+def file_lock(lock_path: str):
+    """Blokada między procesami na pliku `lock_path` (flock, na Windows msvcrt.locking)."""
+    with open(lock_path, "a+b") as lock_file:
+        if fcntl:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        else:
+            lock_file.seek(0)
+            msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+            else:
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def merge_section(path: str, section: str, data: Dict[str, Any]):
+    """Podmienia jedną sekcję pliku statusu, zostawiając pozostałe (zapis pod blokadą)."""
+    with file_lock(f"{path}.lock"):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                document = json.load(f)
+        except (OSError, ValueError):
+            document = {}
+        if not isinstance(document, dict):
+            document = {}
+        document[section] = data
+        write_atomic(
+            path, json.dumps(document, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        )
+
+
+class StatusWriter:
+    """
+    Zapis statusu w tle z koalescencją.
+
+    `update()` tylko podmienia ostatni stan w pamięci; wątek w tle zapisuje go najwyżej raz
+    na `window` sekund, atomowo (plik tymczasowy + os.replace) i w zwartym JSON-ie. Zapis jest
+    pomijany, gdy treść nie zmieniła się od poprzedniego. Z `section` writer zapisuje tylko
+    swoją sekcję pliku (merge_section) i nie nadpisuje sekcji innych procesów.
+    """
+    def __init__(self, path: str, window: float = DEFAULT_WINDOW, section: str = None):
+        self.path = path
+        self.window = window
+        self.section = section
+        self._cond = threading.Condition()
+        # Kolejność zapisów: starszy stan nigdy nie nadpisze nowszego
+        self._write_lock = threading.Lock()
+        self._pending: Optional[Dict[str, Any]] = None
+        self._last_digest = None
+        self._thread = None
+        self._closed = False
+        self.updates = 0
+        self.writes = 0
+        self.skipped = 0
+
+    def update(self, status: Dict[str, Any], flush: bool = False):
+        with self._cond:
+            self._pending = status
+            self.updates += 1
+            if self._thread is None and not flush:
+                self._thread = threading.Thread(target=self._run, name="status-writer", daemon=True)
+                self._thread.start()
+            self._cond.notify()
+        if flush:
+            self.flush()
+
+    def flush(self):
+        """Zapisuje oczekujący stan od razu (np. status końcowy)."""
+        with self._write_lock:
+            with self._cond:
+                status, self._pending = self._pending, None
+            if status is not None:
+                self._write(status)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._pending is None and not self._closed:
+                    self._cond.wait()
+                if self._closed:
+                    return
+            # Okno koalescencji: kolejne update() w tym czasie tylko nadpisują _pending
+            with self._cond:
+                self._cond.wait_for(lambda: self._closed, timeout=self.window)
+            self.flush()
+
+    def _write(self, status: Dict[str, Any]):
+        data = json.dumps(status, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        digest = hashlib.sha1(data).digest()
+        with self._cond:
+            if digest == self._last_digest:
+                self.skipped += 1
+                return
+            self._last_digest = digest
+        try:
+            if self.section:
+                merge_section(self.path, self.section, status)
+            else:
+                write_atomic(self.path, data)
+            with self._cond:
+                self.writes += 1
+        except Exception as e:
+            with self._cond:
+                self._last_digest = None
+            logger.error(f"Failed to update status file: {e}")
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self.flush()
+
+    def stats(self) -> Dict[str, int]:
+        with self._cond:
+            return {"updates": self.updates, "writes": self.writes, "skipped": self.skipped}
+
+
+_writers: Dict[Any, StatusWriter] = {}
+_writers_lock = threading.Lock()
+
+
+def get_writer(path: str, section: str = None) -> StatusWriter:
+    """Jeden StatusWriter na plik (i sekcję) w procesie; zaległe stany zapisywane przy wyjściu."""
+    key = (os.path.abspath(path), section)
+    with _writers_lock:
+        writer = _writers.get(key)
+        if writer is None:
+            writer = _writers[key] = StatusWriter(key[0], section=section)
+        return writer
+
+
+@atexit.register
+def _flush_all():
+    with _writers_lock:
+        writers = list(_writers.values())
+    for writer in writers:
+        writer.close()
@@ -0,0 +1,51 @@
+import os
+import tempfile
+import unittest
+
+from audit_index import AuditIndex, content_hash
+
+RESULT = {"skeleton": "s", "debate": "d", "solutions": "r"}
+
+
+class TestAuditIndex(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.index = AuditIndex(os.path.join(self.tmp.name, "index.sqlite3"))
+        self.source = os.path.join(self.tmp.name, "app.py")
+        with open(self.source, "w") as f:
+            f.write("x = 1\n")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_hit_requires_same_hash_and_version(self):
+        digest = content_hash("x = 1\n")
+        self.index.put(self.source, digest, "v1", RESULT)
+
+        self.assertEqual(self.index.get(self.source, digest, "v1"), RESULT)
+        self.assertIsNone(self.index.get(self.source, content_hash("x = 2\n"), "v1"))
+        self.assertIsNone(self.index.get(self.source, digest, "v2"))
+
+    def test_compact_keeps_latest_per_existing_file(self):
+        self.index.put(self.source, "old", "v1", RESULT)
+        self.index.put(self.source, "new", "v1", RESULT)
+        self.index.put(os.path.join(self.tmp.name, "deleted.py"), "h", "v1", RESULT)
+
+        stats = self.index.compact()
+        self.assertEqual(stats, {"missing_files": 1, "superseded": 1, "remaining": 1})
+        self.assertIsNotNone(self.index.get(self.source, "new", "v1"))
+
+    def test_compact_keeps_latest_per_version(self):
+        self.index.put(self.source, "old", "v1", RESULT)
+        self.index.put(self.source, "new", "v1", RESULT)
+        self.index.put(self.source, "old", "v2", RESULT)
+
+        stats = self.index.compact()
+        self.assertEqual((stats["superseded"], stats["remaining"]), (1, 2))
+        self.assertIsNotNone(self.index.get(self.source, "new", "v1"))
+        # Inna wersja promptów zostaje
+        self.assertIsNotNone(self.index.get(self.source, "old", "v2"))
+
+
+if __name__ == '__main__':
+    unittest.main()
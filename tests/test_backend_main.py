@@ -0,0 +1,185 @@
+import asyncio
+import json
+import os
+import sys
+import threading
+import unittest
+from unittest.mock import MagicMock, patch
+
+from starlette.testclient import TestClient
+from tenacity import wait_none
+
+sys.path.append(
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend")
+)
+
+import main as backend  # noqa: E402
+from status_state import StatusState  # noqa: E402
+
+import gemini_client  # noqa: E402
+from gemini_client import GeminiGuard  # noqa: E402
+
+
+class FakeStreamModel:
+    """Model strumieniujący podane fragmenty; wyjątek na liście przerywa strumień."""
+    def __init__(self, script):
+        self.script = script
+
+    async def generate_content_async(self, prompt, generation_config=None, stream=False):
+        async def replay():
+            for item in self.script:
+                await asyncio.sleep(0)
+                if isinstance(item, Exception):
+                    raise item
+                yield MagicMock(text=item)
+
+        return replay()
+
+
+def fake_guard(*script):
+    with patch.dict("os.environ", {}, clear=True):
+        guard = GeminiGuard(model_name="m")
+    guard.model = FakeStreamModel(list(script))
+    return guard
+
+
+def _events(body):
+    """Zdarzenia SSE jako lista (nazwa zdarzenia, dane)."""
+    events = []
+    for block in body.strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((fields.get("event"), json.loads(fields["data"])))
+    return events
+
+
+async def _read_sse(app, path, headers=(), count=1):
+    """
+    Czyta `count` zdarzeń z nieskończonego strumienia SSE, po czym rozłącza klienta.
+
+    TestClient buforuje całą odpowiedź, więc kanał push jest wołany bezpośrednio przez ASGI.
+    """
+    chunks = []
+    done = asyncio.Event()
+
+    async def receive():
+        await done.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        if message["type"] == "http.response.body":
+            chunks.append(message.get("body", b""))
+            if b"".join(chunks).count(b"\n\n") >= count:
+                done.set()
+
+    scope = {
+        "type": "http",
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "root_path": "",
+        "query_string": b"",
+        "headers": [(k.lower().encode(), v.encode()) for k, v in headers],
+        "server": ("testserver", 80),
+        "client": ("testclient", 50000),
+    }
+    await asyncio.wait_for(app(scope, receive, send), 5)
+    return b"".join(chunks).decode("utf-8")
+
+
+class TestChatEndpoints(unittest.TestCase):
+    def setUp(self):
+        patchers = [
+            patch.object(gemini_client, "get_default_cache", return_value=None),
+            patch.object(GeminiGuard._open_stream_async.retry, "wait", wait_none()),
+        ]
+        for p in patchers:
+            p.start()
+            self.addCleanup(p.stop)
+        self.client = TestClient(backend.app)
+
+    def test_chat_stream_sends_deltas_then_done(self):
+        guard = fake_guard("Ala ", "ma ", "kota")
+        with patch.object(backend, "get_guard", return_value=guard):
+            response = self.client.post("/api/chat/stream", json={"message": "hej"})
+        self.assertEqual(response.headers["content-type"].split(";")[0], "text/event-stream")
+        self.assertEqual(
+            _events(response.text),
+            [(None, {"delta": "Ala "}), (None, {"delta": "ma "}), (None, {"delta": "kota"}),
+             ("done", {})],
+        )
+
+    def test_chat_stream_reports_interrupted_stream(self):
+        guard = fake_guard("Ala ", RuntimeError("zerwane"))
+        with patch.object(backend, "get_guard", return_value=guard):
+            response = self.client.get("/api/chat/stream", params={"message": "hej"})
+        events = _events(response.text)
+        self.assertEqual(events[0], (None, {"delta": "Ala "}))
+        self.assertEqual(events[-1][0], "error")
+        self.assertIn("zerwane", events[-1][1]["error"])
+
+    def test_chat_returns_whole_answer(self):
+        guard = fake_guard()
+        guard.generate_content_async = lambda *args, **kwargs: asyncio.sleep(0, "odpowiedź")
+        with patch.object(backend, "get_guard", return_value=guard):
+            response = self.client.post("/api/chat", json={"message": "hej"})
+        self.assertEqual(response.json(), {"response": "odpowiedź"})
+
+
+class TestStatusStream(unittest.TestCase):
+    def setUp(self):
+        self.state = StatusState()
+        patcher = patch.object(backend, "status_state", self.state)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_first_event_is_current_status(self):
+        self.state.update_section("jules", {"phase": "audyt"})
+        body = asyncio.run(_read_sse(backend.app, "/api/status/stream"))
+        self.assertTrue(body.startswith(f"id: {self.state.version}\n"))
+        self.assertEqual(_events(body), [(None, {"jules": {"phase": "audyt"}})])
+
+    def test_resumes_after_last_event_id_and_pushes_changes(self):
+        version = self.state.update_section("jules", {"phase": "audyt"})
+        timer = threading.Timer(0.05, self.state.update_section, ("jules", {"phase": "raport"}))
+        timer.start()
+        self.addCleanup(timer.cancel)
+        body = asyncio.run(
+            _read_sse(backend.app, "/api/status/stream", [("Last-Event-ID", str(version))])
+        )
+        self.assertTrue(body.startswith(f"id: {version + 1}\n"))
+        self.assertEqual(_events(body), [(None, {"jules": {"phase": "raport"}})])
+
+
+class TestServe(unittest.TestCase):
+    def test_concurrency_knobs_reach_uvicorn(self):
+        import uvicorn
+
+        servers = []
+
+        def fake_server(config):
+            servers.append(config)
+            return MagicMock()
+
+        with patch.object(uvicorn, "Server", fake_server), \
+                patch.object(backend, "start_background_services"), \
+                patch.object(backend, "stop_background_services"), \
+                patch.object(backend, "chat_loop"), \
+                patch.object(backend, "set_max_concurrency") as set_limit, \
+                patch.object(backend.signal, "signal"):
+            backend.serve("127.0.0.1", 5001, 300, production=True, backlog=512, keep_alive=15,
+                          shutdown_timeout=30, gemini_concurrency=16)
+
+        config = servers[0]
+        self.assertEqual(config.limit_concurrency, 300)
+        self.assertEqual(config.backlog, 512)
+        self.assertEqual(config.timeout_keep_alive, 15)
+        self.assertEqual(config.timeout_graceful_shutdown, 30)
+        self.assertFalse(config.access_log)
+        self.assertFalse(config.server_header)
+        set_limit.assert_called_once_with(16)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,54 @@
+import asyncio
+import threading
+import time
+import unittest
+
+from background_loop import BackgroundLoop
+
+
+class TestBackgroundLoop(unittest.TestCase):
+    def test_calls_from_many_threads_share_one_loop(self):
+        loop = BackgroundLoop().start()
+        seen = set()
+
+        async def call():
+            seen.add(id(asyncio.get_running_loop()))
+            await asyncio.sleep(0.2)
+            return "ok"
+
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(loop.run(call(), timeout=5)))
+            for _ in range(50)
+        ]
+        start = time.monotonic()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertLess(time.monotonic() - start, 1.0)  # współbieżnie, nie 50 x 0.2s
+        self.assertEqual(results, ["ok"] * 50)
+        self.assertEqual(len(seen), 1)
+        loop.stop()
+        self.assertFalse(loop.running)
+
+    def test_stop_cancels_pending_calls(self):
+        loop = BackgroundLoop().start()
+        errors = []
+
+        def wait_forever():
+            try:
+                loop.run(asyncio.sleep(60))
+            except BaseException as e:
+                errors.append(e)
+
+        caller = threading.Thread(target=wait_forever)
+        caller.start()
+        time.sleep(0.05)
+        loop.stop()
+        caller.join(2)
+        self.assertEqual(len(errors), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
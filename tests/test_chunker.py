@@ -0,0 +1,68 @@
+import asyncio
+import unittest
+
+from chunker import map_reduce, split_source
+
+
+def _python_module(functions, body_lines=20):
+    parts = []
+    for i in range(functions):
+        body = "".join(f"    x{j} = {j}\n" for j in range(body_lines))
+        parts.append(f"def func_{i}():\n{body}    return {i}\n\n")
+    return "".join(parts)
+
+
+class TestChunker(unittest.TestCase):
+    def test_python_chunks_follow_top_level_nodes(self):
+        source = _python_module(6)
+        chunks = split_source(source, "mod.py", max_chars=800)
+
+        self.assertGreater(len(chunks), 1)
+        for chunk in chunks:
+            self.assertTrue(chunk.text.startswith("def func_"))
+        self.assertEqual("".join(c.text for c in chunks), source)
+
+    def test_line_ranges_cover_source_without_overlap(self):
+        source = _python_module(4)
+        chunks = split_source(source, "mod.py", max_chars=600)
+        lines = source.splitlines(keepends=True)
+
+        self.assertEqual(chunks[0].start_line, 1)
+        self.assertEqual(chunks[-1].end_line, len(lines))
+        for previous, chunk in zip(chunks, chunks[1:]):
+            self.assertEqual(chunk.start_line, previous.end_line + 1)
+            self.assertEqual(chunk.text, "".join(lines[chunk.start_line - 1:chunk.end_line]))
+
+    def test_edit_invalidates_only_its_own_chunk(self):
+        source = _python_module(400)
+        edited = source.replace("    x3 = 3\n", "    x3 = 4\n", 1)  # func_0
+        # Zmiana długości
+        edited = edited.replace("def func_7():\n", "def func_7():\n    pass\n", 1)
+        before = [c.text for c in split_source(source, "mod.py")]
+        after = [c.text for c in split_source(edited, "mod.py")]
+
+        self.assertGreater(len(before), 10)
+        changed = set(after) - set(before)
+        self.assertLessEqual(len(changed), 2)  # tylko fragmenty z func_0 i func_7
+        self.assertTrue(all("func_0" in text or "func_7" in text for text in changed))
+        self.assertEqual(len(set(before) - set(after)), len(changed))
+
+    def test_oversized_block_is_split_by_lines(self):
+        source = "".join(f"line {i}\n" for i in range(500))
+        chunks = split_source(source, "notes.txt", max_chars=1000)
+        self.assertTrue(all(len(c.text) <= 1000 for c in chunks))
+        self.assertEqual("".join(c.text for c in chunks), source)
+
+    def test_map_reduce_merges_in_order(self):
+        source = _python_module(5)
+
+        async def summarize(chunk):
+            await asyncio.sleep(0.01 * (5 - chunk.index))
+            return f"fragment {chunk.index}"
+
+        merged = asyncio.run(map_reduce(source, "mod.py", summarize, max_chars=700, max_workers=2))
+        self.assertLess(merged.index("fragment 0"), merged.index("fragment 1"))
+
+
+if __name__ == '__main__':
+    unittest.main()
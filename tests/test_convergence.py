@@ -0,0 +1,69 @@
+import asyncio
+import unittest
+
+from convergence import ConvergenceDetector, similarity
+
+
+def _round(*texts):
+    return [{"role": f"Agent {i}", "content": t} for i, t in enumerate(texts)]
+
+
+class FakeJudge:
+    def __init__(self, verdict):
+        self.verdict = verdict
+        self.prompts = []
+
+    async def generate_content_async(self, prompt, temperature=0.7, priority=None):
+        self.prompts.append(prompt)
+        return self.verdict
+
+
+class TestSimilarity(unittest.TestCase):
+    def test_jaccard_of_word_shingles(self):
+        self.assertEqual(similarity("Taby są lepsze od spacji", "taby są lepsze od spacji"), 1.0)
+        self.assertEqual(similarity("Taby są lepsze", "Spacje wygrywają zawsze"), 0.0)
+        self.assertEqual(similarity("", "cokolwiek"), 0.0)
+
+
+class TestConvergenceDetector(unittest.TestCase):
+    def test_repetition_stops_after_min_rounds(self):
+        detector = ConvergenceDetector(min_rounds=2)
+        first = _round("Taby oszczędzają miejsce w plikach", "Spacje wyglądają wszędzie tak samo")
+        reason, _ = asyncio.run(detector.check("t", [first]))
+        self.assertIsNone(reason)
+        reason, scores = asyncio.run(detector.check("t", [first, first]))
+        self.assertEqual(reason, "repetition")
+        self.assertEqual(scores["repetition"], 1.0)
+
+    def test_agreement_between_agents(self):
+        same = "Ostatecznie obie strony zgadzają się że formatter rozwiązuje spór"
+        rounds = [_round("a b c d", "e f g h"), _round(same, same + " całkowicie")]
+        reason, _ = asyncio.run(ConvergenceDetector().check("t", rounds))
+        self.assertEqual(reason, "converged")
+
+    def test_judge_only_asked_in_the_grey_zone(self):
+        judge = FakeJudge("TAK, nic nowego.")
+        detector = ConvergenceDetector(judge=judge, judge_threshold=0.2, threshold=0.9)
+        diverging = [
+            _round("jeden dwa trzy cztery", "pięć sześć siedem osiem"),
+            _round(
+                "dziewięć dziesięć jedenaście dwanaście",
+                "trzynaście czternaście piętnaście szesnaście",
+            ),
+        ]
+        self.assertIsNone(asyncio.run(detector.check("t", diverging))[0])
+        self.assertEqual(judge.prompts, [])
+
+        grey = [
+            _round("taby są lepsze bo oszczędzają bajty", "spacje są lepsze bo wyglądają równo"),
+            _round(
+                "taby są lepsze bo oszczędzają bajty i czas",
+                "spacje wyglądają równo w każdym edytorze",
+            ),
+        ]
+        self.assertEqual(asyncio.run(detector.check("t", grey))[0], "judge")
+        self.assertEqual(detector.judge_calls, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,139 @@
+import asyncio
+import os
+import tempfile
+import unittest
+from unittest.mock import MagicMock, patch
+
+import gemini_client
+import regis
+from conversation_store import ConversationStore
+from gemini_client import GeminiGuard
+from memory_index import MemoryIndex
+from memory_manager import MemoryManager
+
+
+class TestConversationStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.store = ConversationStore(os.path.join(self.tmp.name, "conversations.sqlite3"))
+
+    def tearDown(self):
+        self.store.close()
+        self.tmp.cleanup()
+
+    def test_window_is_newest_messages_within_budget(self):
+        for i in range(10):
+            self.store.append("s1", "user", f"msg {i}", 10)
+        self.store.append("s2", "user", "inna sesja", 10)
+        window = self.store.load_window("s1", max_tokens=35, max_messages=50)
+        self.assertEqual([m["content"] for m in window], ["msg 7", "msg 8", "msg 9"])
+        self.assertEqual(len(self.store.load_window("s1", max_tokens=1000, max_messages=4)), 4)
+
+    def test_sessions_and_prune(self):
+        self.store.append("a", "user", "x", 1)
+        self.store.append("b", "user", "y", 1)
+        self.assertEqual({s["session"] for s in self.store.sessions()}, {"a", "b"})
+        self.assertEqual(self.store.prune(-1), 2)
+        self.assertEqual(self.store.sessions(), [])
+
+    def test_memory_manager_survives_process_restart(self):
+        first = MemoryManager(store=self.store, session="cli")
+        first.add_message("user", "Mode: analyze.")
+        first.add_message("model", "Wynik analizy")
+
+        # Nowy proces = nowa instancja; historia wczytuje się leniwie z bazy
+        second = MemoryManager(store=self.store, session="cli")
+        self.assertEqual(second.get_context_string(), "USER: Mode: analyze.\nMODEL: Wynik analizy")
+        second.add_message("user", "dalej")
+        self.assertEqual(len(self.store.load_window("cli", 1000, 50)), 3)
+
+
+class TestRegisSessions(unittest.TestCase):
+    def test_session_history_stores_file_digest_not_content(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        target = os.path.join(tmp.name, "big.py")
+        with open(target, "w", encoding="utf-8") as f:
+            f.write("def secret_body():\n    return 42\n")
+        store = ConversationStore(os.path.join(tmp.name, "conversations.sqlite3"))
+        self.addCleanup(store.close)
+        index = MemoryIndex(os.path.join(tmp.name, "index"))
+        self.addCleanup(index.close)
+
+        prompts = []
+        with (
+            patch.object(regis, "_store", store),
+            patch.object(regis, "_index", index),
+            patch.dict(regis._sessions, clear=True),
+            patch.object(
+                regis, "generate_content_safe", side_effect=lambda p: prompts.append(p) or "OK"
+            ),
+        ):
+            payload = {
+                "mode": "analyze",
+                "target_file": target,
+                "user_context": None,
+                "session": "t",
+            }
+            regis._safe_execute(payload)
+            regis._sessions.clear()  # symulacja kolejnego wywołania CLI
+            regis._safe_execute(
+                {"mode": "chat", "target_file": None, "user_context": "i co dalej?", "session": "t"}
+            )
+
+        stored = store.load_window("t", 10000, 50)
+        self.assertNotIn("secret_body", stored[0]["content"])
+        self.assertIn("sha256", stored[0]["content"])
+        self.assertIn("Previous turns of this session", prompts[1])
+        self.assertNotIn("secret_body", prompts[1])
+
+
+class LoopBoundModel:
+    """Jak klient grpc.aio SDK: działa tylko na pętli, na której został pierwszy raz użyty."""
+    def __init__(self):
+        self.loop = None
+
+    async def generate_content_async(self, prompt, generation_config=None):
+        loop = asyncio.get_running_loop()
+        self.loop = self.loop or loop
+        if loop is not self.loop:
+            raise RuntimeError("Event loop is closed")
+        return MagicMock(text="streszczenie fragmentu", usage_metadata=None)
+
+
+class TestRegisLargeFiles(unittest.TestCase):
+    def test_consecutive_requests_digest_large_files(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        target = os.path.join(tmp.name, "big.py")
+        with open(target, "w", encoding="utf-8") as f:
+            f.write("".join(f"def f{i}():\n    return {i}\n\n" for i in range(200)))
+        index = MemoryIndex(os.path.join(tmp.name, "index"))
+        self.addCleanup(index.close)
+        with patch.dict("os.environ", {}, clear=True):
+            guard = GeminiGuard(model_name="m")
+        guard.model = LoopBoundModel()
+
+        prompts = []
+        with (
+            patch.object(regis, "INLINE_FILE_LIMIT", 500),
+            patch.object(regis, "_index", index),
+            patch.object(regis, "get_guard", return_value=guard),
+            patch.object(gemini_client, "get_default_cache", return_value=None),
+            patch.object(
+                regis, "generate_content_safe", side_effect=lambda p: prompts.append(p) or "OK"
+            ),
+        ):
+            payload = {"mode": "analyze", "target_file": target, "user_context": None}
+            # Każde żądanie na wątku wykonawcy - digest nie może zależeć od pętli poprzedniego
+            for _ in range(2):
+                self.assertEqual(regis.process_request(payload), "OK")
+
+        self.assertEqual(len(prompts), 2)
+        for prompt in prompts:
+            self.assertIn("streszczenie fragmentów", prompt)
+            self.assertIn("streszczenie fragmentu", prompt)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,184 @@
+import asyncio
+import json
+import os
+import tempfile
+import time
+import unittest
+from unittest.mock import MagicMock, patch
+
+import debate
+from convergence import ConvergenceDetector
+from debate import SimpleDebate, TranscriptRenderer, plan_turns
+from io_guard import IOGuard
+
+
+class FakeClient:
+    """Odpowiada po `delay` s i zapisuje momenty startu wywołań."""
+    def __init__(self, delay=0.05, filler=0):
+        self.delay = delay
+        self.filler = filler
+        self.calls = []
+
+    async def generate_content_async(self, prompt, temperature=0.7, use_cache=True, priority=None,
+                                     caller=None):
+        self.calls.append((time.monotonic(), prompt))
+        await asyncio.sleep(self.delay)
+        return f"odpowiedź {len(self.calls)}" + " argument" * self.filler
+
+    def start_chat(self, max_history_tokens=None):
+        return FakeChat(self)
+
+
+class FakeChat:
+    def __init__(self, client):
+        self.client = client
+
+    async def send_message_async(self, text, temperature=0.7, priority=None, caller=None):
+        return await self.client.generate_content_async(text)
+
+
+class TestPlanTurns(unittest.TestCase):
+    def test_sequential_is_a_reply_chain(self):
+        self.assertEqual(plan_turns("sequential", 2, 2), [[], [0], [1], [2]])
+
+    def test_simultaneous_openings_then_replies(self):
+        self.assertEqual(plan_turns("simultaneous", 3, 2), [[], [], [], [0, 1, 2], [3], [4]])
+
+    def test_panel_rounds_wait_for_previous_round(self):
+        self.assertEqual(plan_turns("panel", 2, 3), [[], [], [0, 1], [0, 1], [2, 3], [2, 3]])
+
+    def test_unknown_topology_is_rejected(self):
+        with self.assertRaises(ValueError):
+            plan_turns("ring", 2, 1)
+
+
+class TestTranscriptRenderer(unittest.TestCase):
+    def test_renders_compact_lines_and_reuses_prefix(self):
+        renderer = TranscriptRenderer()
+        history = [
+            {"role": "Agent A", "content": "Taby są\n lepsze."},
+            {"role": "Agent B", "content": "Nie."},
+        ]
+        self.assertEqual(renderer.render(history), "Agent A: Taby są lepsze.\nAgent B: Nie.")
+        history.append({"role": "Agent A", "content": "Tak."})
+        self.assertEqual(renderer.render(history).splitlines()[-1], "Agent A: Tak.")
+        self.assertEqual(renderer.rendered, 3)  # prefiks nie był renderowany ponownie
+        self.assertEqual(renderer.render(history[1:]), "Agent B: Nie.\nAgent A: Tak.")
+
+
+class TestSimpleDebate(unittest.TestCase):
+    def setUp(self):
+        patchers = [
+            patch.object(debate, "publish_status"),
+            patch.object(debate, "get_event_log", return_value=MagicMock()),
+            patch("builtins.print"),
+        ]
+        for p in patchers:
+            p.start()
+            self.addCleanup(p.stop)
+
+    def test_default_client_comes_from_the_pool(self):
+        pooled = MagicMock()
+        with patch.object(debate, "get_guard", return_value=pooled) as get_guard:
+            engine = SimpleDebate()
+        self.assertIs(engine.client, pooled)
+        get_guard.assert_called_once_with(engine.api_key)
+
+    def test_sequential_debate_keeps_turn_order(self):
+        client = FakeClient()
+        history = asyncio.run(SimpleDebate(client=client).run("Taby czy spacje", rounds=2))
+        self.assertEqual([m["role"] for m in history], ["Agent A", "Agent B", "Agent A", "Agent B"])
+        self.assertIn("odpowiedź 1", client.calls[1][1])  # B odpowiada na A
+
+    def test_prompt_size_stays_flat_across_rounds(self):
+        for chat in (False, True):
+            client = FakeClient(delay=0, filler=20)
+            asyncio.run(
+                SimpleDebate(client=client, chat=chat, context_tokens=300).run("Taby", rounds=30)
+            )
+            turns = [prompt for _, prompt in client.calls if not prompt.startswith("Streść")]
+            sizes = [len(prompt) for prompt in turns]
+            self.assertEqual(len(turns), 60)
+            self.assertNotIn("{'role'", turns[-1])
+            # Budżet kontekstu + instrukcje
+            self.assertLess(max(sizes), 300 * 4 + 600, f"chat={chat}")
+            if chat:
+                # Tylko nowa wypowiedź - stały rozmiar
+                self.assertLess(max(sizes[4:]) - min(sizes[4:]), 5)
+
+    def test_converged_debate_stops_early(self):
+        client = FakeClient(delay=0)
+        client.generate_content_async = lambda prompt, **kw: asyncio.sleep(
+            0, "Zostaję przy swoim zdaniu w tej sprawie."
+        )
+        engine = SimpleDebate(client=client, detector=ConvergenceDetector(min_rounds=1))
+        history = asyncio.run(engine.run("Taby", rounds=5))
+        self.assertEqual(len(history), 2)  # agenci od razu powtarzają to samo - 1 runda
+        final = debate.publish_status.call_args.args[1]
+        self.assertEqual((final["stop_reason"], final["rounds_played"]), ("converged", 1))
+
+    def test_diverging_debate_is_extended_up_to_budget(self):
+        client = FakeClient(delay=0)
+        engine = SimpleDebate(client=client, detector=ConvergenceDetector())
+        history = asyncio.run(engine.run("Taby", rounds=2, max_rounds=4))
+        self.assertEqual(len(history), 8)
+        self.assertEqual(debate.publish_status.call_args.args[1]["stop_reason"], "max_rounds")
+
+    def test_transcript_is_written_once_per_round(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        path = os.path.join(tmp.name, "debates.json")
+        transcript = IOGuard(path, flush_interval=0, load=False)
+        engine = SimpleDebate(
+            agents=3, topology="panel", client=FakeClient(delay=0), transcript=transcript
+        )
+        asyncio.run(engine.run("Taby", rounds=4))
+        with open(path, encoding="utf-8") as f:
+            saved = json.load(f)["Taby"]
+        self.assertEqual(
+            (saved["status"], saved["stop_reason"], len(saved["history"])),
+            ("finished", "rounds", 12),
+        )
+        self.assertEqual(transcript.patches, 1 + 12 + 1)
+        self.assertEqual(transcript.writes, 4 + 1)  # jeden zapis na rundę + stan końcowy
+
+    def test_panel_agents_speak_concurrently(self):
+        client = FakeClient(delay=0.1)
+        engine = SimpleDebate(agents=4, topology="panel", client=client)
+        started = time.monotonic()
+        history = asyncio.run(engine.run("Monolit czy mikroserwisy", rounds=2))
+        self.assertEqual(len(history), 8)
+        self.assertLess(time.monotonic() - started, 0.35)  # 2 rundy po ~0.1 s, nie 8 x 0.1 s
+
+    def test_many_topics_run_concurrently(self):
+        client = FakeClient(delay=0.05)
+        engine = SimpleDebate(client=client)
+        topics = [f"temat {i}" for i in range(6)]
+        started = time.monotonic()
+        results = asyncio.run(engine.run_many(topics, rounds=2, workers=6))
+        self.assertLess(time.monotonic() - started, 0.5)  # 4 tury po 0.05 s, tematy równolegle
+        self.assertEqual(list(results), topics)
+        self.assertTrue(all(len(h) == 4 for h in results.values()))
+        final = debate.publish_status.call_args
+        self.assertEqual(final.args[1]["status"], "finished")
+        self.assertNotIn("final_history", final.args[1]["topics"]["temat 0"])
+
+    def test_failed_topic_does_not_stop_the_batch(self):
+        client = FakeClient(delay=0.01)
+        original = client.generate_content_async
+
+        async def flaky(prompt, **kwargs):
+            if "zły temat" in prompt:
+                raise RuntimeError("API down")
+            return await original(prompt, **kwargs)
+
+        client.generate_content_async = flaky
+        results = asyncio.run(
+            SimpleDebate(client=client).run_many(["zły temat", "dobry temat"], rounds=1)
+        )
+        self.assertEqual(results["zły temat"], [])
+        self.assertEqual(len(results["dobry temat"]), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
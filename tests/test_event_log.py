@@ -0,0 +1,47 @@
+import os
+import tempfile
+import unittest
+
+from event_log import EventLog, fold
+
+
+class TestEventLog(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "agent_events.jsonl")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_read_since_returns_only_newer_events(self):
+        log = EventLog(self.path)
+        for i in range(5):
+            log.append("jules", "log", text=f"krok {i}")
+        events = log.read_since(3)
+        self.assertEqual([e["seq"] for e in events], [4, 5])
+        self.assertEqual(events[0]["text"], "krok 3")
+
+    def test_seq_continues_across_instances_and_rotation(self):
+        """Rotacja nie zeruje numeracji, a liczba segmentów jest ograniczona."""
+        EventLog(self.path, max_bytes=200, segments=2).append("jules", "log", text="start")
+        log = EventLog(self.path, max_bytes=200, segments=2)
+        for i in range(30):
+            log.append("debate", "log", text=f"wiadomość {i}")
+        self.assertEqual(log.read_since(30)[-1]["seq"], 31)
+        self.assertFalse(os.path.exists(self.path + ".2"))
+        self.assertEqual(log.read_since(0)[-1]["seq"], 31)
+
+    def test_fold_builds_snapshot_per_source(self):
+        log = EventLog(self.path)
+        log.append("jules", "progress", phase="Skeleton", percent=10)
+        log.append("jules", "log", text="✅ Skeleton")
+        log.append("debate", "log", text="🔵 Agent A: ...", speaker="Agent A")
+        snapshot = fold(log.read_since(0))
+        self.assertEqual(snapshot["seq"], 3)
+        self.assertEqual(snapshot["sources"]["jules"]["phase"], "Skeleton")
+        self.assertEqual(snapshot["sources"]["jules"]["timeline"], ["✅ Skeleton"])
+        self.assertEqual(snapshot["sources"]["debate"]["speaker"], "Agent A")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,240 @@
+import asyncio
+import os
+import tempfile
+import unittest
+from unittest.mock import MagicMock, patch
+
+from google.api_core.exceptions import ServiceUnavailable
+from tenacity import wait_none
+
+import gemini_client
+from gemini_client import GeminiChat, GeminiGuard, GeminiPool, StreamInterruptedError
+from response_cache import ResponseCache
+
+
+class TestGeminiPool(unittest.TestCase):
+    def test_reuses_guard_for_same_key(self):
+        """Ten sam (klucz, model, konfiguracja) zwraca tę samą instancję."""
+        pool = GeminiPool(max_size=4)
+        with patch.dict("os.environ", {}, clear=True):
+            first = pool.get(model_name="m", generation_config={"temperature": 0.1})
+            second = pool.get(model_name="m", generation_config={"temperature": 0.1})
+            other = pool.get(model_name="m", generation_config={"temperature": 0.9})
+
+        self.assertIs(first, second)
+        self.assertIsNot(first, other)
+        stats = pool.stats()
+        self.assertEqual((stats["hits"], stats["misses"]), (1, 2))
+
+    def test_bounded_size_and_idle_eviction(self):
+        pool = GeminiPool(max_size=2, idle_ttl=10)
+        with (
+            patch.dict("os.environ", {}, clear=True),
+            patch("gemini_client.time.monotonic") as clock,
+        ):
+            clock.return_value = 0
+            for name in ("a", "b", "c"):
+                pool.get(model_name=name)
+            self.assertEqual(pool.stats()["size"], 2)
+
+            clock.return_value = 100
+            pool.get(model_name="d")
+
+        stats = pool.stats()
+        self.assertEqual(stats["size"], 1)
+        self.assertEqual(stats["evictions"], 3)
+
+
+class FakeSession:
+    """Minimalna ChatSession: historia to lista par (rola, tekst)."""
+    def __init__(self):
+        self.history = []
+
+    async def send_message_async(self, text, generation_config=None):
+        reply = MagicMock(text=f"re: {text}", usage_metadata=None)
+        self.history += [("user", text), ("model", reply.text)]
+        return reply
+
+
+class TestGeminiChat(unittest.TestCase):
+    def test_history_is_bounded_to_newest_exchanges(self):
+        guard = MagicMock()
+        guard.model.start_chat.return_value = FakeSession()
+        chat = GeminiChat(guard, max_history_tokens=30)
+
+        async def talk():
+            for i in range(10):
+                await chat.send_message_async(f"wiadomość numer {i} " + "x" * 20)
+
+        asyncio.run(talk())
+        self.assertLessEqual(chat.history_tokens, 30)
+        self.assertEqual(len(chat._session.history), 2 * len(chat._exchanges))
+        self.assertTrue(chat._session.history[0][1].startswith("wiadomość numer 9"))
+
+
+class FakeAsyncModel:
+    """Model z natywnym async - jak klient grpc.aio działa tylko na pętli, która go użyła."""
+    def __init__(self, delay=0.0, failures=0):
+        self.delay = delay
+        self.failures = failures
+        self.loop = None
+        self.calls = 0
+        self.active = 0
+        self.peak = 0
+
+    async def generate_content_async(self, prompt, generation_config=None, stream=False):
+        loop = asyncio.get_running_loop()
+        if self.loop is None:
+            self.loop = loop
+        elif loop is not self.loop:
+            raise RuntimeError("Event loop is closed")
+        self.calls += 1
+        if self.failures:
+            self.failures -= 1
+            raise ServiceUnavailable("przeciążenie")
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self.active -= 1
+        return MagicMock(text=f"odpowiedź na {prompt}", usage_metadata=None)
+
+
+class TestGeminiGuardAsync(unittest.TestCase):
+    def setUp(self):
+        with patch.dict("os.environ", {}, clear=True):
+            self.guard = GeminiGuard(model_name="m")
+        self.guard.model = FakeAsyncModel()
+        patcher = patch.object(gemini_client, "get_default_cache", return_value=None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_calls_from_separate_asyncio_runs_share_the_gemini_loop(self):
+        first = asyncio.run(self.guard.generate_content_async("a"))
+        second = asyncio.run(self.guard.generate_content_async("b"))  # nowa pętla wywołującego
+        self.assertEqual((first, second), ("odpowiedź na a", "odpowiedź na b"))
+        self.assertIs(self.guard.model.loop, gemini_client.get_async_loop().loop)
+        self.assertEqual(gemini_client.run_async(self.guard.generate_content_async("c")),
+                         "odpowiedź na c")
+
+    def test_transient_errors_are_retried(self):
+        self.guard.model = FakeAsyncModel(failures=2)
+        with patch.object(GeminiGuard._generate_async.retry, "wait", wait_none()):
+            text = asyncio.run(self.guard.generate_content_async("a"))
+        self.assertEqual((text, self.guard.model.calls), ("odpowiedź na a", 3))
+
+    def test_async_path_uses_response_cache(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        cache = ResponseCache(path=os.path.join(tmp.name, "cache.sqlite3"))
+        with patch.object(gemini_client, "get_default_cache", return_value=cache):
+            first = asyncio.run(self.guard.generate_content_async("a"))
+            second = asyncio.run(self.guard.generate_content_async("a"))
+            asyncio.run(self.guard.generate_content_async("a", use_cache=False))
+        self.assertEqual(first, second)
+        self.assertEqual(self.guard.model.calls, 2)
+
+    def test_concurrency_is_bounded_and_in_flight_reported(self):
+        self.guard.model = FakeAsyncModel(delay=0.1)
+        self.addCleanup(gemini_client.set_max_concurrency, gemini_client._max_concurrency)
+        gemini_client.set_max_concurrency(2)
+
+        async def burst():
+            calls = [
+                asyncio.create_task(self.guard.generate_content_async(f"p{i}")) for i in range(6)
+            ]
+            await asyncio.sleep(0.05)
+            in_flight = gemini_client.get_stats()["async"]["in_flight"]
+            await asyncio.gather(*calls)
+            return in_flight
+
+        self.assertEqual(asyncio.run(burst()), 2)
+        self.assertEqual(self.guard.model.peak, 2)
+        self.assertEqual(gemini_client.get_stats()["async"]["in_flight"], 0)
+
+
+class FakeStreamModel:
+    """Strumień według scenariusza: każde otwarcie odtwarza kolejną listę tekstów i wyjątków."""
+    def __init__(self, *attempts):
+        self.attempts = list(attempts)
+        self.opened = 0
+
+    def generate_content(self, prompt, generation_config=None, stream=False):
+        self.opened += 1
+        return self._replay(self.attempts.pop(0))
+
+    async def generate_content_async(self, prompt, generation_config=None, stream=False):
+        self.opened += 1
+        return self._replay_async(self.attempts.pop(0))
+
+    @staticmethod
+    def _replay(script):
+        for item in script:
+            if isinstance(item, Exception):
+                raise item
+            yield MagicMock(text=item)
+
+    @staticmethod
+    async def _replay_async(script):
+        for item in script:
+            await asyncio.sleep(0)
+            if isinstance(item, Exception):
+                raise item
+            yield MagicMock(text=item)
+
+
+def fake_stream_guard(*attempts):
+    with patch.dict("os.environ", {}, clear=True):
+        guard = GeminiGuard(model_name="m")
+    guard.model = FakeStreamModel(*attempts)
+    return guard
+
+
+async def _collect(stream):
+    return [chunk async for chunk in stream]
+
+
+class TestGeminiGuardStreaming(unittest.TestCase):
+    def setUp(self):
+        patchers = [
+            patch.object(gemini_client, "get_default_cache", return_value=None),
+            patch.object(GeminiGuard._open_stream.retry, "wait", wait_none()),
+            patch.object(GeminiGuard._open_stream_async.retry, "wait", wait_none()),
+        ]
+        for p in patchers:
+            p.start()
+            self.addCleanup(p.stop)
+
+    def test_errors_before_first_chunk_are_retried(self):
+        for run in ("sync", "async"):
+            guard = fake_stream_guard(
+                [ServiceUnavailable("przeciążenie")], ["", "Ala ", "ma ", "kota"]
+            )
+            if run == "sync":
+                chunks = list(guard.stream_content("p"))
+            else:
+                chunks = asyncio.run(_collect(guard.stream_content_async("p")))
+            self.assertEqual(chunks, ["Ala ", "ma ", "kota"], run)
+            self.assertEqual(guard.model.opened, 2, run)
+
+    def test_error_after_first_chunk_interrupts_stream(self):
+        for run in ("sync", "async"):
+            guard = fake_stream_guard(["Ala ", ServiceUnavailable("zerwane")], ["nie", "użyte"])
+            received = []
+
+            async def consume():
+                async for chunk in guard.stream_content_async("p"):
+                    received.append(chunk)
+
+            with self.assertRaises(StreamInterruptedError, msg=run):
+                if run == "sync":
+                    for chunk in guard.stream_content("p"):
+                        received.append(chunk)
+                else:
+                    asyncio.run(consume())
+            self.assertEqual((received, guard.model.opened), (["Ala "], 1), run)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+import json
+import os
+import tempfile
+import time
+import unittest
+from unittest.mock import patch
+
+import io_guard
+from io_guard import IOGuard
+
+
+class TestIOGuardStateful(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.path = os.path.join(self.tmp.name, "state.json")
+
+    def read(self):
+        with open(self.path, encoding="utf-8") as f:
+            return json.load(f)
+
+    def test_patches_apply_in_memory_and_flush_once(self):
+        doc = IOGuard(self.path, flush_interval=0)
+        doc.patch([
+            ("set", ("debata",), {"status": "active"}),
+            ("append", ("debata", "history"), {"role": "Agent A", "content": "Tak"}),
+            ("merge", ("debata",), {"round": 1}),
+            ("set", ("tymczasowe",), 1),
+            ("delete", ("tymczasowe",)),
+        ])
+        self.assertFalse(os.path.exists(self.path))
+        self.assertTrue(doc.flush())
+        self.assertFalse(doc.flush())  # bez zmian - bez zapisu
+        self.assertEqual(
+            self.read(),
+            {
+                "debata": {
+                    "status": "active",
+                    "history": [{"role": "Agent A", "content": "Tak"}],
+                    "round": 1,
+                }
+            },
+        )
+        self.assertEqual((doc.patches, doc.writes), (5, 1))
+        with self.assertRaises(ValueError):
+            doc.patch([("move", ("a",), 1)])
+
+    def test_timer_coalesces_many_patches(self):
+        with IOGuard(self.path, flush_interval=0.05) as doc:
+            for i in range(200):
+                doc.append(("log",), i)
+            time.sleep(0.2)
+            self.assertEqual(len(self.read()["log"]), 200)
+        self.assertLessEqual(doc.writes, 2)
+
+    def test_fsync_is_configurable_and_existing_document_is_loaded(self):
+        with open(self.path, "w", encoding="utf-8") as f:
+            json.dump({"system": {"cpu": 5}}, f)
+        doc = IOGuard(self.path, flush_interval=0, fsync=True)
+        doc.set(("debate",), {"status": "finished"})
+        with patch.object(io_guard, "write_atomic", wraps=io_guard.write_atomic) as writer:
+            doc.flush()
+        self.assertTrue(writer.call_args.kwargs["fsync"])
+        self.assertEqual(self.read(), {"system": {"cpu": 5}, "debate": {"status": "finished"}})
+
+
+if __name__ == "__main__":
+    unittest.main()
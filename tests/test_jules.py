@@ -0,0 +1,120 @@
+import asyncio
+import os
+import tempfile
+import time
+import unittest
+from unittest.mock import patch
+
+import jules
+from event_log import EventLog
+
+
+class FakeGemini:
+    """Zamiast run_gemini_async: zapisuje (etap, start, koniec) każdego wywołania."""
+    def __init__(self, delay=0.05):
+        self.delay = delay
+        self.calls = []
+
+    @staticmethod
+    def stage(prompt):
+        if "Skeleton-of-Thought" in prompt:
+            return "skeleton"
+        for name, _, _ in jules.AGENTS:
+            if f"Jesteś Agent {name}" in prompt:
+                return f"agent:{name}"
+        return "solutions"
+
+    async def __call__(self, prompt):
+        started = time.monotonic()
+        await asyncio.sleep(self.delay)
+        stage = self.stage(prompt)
+        self.calls.append((stage, started, time.monotonic()))
+        return f"[{stage}]"
+
+    def span(self, stage):
+        return next((start, end) for name, start, end in self.calls if name == stage)
+
+
+class TestRunDag(unittest.TestCase):
+    def test_nodes_wait_only_for_their_own_dependencies(self):
+        order = []
+
+        def node(name, delay):
+            async def run(results):
+                await asyncio.sleep(delay)
+                order.append(name)
+                return (name, sorted(results))
+            return run
+
+        nodes = {
+            "a": ((), node("a", 0.02)),
+            "slow": ((), node("slow", 0.1)),
+            "b": (("a",), node("b", 0.0)),
+            "c": (("b", "slow"), node("c", 0.0)),
+        }
+        results = asyncio.run(jules._run_dag(nodes))
+        self.assertEqual(order, ["a", "b", "slow", "c"])  # b nie czeka na niezależny slow
+        self.assertEqual(results["c"], ("c", ["b", "slow"]))
+
+
+class TestPipeline(unittest.TestCase):
+    def test_agents_run_concurrently_between_skeleton_and_solutions(self):
+        fake = FakeGemini()
+        statuses = []
+        with patch.object(jules, "run_gemini_async", fake):
+            result = asyncio.run(jules.audit_async(
+                "def f():\n    return 1\n", "f.py", pipeline=True,
+                status=lambda phase, percent, *_: statuses.append(percent),
+            ))
+
+        skeleton, solutions = fake.span("skeleton"), fake.span("solutions")
+        agents = [fake.span(f"agent:{name}") for name, _, _ in jules.AGENTS]
+        self.assertEqual(len(fake.calls), 2 + len(jules.AGENTS))
+        self.assertTrue(all(start >= skeleton[1] for start, _ in agents))
+        self.assertTrue(all(end <= solutions[0] for _, end in agents))
+        # Równolegle: każdy agent startuje, zanim którykolwiek skończy
+        self.assertLess(max(start for start, _ in agents), min(end for _, end in agents))
+
+        self.assertEqual(result["skeleton"], "[skeleton]")
+        self.assertEqual(result["solutions"], "[solutions]")
+        for name, _, _ in jules.AGENTS:
+            self.assertIn(f"### Agent {name}", result["debate"])
+        self.assertEqual(statuses, sorted(statuses))
+
+
+class TestEmitEvents(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        patcher = patch.object(jules, "publish_status")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def logged(self):
+        events = EventLog(os.path.join(self.tmp.name, jules.EVENT_LOG_FILE)).read_since(0)
+        return [event["text"] for event in events if event["type"] == "log"]
+
+    def test_interleaved_runs_keep_their_own_dedup_state(self):
+        first, second = [], []
+        run_a = jules.new_emitted_state()
+        run_b = jules.new_emitted_state()
+        for text, timeline, emitted in [
+            ("a1", first, run_a), ("b1", second, run_b), ("a2", first, run_a),
+            ("b2", second, run_b),
+        ]:
+            timeline.append(text)
+            jules.update_status("faza", 10, timeline, workdir=self.tmp.name, emitted=emitted)
+        # Każdy wpis trafia do dziennika dokładnie raz, mimo przeplatania przebiegów
+        self.assertEqual(self.logged(), ["a1", "b1", "a2", "b2"])
+
+    def test_next_run_logs_its_timeline_from_the_start(self):
+        timeline = ["start"]
+        jules.update_status("faza", 10, timeline, workdir=self.tmp.name,
+                            emitted=jules.new_emitted_state())
+        jules.update_status("faza", 10, timeline, workdir=self.tmp.name,
+                            emitted=jules.new_emitted_state())
+        self.assertEqual(self.logged(), ["start", "start"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,36 @@
+import os
+import tempfile
+import unittest
+
+from jules_batch import find_files
+
+
+class TestFindFiles(unittest.TestCase):
+    def test_respects_gitignore(self):
+        """Pliki i katalogi z .gitignore (także zagnieżdżonego) są pomijane."""
+        with tempfile.TemporaryDirectory() as root:
+            files = {
+                ".gitignore": "build/\n*_gen.py\n",
+                "app.py": "",
+                "schema_gen.py": "",
+                "notes.txt": "",
+                "build/out.py": "",
+                "pkg/.gitignore": "local.py\n",
+                "pkg/mod.py": "",
+                "pkg/local.py": "",
+            }
+            for rel, content in files.items():
+                path = os.path.join(root, rel)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with open(path, "w") as f:
+                    f.write(content)
+
+            found = [os.path.relpath(p, root) for p in find_files(root)]
+            self.assertEqual(found, ["app.py", os.path.join("pkg", "mod.py")])
+            self.assertEqual(
+                [os.path.relpath(p, root) for p in find_files(root, ["*.txt"])], ["notes.txt"]
+            )
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,140 @@
+import asyncio
+import os
+import stat
+import tempfile
+import threading
+import time
+import unittest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import gemini_client
+import jules
+import jules_batch
+import jules_daemon
+from audit_index import AuditIndex
+from gemini_client import GeminiGuard
+from jules_daemon import JulesWorker, send_job
+
+
+class FakeWorker:
+    def __init__(self, cache=True):
+        self.cache = cache
+
+    async def run_job(self, job):
+        return {"ok": True, "cwd": job.get("cwd")}
+
+
+@unittest.skipUnless(jules_daemon.UNIX_SOCKETS, "Unix sockets only")
+class TestDaemonSocket(unittest.TestCase):
+    def test_socket_is_owner_only_and_answers_jobs(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        path = os.path.join(tmp.name, "run", "jules.sock")
+        loop = asyncio.new_event_loop()
+        self.addCleanup(loop.close)
+
+        def run(task):
+            try:
+                loop.run_until_complete(task)
+            except asyncio.CancelledError:
+                pass
+
+        with patch.object(jules_daemon, "JulesWorker", FakeWorker):
+            task = loop.create_task(jules_daemon.serve(path))
+            thread = threading.Thread(target=run, args=(task,), daemon=True)
+            thread.start()
+            for _ in range(100):
+                if os.path.exists(path):
+                    break
+                time.sleep(0.01)
+
+            self.assertEqual(stat.S_IMODE(os.stat(path).st_mode), 0o600)
+            self.assertEqual(send_job({"cwd": "/x"}, socket_path=path), {"ok": True, "cwd": "/x"})
+            loop.call_soon_threadsafe(task.cancel)
+            thread.join(timeout=2)
+        self.assertFalse(os.path.exists(path))
+        self.assertIsNone(send_job({}, socket_path=path))
+
+
+def make_worker(jules_module=None, batch_module=None, index=None, cache=True):
+    """JulesWorker bez ciężkiego __init__ (bez domyślnego indeksu i cache na dysku)."""
+    worker = JulesWorker.__new__(JulesWorker)
+    if jules_module is None:
+        jules_module = MagicMock(PROTOCOL_FILE="GEMINI.md")
+        jules_module.run_jules_audit_async = AsyncMock(return_value={"report": "", "error": None})
+    worker.jules, worker.jules_batch = jules_module, batch_module or MagicMock()
+    worker.response_cache = MagicMock()
+    worker.index, worker.jobs_done, worker.cache = index, 0, cache
+    worker.loop = gemini_client.get_async_loop()
+    return worker
+
+
+class LoopBoundModel:
+    """Jak klient grpc.aio SDK: działa tylko na pętli, na której został pierwszy raz użyty."""
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.loop = None
+
+    async def generate_content_async(self, prompt, generation_config=None):
+        loop = asyncio.get_running_loop()
+        self.loop = self.loop or loop
+        if loop is not self.loop:
+            raise RuntimeError("Event loop is closed")
+        if self.fail:
+            raise ValueError("klucz API odrzucony")
+        return MagicMock(text="Wynik audytu", usage_metadata=None)
+
+
+class TestJulesWorker(unittest.TestCase):
+    def test_job_paths_resolve_against_its_cwd_without_chdir(self):
+        worker = make_worker()
+        cwd = os.getcwd()
+        with tempfile.TemporaryDirectory() as tmp:
+            response = worker.handle({"cwd": tmp, "file": "app.py"})
+            self.assertEqual(os.getcwd(), cwd)
+            self.assertEqual(response["report"], os.path.join(tmp, "GEMINI.md"))
+            call = worker.jules.run_jules_audit_async.call_args
+            self.assertEqual(call.kwargs["workdir"], tmp)
+        self.assertFalse(worker.handle({"cwd": os.path.join(tmp, "gone")})["ok"])
+
+    def test_no_cache_job_restores_the_daemon_setting(self):
+        worker = make_worker(cache=False)
+        worker.handle({"file": "app.py", "no_cache": True})
+        # daemon started with --no-cache
+        worker.response_cache.enable_default_cache.assert_not_called()
+
+    def test_consecutive_jobs_share_one_event_loop(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        with open(os.path.join(tmp.name, "app.py"), "w", encoding="utf-8") as f:
+            f.write("def main():\n    return 1\n")
+        os.makedirs(os.path.join(tmp.name, "pkg"))
+        with open(os.path.join(tmp.name, "pkg", "mod.py"), "w", encoding="utf-8") as f:
+            f.write("X = 1\n")
+        with patch.dict("os.environ", {}, clear=True):
+            guard = GeminiGuard(model_name="m")
+        guard.model = LoopBoundModel()
+        index = AuditIndex(os.path.join(tmp.name, "audit.sqlite3"))
+        worker = make_worker(jules, jules_batch, index=index)
+
+        with (
+            patch.object(jules, "_guard", return_value=guard),
+            patch.object(gemini_client, "get_default_cache", return_value=None),
+        ):
+            first = worker.handle({"cwd": tmp.name, "file": "app.py"})
+            second = worker.handle({"cwd": tmp.name, "file": "app.py", "force": True})
+            with open(second["report"], encoding="utf-8") as f:
+                report = f.read()
+            batch = worker.handle({"cwd": tmp.name, "path": "pkg"})
+            guard.model.fail = True
+            failed = worker.handle({"cwd": tmp.name, "file": "app.py", "force": True})
+
+        self.assertEqual((first["ok"], second["ok"], batch["ok"]), (True, True, True))
+        self.assertIn("Wynik audytu", report)
+        self.assertNotIn("Błąd API Gemini", report)
+        self.assertFalse(failed["ok"])
+        self.assertIn("klucz API odrzucony", failed["error"])
+
+
+if __name__ == "__main__":
+    unittest.main()
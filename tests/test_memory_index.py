@@ -0,0 +1,127 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import regis
+from memory_index import MemoryIndex, embed, index_fix_records
+
+
+class TestMemoryIndex(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "index")
+        self.index = MemoryIndex(self.path)
+
+    def tearDown(self):
+        self.index.close()
+        self.tmp.cleanup()
+
+    def test_embedding_is_normalized_and_stable(self):
+        vector = embed("SyntaxError: invalid syntax")
+        self.assertAlmostEqual(sum(v * v for v in vector.values()), 1.0, places=5)
+        self.assertEqual(vector, embed("SyntaxError: invalid syntax"))
+
+    def test_top_k_returns_most_similar(self):
+        self.index.add("a", "SyntaxError: f-string: single '}' is not allowed", kind="fix")
+        self.index.add("b", "Dockerfile typo in RUN apt-get line", kind="fix")
+        self.index.add("c", "Frontend build failure: missing index.html", kind="fix")
+        hits = self.index.search("f-string SyntaxError in jules.py", k=2)
+        self.assertEqual(hits[0]["key"], "a")
+        self.assertGreater(hits[0]["score"], hits[1]["score"])
+        filtered = self.index.search("f-string SyntaxError", k=3, where=lambda r: r["key"] != "a")
+        self.assertNotIn("a", [hit["key"] for hit in filtered])
+
+    def test_incremental_inserts_persist_and_deduplicate(self):
+        self.assertTrue(self.index.add("a", "pierwszy wpis"))
+        self.index.search("wpis")  # mapowanie przed kolejnym zapisem
+        self.assertTrue(self.index.add("b", "drugi wpis o Dockerfile"))
+        self.assertFalse(self.index.add("a", "pierwszy wpis"))
+        reopened = MemoryIndex(self.path)
+        self.addCleanup(reopened.close)
+        self.assertEqual(len(reopened), 2)
+        self.assertEqual(reopened.search("Dockerfile", k=1)[0]["key"], "b")
+        self.assertEqual(
+            os.path.getsize(os.path.join(self.path, "vectors.f32")), 2 * reopened.row_bytes
+        )
+
+    def test_compaction_keeps_newest_rows(self):
+        index = MemoryIndex(os.path.join(self.tmp.name, "capped"), max_rows=8)
+        self.addCleanup(index.close)
+        other = MemoryIndex(index.directory)  # drugi proces z otwartym indeksem
+        self.addCleanup(other.close)
+        for i in range(30):
+            index.add(f"k{i}", f"wpis numer {i} o temacie {i}")
+        self.assertLessEqual(len(index), 10)
+        self.assertIn("k29", index)
+        self.assertNotIn("k0", index)
+        self.assertEqual(os.path.getsize(index.vectors_path), len(index) * index.row_bytes)
+        self.assertEqual(other.search("temacie 29", k=1)[0]["key"], "k29")
+        self.assertEqual(len(other), len(index))
+
+    def test_fix_records_are_indexed_once(self):
+        memory_file = os.path.join(self.tmp.name, ".jules_memory.json")
+        with open(memory_file, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "history": [
+                        {
+                            "error_signature": "Dockerfile typo (RUN,!pt-get)",
+                            "strategy_used": "Manual Code Correction",
+                            "outcome": "FIXED",
+                            "timestamp": "2025-02-19T10:05:00Z",
+                        },
+                    ]
+                },
+                f,
+            )
+        self.assertEqual(index_fix_records(self.index, memory_file), 1)
+        self.assertEqual(index_fix_records(self.index, memory_file), 0)
+        self.assertIn("Manual Code Correction", self.index.search("Dockerfile typo")[0]["text"])
+
+    def test_regis_injects_relevant_snippets_only(self):
+        for i in range(20):
+            self.index.add(
+                f"t{i}",
+                f"USER: Mode: chat.\nContext: temat {i} o pogodzie\nMODEL: słonecznie",
+                kind="turn",
+                session="s",
+                user=f"temat {i}",
+            )
+        self.index.add(
+            "fix",
+            "Błąd: SyntaxError: f-string -> strategia: Manual Code Correction (FIXED)",
+            kind="fix",
+        )
+        self.index.add(
+            "other", "USER: Context: f-string w innej sesji", kind="turn", session="inna", user="x"
+        )
+        conversation = regis.MemoryManager()
+        with patch.object(regis, "_index", self.index):
+            memory = regis._recall(
+                "s", conversation, "Mode: debug.\nContext: SyntaxError f-string w jules.py"
+            )
+        self.assertIn("Manual Code Correction", memory)
+        self.assertNotIn("innej sesji", memory)
+        self.assertNotIn("pogodzie", memory)
+
+    def test_turns_without_session_are_never_indexed_or_recalled(self):
+        self.index.add(
+            "old",
+            "USER: haslo do bazy produkcyjnej to hunter2",
+            kind="turn",
+            session=None,
+            user="x",
+        )
+        with patch.object(regis, "_index", self.index):
+            regis._remember_turn(None, "Context: haslo do bazy", "hunter2")
+            memory = regis._recall(
+                None, regis.MemoryManager(), "Context: jakie jest haslo do bazy?"
+            )
+        self.assertEqual(len(self.index), 1)
+        self.assertNotIn("hunter2", memory)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,188 @@
+import asyncio
+import importlib.util
+import os
+import threading
+import unittest
+from unittest.mock import MagicMock
+
+from memory_manager import ContextCompactor, MemoryManager, ModelTokenCounter
+from rate_limiter import estimate_tokens
+
+
+def _load_v2_memory_manager():
+    path = os.path.join(
+        os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        "jules_v2_optimized", "core", "memory_manager.py",
+    )
+    spec = importlib.util.spec_from_file_location("v2_memory_manager", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+class CountingModel:
+    """Zamiast GenerativeModel: count_tokens = liczba słów, zapisuje liczone teksty."""
+    def __init__(self, error=None):
+        self.error = error
+        self.calls = []
+
+    def count_tokens(self, text, request_options=None):
+        self.calls.append(text)
+        if self.error:
+            raise self.error
+        return MagicMock(total_tokens=len(text.split()))
+
+
+class TestMemoryManager(unittest.TestCase):
+    def test_budget_is_counted_in_tokens(self):
+        memory = MemoryManager(max_tokens=100, max_messages=50, token_counter=len)
+        for _ in range(10):
+            memory.add_message("user", "x" * 30)
+        self.assertEqual(len(memory), 3)
+        self.assertEqual(memory.total_tokens, 90)
+
+    def test_message_larger_than_budget_is_truncated(self):
+        memory = MemoryManager(max_tokens=200)
+        memory.add_message("user", "plik " * 10000)
+        self.assertLessEqual(memory.total_tokens, 200)
+        self.assertIn("skrócono", memory.history[0]["content"])
+
+    def test_context_string_is_cached_until_change(self):
+        memory = MemoryManager()
+        memory.add_message("user", "Cześć")
+        first = memory.get_context_string()
+        self.assertIs(memory.get_context_string(), first)
+        memory.add_message("model", "Witaj")
+        self.assertEqual(memory.get_context_string(), "USER: Cześć\nMODEL: Witaj")
+
+    def test_concurrent_inserts_keep_running_total_consistent(self):
+        memory = MemoryManager(max_tokens=500, max_messages=1000, token_counter=len)
+        threads = [
+            threading.Thread(
+                target=lambda: [memory.add_message("user", "abcde") for _ in range(200)]
+            )
+            for _ in range(4)
+        ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(memory.total_tokens, sum(len(m["content"]) for m in memory.history))
+        self.assertEqual(memory.total_tokens, 500)
+
+    def test_history_is_a_read_only_snapshot(self):
+        for module_memory in (MemoryManager(), _load_v2_memory_manager().MemoryManager()):
+            module_memory.add_message("user", "Cześć")
+            with self.assertRaises(AttributeError):
+                module_memory.history.append({"role": "user", "content": "zgubione"})
+            with self.assertRaises(AttributeError):
+                module_memory.history = []
+            module_memory.clear()
+            self.assertEqual(module_memory.history, ())
+
+
+class TestModelTokenCounter(unittest.TestCase):
+    def test_model_counts_are_the_default_and_cached(self):
+        model = CountingModel()
+        memory = MemoryManager(model=model)
+        memory.add_message("user", "jeden dwa trzy")
+        memory.add_message("user", "jeden dwa trzy")
+        self.assertEqual(memory.total_tokens, 6)
+        self.assertEqual(model.calls, ["jeden dwa trzy"])
+
+    def test_guard_is_resolved_lazily_and_falls_back_without_model(self):
+        resolved = []
+        guard = MagicMock(spec=["model"], model=None)
+        counter = ModelTokenCounter(lambda: resolved.append(1) or guard)
+        self.assertEqual(resolved, [])
+        self.assertEqual(counter("x" * 40), 10)  # brak modelu (klucza API) -> len//4
+        self.assertEqual(counter("y" * 40), 10)
+        self.assertEqual(resolved, [1])
+        guard_with_model = MagicMock(spec=["model"], model=CountingModel())
+        self.assertEqual(ModelTokenCounter(guard_with_model)("a b"), 2)
+
+    def test_failed_count_falls_back_to_estimate_and_is_retried(self):
+        model = CountingModel(error=RuntimeError("quota"))
+        counter = ModelTokenCounter(model)
+        self.assertEqual(counter("x" * 40), 10)
+        self.assertEqual(counter("x" * 40), 10)
+        self.assertEqual(len(model.calls), 2)
+        self.assertEqual(counter.fallbacks, 2)
+
+    def test_event_loop_gets_estimate_and_exact_count_lands_in_cache(self):
+        model = CountingModel()
+        counter = ModelTokenCounter(model)
+        text = "a b c " * 10
+
+        async def scenario():
+            return counter(text)  # nie blokuje pętli zapytaniem sieciowym
+
+        # asyncio.run czeka na domyślny executor, więc dokładna liczba jest już w cache
+        self.assertEqual(asyncio.run(scenario()), len(text) // 4)
+        self.assertEqual(counter(text), 30)
+        self.assertEqual(model.calls, [text])
+
+    def test_compactor_counts_with_its_model_client(self):
+        client = MagicMock(spec=["model", "generate_content_async"], model=CountingModel())
+        compactor = ContextCompactor(client, max_tokens=100)
+        self.assertEqual(compactor._count("a b c"), 3)
+        self.assertIs(ContextCompactor(None)._count, estimate_tokens)
+
+
+class FakeModel:
+    def __init__(self):
+        self.prompts = []
+
+    async def generate_content_async(self, prompt, temperature=0.7, priority=None):
+        self.prompts.append(prompt)
+        await asyncio.sleep(0.01)
+        return f"streszczenie #{len(self.prompts)}"
+
+
+def _turns(n):
+    return [
+        {"role": "Agent A" if i % 2 else "Agent B", "content": f"argument {i} " * 10}
+        for i in range(n)
+    ]
+
+
+class TestContextCompactor(unittest.TestCase):
+    def test_compact_does_not_wait_for_model_and_stays_in_budget(self):
+        async def scenario():
+            model = FakeModel()
+            compactor = ContextCompactor(model, max_tokens=100, keep_recent=2)
+            history = _turns(12)
+            first = await compactor.compact(history)
+            self.assertEqual(model.prompts, [])  # streszczenie dopiero zlecone w tle
+            self.assertLessEqual(sum(len(m["content"]) // 4 for m in first), 100)
+            self.assertEqual(first[-2:], history[-2:])
+
+            await compactor.wait_pending()
+            second = await compactor.compact(history)
+            self.assertEqual(
+                second[0]["content"], "[Streszczenie wcześniejszych 10 wypowiedzi]: streszczenie #1"
+            )
+            self.assertEqual(compactor.cache_hits, 1)
+
+        asyncio.run(scenario())
+
+    def test_next_summary_extends_cached_prefix(self):
+        async def scenario():
+            model = FakeModel()
+            compactor = ContextCompactor(model, max_tokens=100, keep_recent=2)
+            history = _turns(12)
+            compactor.prefetch(history)
+            await compactor.wait_pending()
+            history += _turns(2)
+            compactor.prefetch(history)
+            await compactor.wait_pending()
+            self.assertEqual(len(model.prompts), 2)
+            # Tylko nowe wypowiedzi + poprzednie streszczenie
+            self.assertIn("streszczenie #1", model.prompts[1])
+            self.assertEqual(model.prompts[1].count("argument"), 20)
+
+        asyncio.run(scenario())
+
+
+if __name__ == '__main__':
+    unittest.main()
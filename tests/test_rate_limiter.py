@@ -0,0 +1,91 @@
+import threading
+import unittest
+
+from rate_limiter import (
+    PRIORITY_BATCH,
+    PRIORITY_INTERACTIVE,
+    RequestScheduler,
+    TokenBucket,
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestTokenBucket(unittest.TestCase):
+    def test_refill_rate(self):
+        clock = FakeClock()
+        bucket = TokenBucket(60, clock=clock)  # 1 token / s
+        bucket.consume(60, clock())
+        self.assertAlmostEqual(bucket.delay_for(5, clock()), 5.0)
+        clock.now = 5.0
+        self.assertEqual(bucket.delay_for(5, clock()), 0.0)
+
+
+class TestRequestScheduler(unittest.TestCase):
+    def test_interactive_goes_before_batch(self):
+        """Czat (interactive) wyprzedza czekające audyty (batch)."""
+        clock = FakeClock()
+        scheduler = RequestScheduler(rpm=60, clock=clock)
+        scheduler.rpm_bucket.tokens = 0
+
+        with scheduler._lock:
+            batch = scheduler._enqueue(1, PRIORITY_BATCH, "jules")
+            chat = scheduler._enqueue(1, PRIORITY_INTERACTIVE, "chat")
+            self.assertIsNone(scheduler._try_grant(batch))
+            clock.now = 1.0
+            self.assertEqual(scheduler._try_grant(chat), 0.0)
+
+        stats = scheduler.stats()
+        self.assertEqual(stats["queue_depth"], 1)
+        self.assertEqual(stats["priorities"]["interactive"]["granted"], 1)
+
+    def test_fair_queuing_interleaves_callers(self):
+        scheduler = RequestScheduler()
+        with scheduler._lock:
+            tickets = [scheduler._enqueue(10, PRIORITY_BATCH, "audit") for _ in range(3)]
+            other = scheduler._enqueue(10, PRIORITY_BATCH, "debate")
+        order = sorted(tickets + [other], key=lambda t: t.sort_key())
+        self.assertIs(order[1], other)
+
+    def test_acquire_timeout_cancels_ticket(self):
+        scheduler = RequestScheduler(rpm=1)
+        scheduler.acquire()
+        with self.assertRaises(TimeoutError):
+            scheduler.acquire(timeout=0.05)
+        self.assertEqual(scheduler.stats()["queue_depth"], 0)
+
+    def test_threads_all_granted_without_limits(self):
+        scheduler = RequestScheduler()
+        threads = [threading.Thread(target=scheduler.acquire) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join(timeout=2)
+        self.assertEqual(scheduler.stats()["granted"], 8)
+
+    def test_caller_tags_are_stable_and_pruned(self):
+        scheduler = RequestScheduler()
+        threads = [
+            threading.Thread(target=scheduler.acquire, kwargs={"priority": PRIORITY_BATCH})
+            for _ in range(8)
+        ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join(timeout=2)
+        # Wątki anonimowe dzielą jedną tożsamość (klasę priorytetu), nie tworzą wpisu na zapytanie
+        self.assertLessEqual(scheduler.stats()["callers"], 1)
+
+        for i in range(100):
+            scheduler.acquire(caller=f"job-{i}")
+        self.assertLessEqual(scheduler.stats()["callers"], 1)  # znaczniki za `_vtime` są usuwane
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+import threading
+import time
+import unittest
+
+from request_executor import ExecutorBusyError, RequestExecutor, RequestTimeoutError
+
+
+class TestRequestExecutor(unittest.TestCase):
+    def test_requests_run_concurrently(self):
+        """4 żądania po 0.2s na 4 wątkach kończą się w ~0.2s, a nie 0.8s."""
+        executor = RequestExecutor(max_workers=4, max_queue=0)
+        start = time.monotonic()
+        threads = [
+            threading.Thread(target=executor.submit, args=(time.sleep, 0.2)) for _ in range(4)
+        ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertLess(time.monotonic() - start, 0.6)
+        self.assertEqual(executor.stats()["completed"], 4)
+
+    def test_rejects_when_queue_full(self):
+        executor = RequestExecutor(max_workers=1, max_queue=0, admission_timeout=0.05)
+        release = threading.Event()
+        worker = threading.Thread(target=executor.submit, args=(release.wait,))
+        worker.start()
+        time.sleep(0.05)
+        with self.assertRaises(ExecutorBusyError):
+            executor.submit(lambda: "late")
+        release.set()
+        worker.join()
+        self.assertEqual(executor.submit(lambda: "ok"), "ok")
+        self.assertEqual(executor.stats()["rejected"], 1)
+
+    def test_timeout(self):
+        executor = RequestExecutor(max_workers=1, max_queue=1)
+        with self.assertRaises(RequestTimeoutError):
+            executor.submit(time.sleep, 0.3, timeout=0.05)
+        self.assertEqual(executor.stats()["timed_out"], 1)
+
+    def test_stream_passes_items_and_errors(self):
+        executor = RequestExecutor(max_workers=2, max_queue=0)
+        self.assertEqual(list(executor.stream(lambda: iter("abc"))), ["a", "b", "c"])
+
+        def broken():
+            yield "a"
+            raise ValueError("boom")
+
+        with self.assertRaises(ValueError):
+            list(executor.stream(broken))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,49 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from response_cache import ResponseCache
+
+
+class TestResponseCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp.name, "responses.sqlite3")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_key_depends_on_all_parameters(self):
+        base = ResponseCache.make_key("m", "prompt", 0.7, {"top_k": 40})
+        self.assertEqual(base, ResponseCache.make_key("m", "prompt", 0.7, {"top_k": 40}))
+        self.assertNotEqual(base, ResponseCache.make_key("m", "prompt", 0.2, {"top_k": 40}))
+        self.assertNotEqual(base, ResponseCache.make_key("other", "prompt", 0.7, {"top_k": 40}))
+
+    def test_disk_tier_survives_new_instance(self):
+        """Drugi proces (nowa instancja) trafia w cache dyskowy."""
+        key = ResponseCache.make_key("m", "audit", 0.7)
+        ResponseCache(self.db_path).set(key, "wynik")
+
+        cache = ResponseCache(self.db_path)
+        self.assertEqual(cache.get(key), "wynik")
+        self.assertEqual(cache.get(key), "wynik")
+        stats = cache.stats()
+        self.assertEqual((stats["disk_hits"], stats["memory_hits"]), (1, 1))
+
+    def test_ttl_and_size_cap(self):
+        cache = ResponseCache(self.db_path, ttl=60, max_memory_entries=1, max_disk_entries=2)
+        with patch("response_cache.time.time", return_value=1000):
+            for name in ("a", "b", "c"):
+                cache.set(name, name.upper())
+        self.assertEqual(cache.stats()["disk_entries"], 2)
+
+        with patch("response_cache.time.time", return_value=1030):
+            self.assertIsNone(cache.get("a"))
+            self.assertEqual(cache.get("b"), "B")
+        with patch("response_cache.time.time", return_value=2000):
+            self.assertIsNone(cache.get("c"))
+
+
+if __name__ == '__main__':
+    unittest.main()
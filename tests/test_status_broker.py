@@ -0,0 +1,63 @@
+import json
+import os
+import sys
+import tempfile
+import time
+import unittest
+
+sys.path.append(
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend")
+)
+
+from status_broker import StatusBroker  # noqa: E402
+from status_state import StatusState  # noqa: E402
+
+from status_client import StatusClient  # noqa: E402
+
+
+class TestStatusBroker(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "status_report.json")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_sections_from_many_writers_are_merged(self):
+        state = StatusState(self.path)
+        broker = StatusBroker(state, port=0).start()
+        try:
+            jules = StatusClient(port=broker.port, path=self.path)
+            debate = StatusClient(port=broker.port, path=self.path)
+            state.update_section("system", {"status": "ONLINE", "cpu": 12})
+            self.assertTrue(jules.publish("jules", {"status": "🟡 W trakcie"}, replace=True))
+            self.assertTrue(debate.publish("debate", {"status": "active", "current_round": 1}))
+            self.assertTrue(debate.publish("debate", {"current_round": 2}))
+            deadline = time.monotonic() + 2
+            while broker.received < 3 and time.monotonic() < deadline:
+                time.sleep(0.01)
+            state.persist()
+            with open(self.path, encoding="utf-8") as f:
+                document = json.load(f)
+            self.assertEqual(document["system"]["cpu"], 12)
+            self.assertEqual(document["jules"], {"status": "🟡 W trakcie"})
+            self.assertEqual(document["debate"], {"status": "active", "current_round": 2})
+            jules.close()
+            debate.close()
+        finally:
+            broker.stop()
+
+    def test_fallback_without_broker_keeps_other_sections(self):
+        with open(self.path, "w", encoding="utf-8") as f:
+            json.dump({"system": {"status": "ONLINE"}}, f)
+        client = StatusClient(port=1, path=self.path)  # nikt nie nasłuchuje
+        self.assertFalse(client.publish("debate", {"status": "active"}, flush=True))
+        self.assertFalse(client.publish("debate", {"current_round": 1}, flush=True))
+        with open(self.path, encoding="utf-8") as f:
+            document = json.load(f)
+        self.assertEqual(document["system"], {"status": "ONLINE"})
+        self.assertEqual(document["debate"], {"status": "active", "current_round": 1})
+
+
+if __name__ == '__main__':
+    unittest.main()
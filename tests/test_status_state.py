@@ -0,0 +1,54 @@
+import asyncio
+import os
+import tempfile
+import threading
+import unittest
+
+from backend.status_state import StatusState
+
+
+class TestStatusState(unittest.TestCase):
+    def test_version_changes_only_on_real_updates(self):
+        state = StatusState()
+        self.assertEqual(state.update({"cpu": 10}), 1)
+        self.assertEqual(state.update({"cpu": 10}), 1)
+        self.assertEqual(state.update({"ram": 40}), 2)
+        version, body = state.snapshot()
+        self.assertEqual(body, b'{"cpu": 10, "ram": 40}')
+        self.assertNotEqual(state.etag(1), state.etag(2))
+
+    def test_wait_wakes_up_on_change(self):
+        state = StatusState()
+        threading.Timer(0.05, state.update, args=({"cpu": 5},)).start()
+        version, _ = state.wait(0, timeout=2)
+        self.assertEqual(version, 1)
+        # Brak zmian -> po timeoucie ta sama wersja
+        self.assertEqual(state.wait(1, timeout=0.01)[0], 1)
+
+    def test_wait_async_wakes_up_on_change_from_another_thread(self):
+        state = StatusState()
+
+        async def scenario():
+            threading.Timer(0.05, state.update, args=({"cpu": 5},)).start()
+            waiters = [state.wait_async(0, timeout=2) for _ in range(100)]
+            return await asyncio.gather(*waiters), await state.wait_async(1, timeout=0.01)
+
+        woken, unchanged = asyncio.run(scenario())
+        self.assertEqual({version for version, _ in woken}, {1})
+        self.assertEqual(unchanged[0], 1)
+        self.assertEqual(state._async_waiters, set())
+
+    def test_persist_writes_only_changed_state(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "status_report.json")
+            state = StatusState(path)
+            state.persist()
+            self.assertFalse(os.path.exists(path))
+            state.update({"status": "ONLINE"})
+            state.persist()
+            with open(path, encoding="utf-8") as f:
+                self.assertEqual(f.read(), '{"status": "ONLINE"}')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,45 @@
+import json
+import os
+import tempfile
+import time
+import unittest
+
+from status_writer import StatusWriter
+
+
+class TestStatusWriter(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "status_report.json")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_updates_within_window_are_coalesced(self):
+        writer = StatusWriter(self.path, window=0.1)
+        for i in range(100):
+            writer.update({"progress": i})
+        time.sleep(0.3)
+        self.assertLessEqual(writer.stats()["writes"], 2)
+        with open(self.path, encoding="utf-8") as f:
+            self.assertEqual(json.load(f), {"progress": 99})
+        writer.close()
+
+    def test_unchanged_status_is_not_rewritten(self):
+        writer = StatusWriter(self.path, window=10)
+        writer.update({"phase": "Gotowe"}, flush=True)
+        writer.update({"phase": "Gotowe"}, flush=True)
+        self.assertEqual(writer.stats(), {"updates": 2, "writes": 1, "skipped": 1})
+        # Brak plików tymczasowych
+        self.assertEqual(os.listdir(self.tmp.name), ["status_report.json"])
+
+    def test_close_writes_pending_status(self):
+        writer = StatusWriter(self.path, window=10)
+        writer.update({"phase": "Skeleton"})
+        writer.close()
+        with open(self.path, encoding="utf-8") as f:
+            self.assertEqual(json.load(f), {"phase": "Skeleton"})
+
+
+if __name__ == '__main__':
+    unittest.main()
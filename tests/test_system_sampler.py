@@ -0,0 +1,33 @@
+import unittest
+from unittest.mock import patch
+
+from backend.system_sampler import RingBuffer, SystemSampler, parse_intervals
+
+
+class TestRingBuffer(unittest.TestCase):
+    def test_since_returns_only_new_rows_and_memory_is_bounded(self):
+        buffer = RingBuffer(["cpu"], capacity=3)
+        for i in range(5):
+            buffer.append(float(i), {"cpu": i * 10.0})
+        self.assertEqual(buffer.since(0)["cpu"], [20.0, 30.0, 40.0])  # starsze wiersze nadpisane
+        self.assertEqual(buffer.since(4)["cpu"], [40.0])
+        self.assertEqual(buffer.since(5)["cpu"], [])
+        self.assertEqual(len(buffer._columns["cpu"]), 3)
+
+
+class TestSystemSampler(unittest.TestCase):
+    def test_each_metric_has_its_own_interval(self):
+        sampler = SystemSampler(capacity=10, intervals=parse_intervals("battery=60"))
+        with patch("backend.system_sampler.psutil.sensors_battery", return_value=None) as battery:
+            for second in range(5):
+                sampler.sample(now=1000.0 + second)
+        self.assertEqual(battery.call_count, 1)
+        history = sampler.history(2)
+        self.assertEqual(history["seq"], 5)
+        self.assertEqual(len(history["samples"]["ts"]), 3)
+        self.assertEqual(history["samples"]["battery"], [100.0, 100.0, 100.0])
+        self.assertIsNotNone(history["samples"]["net_rx_bps"][-1])  # tempo, nie licznik
+
+
+if __name__ == '__main__':
+    unittest.main()
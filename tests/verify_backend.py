@@ -11,7 +11,7 @@ def test_status_endpoint():
     try:
         response = requests.get(f"{BASE_URL}/status")
         response.raise_for_status()
-        data = response.json()
+        data = response.json().get("system", {})
 
         required_keys = ["timestamp", "cpu", "ram", "battery", "status"]
         missing_keys = [k for k in required_keys if k not in data]